@@ -0,0 +1,483 @@
+"""
+Motor de almacenamiento SQLite (modo WAL) para proyectos, bonos, órdenes y puestos
+Opcional (Config.STORAGE_BACKEND = 'sqlite'). Ofrece la misma interfaz que JsonStore
+(leer / escribir / transaccion / existe / firma): cada elemento de las colecciones
+(proyecto, bono, orden, puesto, máquina, terminal asignado) es una fila, y al guardar
+solo se escriben las filas que han cambiado.
+
+Los gestores trabajan siempre con el documento completo en memoria (igual que con
+JSON): no se hacen consultas por bono, proyecto u orden. Por eso las tablas no tienen
+índices secundarios (solo la clave primaria); leer el documento es un SELECT completo
+de cada tabla cuando cambió la versión, y mientras no cambie se usa la caché.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+
+
+class Tabla:
+    """
+    Colección de un documento JSON guardada como tabla.
+
+    Columnas: clave (única), padre (clave de la fila padre en colecciones anidadas),
+    posicion (orden original) y datos (JSON).
+    Los campos lista indicados en `hijos` se guardan en su propia tabla.
+    """
+
+    columnas = ['clave', 'padre', 'posicion', 'datos']
+
+    def __init__(self, nombre: str, id_campo: Optional[str] = None,
+                 hijos: Optional[Dict[str, 'Tabla']] = None):
+        self.nombre = nombre
+        self.id_campo = id_campo
+        self.hijos = hijos or {}
+
+    def todas(self):
+        """Esta tabla y sus tablas hijas (recursivamente)"""
+        yield self
+        for hija in self.hijos.values():
+            yield from hija.todas()
+
+
+# Colecciones de cada archivo de datos que pasan a tablas (resto de claves: tabla documentos)
+ESQUEMAS = {
+    'PROYECTOS_FILE': ('proyectos', {
+        'proyectos': Tabla('proyectos', 'id'),
+        'carros': Tabla('carros'),
+        'bonos': Tabla('bonos'),
+    }),
+    'ORDENES_FILE': ('ordenes', {
+        'ordenes': Tabla('ordenes', 'id'),
+    }),
+    'PUESTOS_FILE': ('puestos', {
+        'puestos': Tabla('puestos', 'id', hijos={
+            'maquinas': Tabla('maquinas', 'id', hijos={
+                'terminales_asignados': Tabla('asignaciones_terminales'),
+            }),
+        }),
+    }),
+}
+
+_SEPARADOR = '\x1f'  # entre la clave del padre y la del hijo
+
+
+class BaseDatosSQLite:
+    """
+    Archivo SQLite compartido: una conexión por hilo (y por proceso), modo WAL
+    para que las lecturas no bloqueen a las escrituras.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._esquema_creado = False
+
+    def conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is not None and self._local.pid == os.getpid():
+            return conexion
+
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=NORMAL')
+        self._local.conexion = conexion
+        self._local.pid = os.getpid()
+
+        with self._lock:
+            if not self._esquema_creado:
+                self._crear_esquema_base(conexion)
+                self._esquema_creado = True
+        return conexion
+
+    @staticmethod
+    def _crear_esquema_base(conexion) -> None:
+        conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS versiones (
+                documento TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS documentos (
+                documento TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                posicion INTEGER NOT NULL,
+                valor TEXT,
+                PRIMARY KEY (documento, clave)
+            );
+            CREATE TABLE IF NOT EXISTS progreso_eventos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bono TEXT,
+                terminal TEXT,
+                carro TEXT,
+                fecha TEXT,
+                datos TEXT NOT NULL
+            );
+            DROP INDEX IF EXISTS idx_progreso_eventos_bono;
+        """)
+
+    def crear_tablas(self, tablas: List[Tabla]) -> None:
+        """
+        Crear (si no existen) las tablas de un documento. Se borran los índices
+        secundarios de versiones anteriores: ninguna consulta los usaba y cada
+        escritura tenía que mantenerlos (sus columnas quedan a NULL en filas nuevas)
+        """
+        conexion = self.conexion()
+        for tabla in tablas:
+            conexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {tabla.nombre} ("
+                f"clave TEXT PRIMARY KEY, padre TEXT NOT NULL, posicion INTEGER NOT NULL, datos TEXT)"
+            )
+            antiguos = conexion.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name LIKE 'idx\\_%' ESCAPE '\\'",
+                (tabla.nombre,)
+            ).fetchall()
+            for (indice,) in antiguos:
+                conexion.execute(f"DROP INDEX IF EXISTS {indice}")
+
+    @contextmanager
+    def transaccion(self, escritura: bool = False):
+        """
+        Transacción (BEGIN IMMEDIATE si va a escribir: un único escritor a la vez)
+        Si el hilo ya está dentro de una transacción, se forma parte de ella
+        """
+        conexion = self.conexion()
+        if conexion.in_transaction:
+            yield conexion
+            return
+        conexion.execute('BEGIN IMMEDIATE' if escritura else 'BEGIN')
+        try:
+            yield conexion
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        conexion.execute('COMMIT')
+
+
+class DocumentoSQLite:
+    """
+    Un archivo de datos (proyectos, órdenes o puestos) guardado en tablas SQLite,
+    con la misma interfaz que JsonStore:
+
+        with documento.transaccion() as data:
+            data['ordenes'].append(orden)
+
+    Al guardar se comparan las filas del documento antes y después y solo se
+    insertan, actualizan o borran las que cambiaron. `firma()` es un contador de
+    versión que aumenta con cada escritura.
+    """
+
+    def __init__(self, bd: BaseDatosSQLite, nombre: str, colecciones: Dict[str, Tabla],
+                 por_defecto: Optional[Callable[[], Any]] = None):
+        self.bd = bd
+        self.nombre = nombre
+        self.colecciones = colecciones
+        self.por_defecto = por_defecto or dict
+        self._tablas = [t for tabla in colecciones.values() for t in tabla.todas()]
+        self._por_nombre = {tabla.nombre: tabla for tabla in self._tablas}
+        self._cache = None  # (version, filas, documento serializado con pickle)
+        bd.crear_tablas(self._tablas)
+
+    # --- Conversión documento <-> filas ---
+
+    @staticmethod
+    def _clave_elemento(tabla: Tabla, elemento, posicion: int, vistas: set) -> str:
+        """Clave estable de un elemento de lista: su id (o su valor) si es único, si no la posición"""
+        if isinstance(elemento, dict):
+            candidata = elemento.get(tabla.id_campo) if tabla.id_campo else None
+        else:
+            candidata = elemento if isinstance(elemento, (str, int)) else None
+        clave = str(candidata) if candidata is not None else None
+        if clave is None or clave in vistas:
+            clave = f"#{posicion}"
+            while clave in vistas:
+                clave += '#'
+        vistas.add(clave)
+        return clave
+
+    def _filas_coleccion(self, tabla: Tabla, valor, padre: str, filas: Dict) -> None:
+        if isinstance(valor, dict):
+            elementos = [(str(k), v) for k, v in valor.items()]
+        else:
+            vistas = set()
+            elementos = [(self._clave_elemento(tabla, v, i, vistas), v) for i, v in enumerate(valor)]
+
+        for posicion, (clave_local, elemento) in enumerate(elementos):
+            clave = f"{padre}{_SEPARADOR}{clave_local}" if padre else clave_local
+            datos = elemento
+            if isinstance(elemento, dict) and tabla.hijos:
+                datos = dict(elemento)
+                for campo, hija in tabla.hijos.items():
+                    if isinstance(datos.get(campo), list):
+                        self._filas_coleccion(hija, datos[campo], clave, filas)
+                        datos[campo] = {'$tabla': hija.nombre}
+            filas[tabla.nombre][clave] = (padre, posicion, json.dumps(datos, ensure_ascii=False))
+
+    def _filas(self, data) -> Dict[str, Dict]:
+        """Filas de cada tabla (y de la tabla documentos) para un documento"""
+        filas = {tabla.nombre: {} for tabla in self._tablas}
+        filas['documentos'] = {}
+        for posicion, (clave, valor) in enumerate(data.items()):
+            tabla = self.colecciones.get(clave)
+            if tabla is not None and isinstance(valor, (list, dict)):
+                self._filas_coleccion(tabla, valor, '', filas)
+                valor = {'$tabla': tabla.nombre, '$tipo': 'dict' if isinstance(valor, dict) else 'lista'}
+            filas['documentos'][clave] = (posicion, json.dumps(valor, ensure_ascii=False))
+        return filas
+
+    def _documento(self, filas: Dict[str, Dict]):
+        """Reconstruir el documento a partir de sus filas"""
+        por_padre = {}
+        for nombre in self._por_nombre:
+            grupos = {}
+            for clave, fila in filas[nombre].items():
+                grupos.setdefault(fila[0], []).append((fila[1], clave, fila[-1]))
+            for grupo in grupos.values():
+                grupo.sort()
+            por_padre[nombre] = grupos
+
+        def coleccion(tabla: Tabla, padre: str, tipo: str):
+            resultado = {} if tipo == 'dict' else []
+            for _, clave, datos_json in por_padre[tabla.nombre].get(padre, []):
+                elemento = json.loads(datos_json)
+                if isinstance(elemento, dict):
+                    for campo, hija in tabla.hijos.items():
+                        if elemento.get(campo) == {'$tabla': hija.nombre}:
+                            elemento[campo] = coleccion(hija, clave, 'lista')
+                if tipo == 'dict':
+                    resultado[clave] = elemento
+                else:
+                    resultado.append(elemento)
+            return resultado
+
+        data = {}
+        for clave, (_, valor_json) in sorted(filas['documentos'].items(), key=lambda item: item[1][0]):
+            valor = json.loads(valor_json)
+            if isinstance(valor, dict) and '$tabla' in valor and clave in self.colecciones:
+                valor = coleccion(self.colecciones[clave], '', valor.get('$tipo', 'lista'))
+            data[clave] = valor
+        return data
+
+    # --- Acceso a la base de datos ---
+
+    def _version(self, conexion) -> Optional[int]:
+        fila = conexion.execute('SELECT version FROM versiones WHERE documento = ?', (self.nombre,)).fetchone()
+        return fila[0] if fila else None
+
+    def _leer_filas(self, conexion) -> Dict[str, Dict]:
+        filas = {}
+        for tabla in self._tablas:
+            cursor = conexion.execute(f"SELECT {', '.join(tabla.columnas)} FROM {tabla.nombre}")
+            filas[tabla.nombre] = {fila[0]: tuple(fila[1:]) for fila in cursor}
+        cursor = conexion.execute(
+            'SELECT clave, posicion, valor FROM documentos WHERE documento = ?', (self.nombre,)
+        )
+        filas['documentos'] = {clave: (posicion, valor) for clave, posicion, valor in cursor}
+        return filas
+
+    def _cargar(self, conexion):
+        """(version, filas, documento nuevo), usando la caché si no hubo escrituras"""
+        version = self._version(conexion)
+        if version is None:
+            return None, None, self.por_defecto()
+
+        cache = self._cache
+        if cache is not None and cache[0] == version:
+            return version, cache[1], pickle.loads(cache[2])
+
+        filas = self._leer_filas(conexion)
+        data = self._documento(filas)
+        self._cache = (version, filas, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        return version, filas, data
+
+    def _volcar(self, conexion, version, filas_antes, data) -> None:
+        """Escribir solo las filas que cambiaron y aumentar la versión"""
+        filas = self._filas(data)
+        filas_antes = filas_antes or {nombre: {} for nombre in filas}
+
+        for tabla in self._tablas:
+            antes, despues = filas_antes[tabla.nombre], filas[tabla.nombre]
+            borradas = [(clave,) for clave in antes if clave not in despues]
+            cambiadas = [(clave,) + fila for clave, fila in despues.items() if antes.get(clave) != fila]
+            if borradas:
+                conexion.executemany(f"DELETE FROM {tabla.nombre} WHERE clave = ?", borradas)
+            if cambiadas:
+                marcadores = ', '.join('?' * len(tabla.columnas))
+                conexion.executemany(
+                    f"INSERT OR REPLACE INTO {tabla.nombre} ({', '.join(tabla.columnas)}) VALUES ({marcadores})",
+                    cambiadas
+                )
+
+        antes, despues = filas_antes['documentos'], filas['documentos']
+        conexion.executemany(
+            'DELETE FROM documentos WHERE documento = ? AND clave = ?',
+            [(self.nombre, clave) for clave in antes if clave not in despues]
+        )
+        conexion.executemany(
+            'INSERT OR REPLACE INTO documentos (documento, clave, posicion, valor) VALUES (?, ?, ?, ?)',
+            [(self.nombre, clave) + fila for clave, fila in despues.items() if antes.get(clave) != fila]
+        )
+
+        version = (version or 0) + 1
+        conexion.execute(
+            'INSERT INTO versiones (documento, version) VALUES (?, ?) '
+            'ON CONFLICT(documento) DO UPDATE SET version = excluded.version',
+            (self.nombre, version)
+        )
+        self._cache = (version, filas, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+    # --- Interfaz de JsonStore ---
+
+    def existe(self) -> bool:
+        return self.firma() is not None
+
+    def firma(self):
+        """Versión actual del documento, None si aún no se ha guardado nunca"""
+        return self._version(self.bd.conexion())
+
+    def leer(self):
+        """Copia del documento (o del valor por defecto si no existe)"""
+        with self.bd.transaccion() as conexion:
+            return self._cargar(conexion)[2]
+
+    def escribir(self, data) -> None:
+        """Reemplazar el documento completo (solo se escriben las filas distintas)"""
+        with self.bd.transaccion(escritura=True) as conexion:
+            version, filas_antes, _ = self._cargar(conexion)
+            self._volcar(conexion, version, filas_antes, data)
+
+    @contextmanager
+    def transaccion(self):
+        """Leer, modificar y guardar dentro de una transacción de escritura"""
+        with self.bd.transaccion(escritura=True) as conexion:
+            version, filas_antes, data = self._cargar(conexion)
+            yield data
+            if version is None or self._filas(data) != filas_antes:
+                self._volcar(conexion, version, filas_antes, data)
+
+
+class DiarioProgresoSQLite:
+    """
+    Diario de progreso de bonos en la tabla progreso_eventos
+    (misma interfaz que DiarioProgreso: cada escaneo inserta una única fila)
+    """
+
+    def __init__(self, bd: BaseDatosSQLite):
+        self.bd = bd
+
+    def firma(self):
+        fila = self.bd.conexion().execute('SELECT COUNT(*), MAX(id) FROM progreso_eventos').fetchone()
+        return tuple(fila)
+
+    @staticmethod
+    def _insertar(conexion, evento: Dict) -> None:
+        conexion.execute(
+            'INSERT INTO progreso_eventos (bono, terminal, carro, fecha, datos) VALUES (?, ?, ?, ?, ?)',
+            (evento.get('bono'), evento.get('terminal'), evento.get('carro'),
+             datetime.now().isoformat(), json.dumps(evento, ensure_ascii=False))
+        )
+
+    def anotar(self, evento: Dict) -> None:
+        with self.bd.transaccion(escritura=True) as conexion:
+            self._insertar(conexion, evento)
+
+    def leer(self, generacion: Optional[str] = None) -> List[Dict]:
+        """Eventos pendientes (snapshot y eventos se confirman juntos: no hay generaciones)"""
+        cursor = self.bd.conexion().execute('SELECT datos FROM progreso_eventos ORDER BY id')
+        return [json.loads(datos) for (datos,) in cursor]
+
+    def num_eventos(self) -> int:
+        return self.bd.conexion().execute('SELECT COUNT(*) FROM progreso_eventos').fetchone()[0]
+
+    def compactar(self, escribir_snapshot: Callable[[Optional[str]], None]) -> None:
+        """Guardar el snapshot y borrar los eventos en una única transacción"""
+        with self.bd.transaccion(escritura=True) as conexion:
+            escribir_snapshot(None)
+            conexion.execute('DELETE FROM progreso_eventos')
+
+
+_bd = None
+_documentos: Dict[str, DocumentoSQLite] = {}
+_lock = threading.Lock()
+
+
+def obtener_bd() -> BaseDatosSQLite:
+    """Base de datos compartida (Config.SQLITE_FILE), migrando los JSON la primera vez"""
+    global _bd
+    with _lock:
+        if _bd is None:
+            _bd = BaseDatosSQLite(Config.SQLITE_FILE)
+            migrar_desde_json(_bd)
+        return _bd
+
+
+def obtener_documento(clave_config: str, por_defecto: Optional[Callable[[], Any]] = None) -> DocumentoSQLite:
+    """DocumentoSQLite compartido para el archivo de datos `clave_config` (ver ESQUEMAS)"""
+    bd = obtener_bd()
+    with _lock:
+        documento = _documentos.get(clave_config)
+        if documento is None:
+            nombre, colecciones = ESQUEMAS[clave_config]
+            documento = DocumentoSQLite(bd, nombre, colecciones, por_defecto=por_defecto)
+            _documentos[clave_config] = documento
+        return documento
+
+
+def migrar_desde_json(bd: BaseDatosSQLite) -> None:
+    """
+    Migración única de los archivos JSON a SQLite: cada documento se importa si
+    todavía no existe en la base de datos y su archivo JSON sí. Los eventos
+    pendientes del diario de progreso JSON se aplican a los proyectos antes de
+    importarlos; una vez migrados, el diario se compacta también en el snapshot
+    JSON, para que volver al motor JSON no reaplique eventos ya importados.
+    Se hace con el bloqueo entre procesos de los proyectos tomado (ver ProyectoManager).
+    """
+    from app.json_store import bloqueo_archivo
+
+    with bloqueo_archivo(Config.PROYECTOS_LOCK_FILE):
+        _migrar_desde_json(bd)
+
+
+def _migrar_desde_json(bd: BaseDatosSQLite) -> None:
+    from app.diario_progreso import DiarioProgreso, aplicar_evento_progreso
+    from app.json_store import obtener_store
+
+    for clave_config, (nombre, colecciones) in ESQUEMAS.items():
+        documento = DocumentoSQLite(bd, nombre, colecciones)
+        ruta = getattr(Config, clave_config)
+        if documento.existe() or not os.path.exists(ruta):
+            continue
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            diario, eventos = None, []
+            if clave_config == 'PROYECTOS_FILE':
+                diario = DiarioProgreso(Config.PROYECTOS_JOURNAL_FILE)
+                eventos = diario.leer(data.get('generacion_diario'))
+                for evento in eventos:
+                    aplicar_evento_progreso(data, evento)
+            with bd.transaccion(escritura=True) as conexion:
+                documento._volcar(conexion, None, None, data)
+            print(f"Migrado {ruta} a SQLite ({Config.SQLITE_FILE})")
+        except Exception as e:
+            print(f"Error migrando {ruta} a SQLite: {e}")
+            continue
+
+        if eventos:
+            def escribir_snapshot(generacion, data=data):
+                data['generacion_diario'] = generacion
+                obtener_store(ruta).escribir(data)
+
+            try:
+                diario.compactar(escribir_snapshot)
+            except Exception as e:
+                print(f"No se pudo compactar el diario {Config.PROYECTOS_JOURNAL_FILE}: {e}")
@@ -0,0 +1,36 @@
+"""
+Selección del motor de almacenamiento de los archivos de datos
+(Config.STORAGE_BACKEND: 'json' por defecto o 'sqlite')
+"""
+from typing import Any, Callable, Optional
+
+from config import Config
+from app.json_store import obtener_store
+from app.diario_progreso import DiarioProgreso
+
+
+def usa_sqlite() -> bool:
+    return Config.STORAGE_BACKEND == 'sqlite'
+
+
+def obtener_almacen(clave_config: str, por_defecto: Optional[Callable[[], Any]] = None,
+                    ruta: Optional[str] = None):
+    """
+    Almacén del archivo de datos configurado en `clave_config` (p.ej. 'ORDENES_FILE').
+    Con el motor SQLite, proyectos, órdenes y puestos se guardan en tablas; el resto
+    de archivos (y todos con el motor JSON) siguen siendo un JsonStore.
+    Ambos ofrecen leer(), escribir(), transaccion(), existe() y firma().
+    """
+    if usa_sqlite():
+        from app.almacen_sqlite import ESQUEMAS, obtener_documento
+        if clave_config in ESQUEMAS:
+            return obtener_documento(clave_config, por_defecto)
+    return obtener_store(ruta or getattr(Config, clave_config), por_defecto)
+
+
+def obtener_diario_progreso():
+    """Diario de progreso de bonos del motor configurado"""
+    if usa_sqlite():
+        from app.almacen_sqlite import DiarioProgresoSQLite, obtener_bd
+        return DiarioProgresoSQLite(obtener_bd())
+    return DiarioProgreso(Config.PROYECTOS_JOURNAL_FILE)
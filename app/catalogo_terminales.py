@@ -0,0 +1,200 @@
+"""
+Catálogo de terminales de todos los cortes registrados
+Escanea los Excel en paralelo (pool de procesos) y guarda el resultado por archivo,
+de modo que al registrar un corte nuevo solo se parsea ese archivo.
+
+El catálogo se persiste en data/ para que, tras reiniciar el servidor, la primera
+petición no tenga que volver a parsear todos los Excel.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config
+from app.modelo_corte import terminales_unicos
+from app.excel_cache import excel_cache, leer_hoja
+from app.json_store import firma_archivo, obtener_store
+
+
+def _escanear_archivo(filepath: str, sheet) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Terminales únicos de un archivo (se ejecuta en un proceso del pool)
+    Retorna (terminales, None) o (None, mensaje de error)
+    """
+    try:
+        return terminales_unicos(leer_hoja(filepath, sheet)), None
+    except Exception as e:
+        return None, str(e)
+
+
+class CatalogoTerminales:
+    """
+    Terminales por archivo Excel, con invalidación por firma (mtime, tamaño) y hoja.
+
+    Solo se vuelven a parsear los archivos nuevos o modificados. Si hay varios
+    pendientes se reparten entre procesos (el parseo de openpyxl no libera el GIL);
+    si solo hay uno se parsea y compila en el propio proceso, a través de excel_cache.
+
+    Si se indica `archivo`, el catálogo se lee de ese JSON (JsonStore) la primera vez
+    que se usa y se vuelve a guardar cada vez que cambia.
+    """
+
+    def __init__(self, max_workers: int = 1, archivo: Optional[str] = None):
+        self.max_workers = max_workers
+        self.archivo = archivo
+        self._por_archivo = {}
+        self._cargado = archivo is None
+        self._lock = threading.Lock()
+        self._lock_guardado = threading.Lock()
+        self._executor = None
+
+    def _cargar(self) -> None:
+        """Leer el catálogo persistido (solo la primera vez)"""
+        with self._lock:
+            if self._cargado:
+                return
+            self._cargado = True
+            store = obtener_store(self.archivo, indent=None)
+            if not store.existe():
+                return
+            try:
+                data = store.leer()
+                for ruta, entrada in data.get('archivos', {}).items():
+                    self._por_archivo[ruta] = {
+                        'firma': tuple(entrada['firma']),
+                        'hoja': entrada.get('hoja'),
+                        'terminales': entrada['terminales']
+                    }
+            except Exception as e:
+                print(f"Catálogo de terminales inválido {self.archivo}, se reconstruirá: {e}")
+                self._por_archivo.clear()
+
+    def _guardar(self) -> None:
+        """Persistir el catálogo"""
+        if self.archivo is None:
+            return
+        with self._lock_guardado:
+            with self._lock:
+                data = {
+                    'archivos': {
+                        ruta: {
+                            'firma': list(entrada['firma']),
+                            'hoja': entrada['hoja'],
+                            'terminales': entrada['terminales']
+                        }
+                        for ruta, entrada in self._por_archivo.items()
+                    }
+                }
+            try:
+                obtener_store(self.archivo, indent=None).escribir(data)
+            except Exception as e:
+                print(f"No se pudo guardar el catálogo de terminales: {e}")
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        """Pool de procesos perezoso y reutilizado entre escaneos ('spawn': seguro con hilos)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _descartar_executor(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _procesar(self, rutas: List[str], sheet) -> List[Tuple[Optional[List[str]], Optional[str]]]:
+        """Escanear los archivos pendientes, en paralelo si compensa"""
+        if len(rutas) > 1 and self.max_workers > 1:
+            try:
+                return list(self._obtener_executor().map(_escanear_archivo, rutas, [sheet] * len(rutas)))
+            except BrokenProcessPool as e:
+                print(f"Pool de escaneo de terminales caído, se escanea en serie: {e}")
+                self._descartar_executor()
+
+        resultados = []
+        for ruta in rutas:
+            try:
+                # En el propio proceso: terminales del modelo compilado (y queda en caché)
+                resultados.append((list(excel_cache.cargar(ruta, sheet).terminales), None))
+            except Exception as e:
+                resultados.append((None, str(e)))
+        return resultados
+
+    def escanear(self, upload_folder: str, archivos: List[str], sheet) -> Tuple[Dict[str, List[str]], List[str]]:
+        """
+        Terminales de cada archivo de `archivos` (nombres dentro de upload_folder)
+        Retorna ({archivo: [terminales]}, [archivos con error])
+        """
+        self._cargar()
+
+        resultados = {}
+        archivos_con_error = []
+        pendientes = []
+
+        for archivo in dict.fromkeys(archivos):
+            ruta = os.path.join(upload_folder, archivo)
+            firma = firma_archivo(ruta)
+            if firma is None:
+                archivos_con_error.append(archivo)
+                continue
+
+            with self._lock:
+                entrada = self._por_archivo.get(os.path.abspath(ruta))
+            if entrada is not None and entrada['firma'] == firma and entrada['hoja'] == sheet:
+                resultados[archivo] = entrada['terminales']
+            else:
+                pendientes.append((archivo, ruta, firma))
+
+        if not pendientes:
+            return resultados, archivos_con_error
+
+        escaneos = self._procesar([ruta for _, ruta, _ in pendientes], sheet)
+        for (archivo, ruta, firma), (terminales, error) in zip(pendientes, escaneos):
+            if error is not None:
+                archivos_con_error.append(f"{archivo} (error: {error})")
+                continue
+            with self._lock:
+                self._por_archivo[os.path.abspath(ruta)] = {
+                    'firma': firma,
+                    'hoja': sheet,
+                    'terminales': terminales
+                }
+            resultados[archivo] = terminales
+
+        self._guardar()
+        return resultados, archivos_con_error
+
+    def terminales(self, upload_folder: str, archivos: List[str], sheet) -> Tuple[Set[str], List[str], List[str]]:
+        """
+        Unión de los terminales de todos los archivos
+        Retorna (terminales, archivos procesados, archivos con error)
+        """
+        por_archivo, archivos_con_error = self.escanear(upload_folder, archivos, sheet)
+        todos = set()
+        for terminales in por_archivo.values():
+            todos.update(terminales)
+        return todos, list(por_archivo), archivos_con_error
+
+    def invalidar(self, filepath: Optional[str] = None) -> None:
+        """Olvidar un archivo concreto o todo el catálogo si filepath es None"""
+        self._cargar()
+        with self._lock:
+            if filepath is None:
+                self._por_archivo.clear()
+            else:
+                self._por_archivo.pop(os.path.abspath(filepath), None)
+        self._guardar()
+
+
+# Instancia global compartida por todas las peticiones
+catalogo_terminales = CatalogoTerminales(
+    max_workers=Config.TERMINALES_SCAN_WORKERS,
+    archivo=Config.CATALOGO_TERMINALES_FILE
+)
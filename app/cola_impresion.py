@@ -0,0 +1,170 @@
+"""
+Cola de impresión en segundo plano
+Un único hilo trabajador envía las etiquetas a la impresora, de modo que generar un
+bono o registrar un escaneo no espera a lpr/lpstat (timeouts de hasta 10 s).
+"""
+import copy
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _crear_impresora():
+    from app.printer_manager import get_printer_manager
+    return get_printer_manager()
+
+
+class ColaImpresion:
+    """
+    Cola acotada de trabajos de impresión con un hilo trabajador persistente.
+
+    Un trabajo es una lista de etiquetas (zpl, metadata) que se envía a la impresora
+    como un único trabajo raw (PrinterManager.print_zpl_batch).
+    Estados: pendiente -> imprimiendo -> completado | error. Se conserva el historial
+    de los últimos `max_historial` trabajos para la API de estado.
+    """
+
+    def __init__(self, max_pendientes: int = 100, max_historial: int = 200,
+                 crear_impresora: Callable = _crear_impresora):
+        self.max_historial = max_historial
+        self.crear_impresora = crear_impresora
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self._terminado = threading.Condition(self._lock)
+        self._hilo = None
+        self._pid = None
+
+    def _asegurar_trabajador(self) -> None:
+        """Arrancar el hilo trabajador la primera vez (y de nuevo tras un fork)"""
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._trabajar, name='cola-impresion', daemon=True)
+            self._hilo.start()
+
+    def encolar(self, etiquetas: List[Tuple[str, Dict]], descripcion: str = '',
+                bono: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Añadir un trabajo sin esperar a que se imprima
+        Retorna (trabajo, None) o (None, mensaje de error) si la cola está llena
+        """
+        trabajo = {
+            'id': uuid.uuid4().hex[:12],
+            'descripcion': descripcion,
+            'bono': bono,
+            'estado': 'pendiente',
+            'num_etiquetas': len(etiquetas),
+            'impresas': 0,
+            'resultados': [],
+            'fecha_creacion': datetime.now().isoformat(),
+            'fecha_inicio': None,
+            'fecha_fin': None,
+            'message': 'En cola'
+        }
+
+        with self._lock:
+            self._trabajos[trabajo['id']] = trabajo
+            while len(self._trabajos) > self.max_historial:
+                self._trabajos.popitem(last=False)
+            copia = copy.deepcopy(trabajo)
+
+        try:
+            self._cola.put_nowait((trabajo['id'], list(etiquetas)))
+        except queue.Full:
+            with self._lock:
+                self._trabajos.pop(trabajo['id'], None)
+            logger.error(f"Cola de impresión llena, se descarta el trabajo: {descripcion}")
+            return None, 'Cola de impresión llena'
+
+        self._asegurar_trabajador()
+        return copia, None
+
+    def _trabajar(self) -> None:
+        while True:
+            trabajo_id, etiquetas = self._cola.get()
+            try:
+                self._procesar(trabajo_id, etiquetas)
+            except Exception as e:
+                logger.error(f"Error en la cola de impresión: {e}")
+                self._actualizar(trabajo_id, estado='error', message=str(e),
+                                 fecha_fin=datetime.now().isoformat())
+            finally:
+                self._cola.task_done()
+
+    def _actualizar(self, trabajo_id: str, **cambios) -> None:
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is not None:
+                trabajo.update(cambios)
+                if trabajo['estado'] in ('completado', 'error'):
+                    self._terminado.notify_all()
+
+    def _procesar(self, trabajo_id: str, etiquetas: List[Tuple[str, Dict]]) -> None:
+        self._actualizar(trabajo_id, estado='imprimiendo', fecha_inicio=datetime.now().isoformat())
+        impresora = self.crear_impresora()
+
+        # Todas las etiquetas del trabajo en un único envío a la impresora
+        resultados = impresora.print_zpl_batch(etiquetas)
+        self._actualizar(trabajo_id, impresas=sum(1 for r in resultados if r.get('success')),
+                         resultados=resultados)
+
+        fallidas = [r for r in resultados if not r.get('success')]
+        if fallidas:
+            mensaje = f"{len(fallidas)} de {len(resultados)} etiquetas fallaron: {fallidas[0].get('message')}"
+        else:
+            mensaje = f"{len(resultados)} etiquetas enviadas"
+        logger.info(f"Trabajo de impresión {trabajo_id}: {mensaje}")
+        self._actualizar(trabajo_id, estado='error' if fallidas else 'completado', message=mensaje,
+                         fecha_fin=datetime.now().isoformat())
+
+    def obtener(self, trabajo_id: str) -> Optional[Dict]:
+        """Estado de un trabajo (copia), None si no existe o ya salió del historial"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return copy.deepcopy(trabajo) if trabajo is not None else None
+
+    def listar(self, bono: Optional[str] = None) -> List[Dict]:
+        """Trabajos del historial, más recientes primero (opcionalmente de un bono)"""
+        with self._lock:
+            trabajos = [t for t in reversed(self._trabajos.values()) if bono is None or t['bono'] == bono]
+            return copy.deepcopy(trabajos)
+
+    def esperar(self, trabajo_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Esperar a que un trabajo termine (hasta `timeout` segundos) y devolver su estado"""
+        with self._lock:
+            self._terminado.wait_for(
+                lambda: self._trabajos.get(trabajo_id, {}).get('estado', 'error') in ('completado', 'error'),
+                timeout=timeout
+            )
+            trabajo = self._trabajos.get(trabajo_id)
+            return copy.deepcopy(trabajo) if trabajo is not None else None
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            por_estado = {}
+            for trabajo in self._trabajos.values():
+                por_estado[trabajo['estado']] = por_estado.get(trabajo['estado'], 0) + 1
+        return {
+            'en_cola': self._cola.qsize(),
+            'capacidad': self._cola.maxsize,
+            'trabajador_activo': self._hilo is not None and self._hilo.is_alive(),
+            'trabajos': por_estado
+        }
+
+
+# Instancia global compartida por el gestor de proyectos y las rutas
+cola_impresion = ColaImpresion(
+    max_pendientes=Config.PRINT_QUEUE_MAX,
+    max_historial=Config.PRINT_QUEUE_HISTORIAL
+)
@@ -0,0 +1,88 @@
+"""
+Vista inmutable de una hoja Excel de corte, segura para usar desde varios hilos
+"""
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from app.indice_terminales import IndiceTerminales
+from app.modelo_corte import ModeloCorte
+
+
+class DatasetExcel:
+    """
+    Hoja Excel ya cargada y compilada (ModeloCorte) de un archivo concreto.
+
+    A diferencia de ExcelManager, no tiene estado "actual" que otra petición pueda
+    cambiar: cada handler obtiene su propio DatasetExcel por nombre de archivo
+    (ExcelManager.obtener_dataset) y trabaja solo con él. El modelo viene de la
+    caché compartida (excel_cache) y NO se debe modificar; las búsquedas de filas
+    devuelven siempre copias.
+    """
+
+    __slots__ = ('archivo', 'hoja', 'modelo')
+
+    def __init__(self, archivo: str, hoja, modelo: ModeloCorte):
+        object.__setattr__(self, 'archivo', archivo)
+        object.__setattr__(self, 'hoja', hoja)
+        object.__setattr__(self, 'modelo', modelo)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('DatasetExcel es inmutable')
+
+    def __delattr__(self, nombre):
+        raise AttributeError('DatasetExcel es inmutable')
+
+    def __len__(self) -> int:
+        return len(self.modelo)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.modelo.df
+
+    @property
+    def indice(self) -> IndiceTerminales:
+        return self.modelo.indice
+
+    def buscar_terminal_df(self, terminal: str) -> pd.DataFrame:
+        """
+        Filas donde aparece el terminal en 'De Terminal' o 'Para Terminal'
+        (insensible a mayúsculas), con la columna extra 'tipo_conexion':
+        origen, destino o ambas
+        """
+        posiciones, tipos = self.modelo.indice.buscar(terminal)
+        if posiciones.size == 0:
+            return pd.DataFrame()
+
+        df = self.modelo.df.iloc[posiciones].copy()
+        df['tipo_conexion'] = tipos
+        return df
+
+    def buscar_terminal(self, terminal: str) -> List[Dict]:
+        """Igual que buscar_terminal_df, como lista de registros"""
+        df = self.buscar_terminal_df(terminal)
+        if df.empty:
+            return []
+        return df.to_dict('records')
+
+    def grupos_terminal(self, terminal: str) -> Tuple[int, Dict]:
+        """
+        Grupos cable + elemento del terminal (compilados al cargar la hoja)
+        Retorna (filas donde aparece el terminal, grupos); los grupos son compartidos
+        """
+        return self.modelo.grupos_terminal(terminal)
+
+    def elementos_por_codigo_cable(self, codigo_cable: str) -> List[Dict]:
+        """Elementos (De Elemento) asociados a un código de cable, ordenados por elemento"""
+        return self.modelo.elementos_por_codigo_cable(codigo_cable)
+
+    def listar_terminales_unicos(self) -> List[str]:
+        """
+        Terminales únicos de la hoja (De Terminal y Para Terminal),
+        excluyendo 'S/T' y valores vacíos, ordenados alfabéticamente
+        """
+        return list(self.modelo.terminales)
+
+    def registros(self) -> List[Dict]:
+        """Todas las filas de la hoja como lista de diccionarios (copia)"""
+        return self.modelo.df.to_dict('records')
@@ -0,0 +1,156 @@
+"""
+Diario (journal) de progreso de bonos en formato JSONL
+Cada escaneo de un operario añade una línea en lugar de reescribir todo
+proyectos_carros.json; el diario se compacta periódicamente en el snapshot.
+"""
+import json
+import os
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from app.json_store import bloqueo_archivo, firma_archivo
+
+
+def aplicar_evento_progreso(proyectos: Dict, evento: Dict) -> None:
+    """Reaplicar un evento del diario sobre los proyectos cargados del snapshot"""
+    if evento.get('tipo') != 'progreso_bono':
+        return
+    bono = proyectos.get('bonos', {}).get(evento.get('bono'))
+    if not bono:
+        return
+
+    bono.setdefault('progreso', {})[evento['terminal']] = evento['progreso']
+    bono.setdefault('progreso_por_carro', {})[evento['carro']] = evento['progreso_carro']
+    if evento.get('estado') is not None:
+        bono['estado'] = evento['estado']
+    if evento.get('fecha_finalizacion') is not None:
+        bono['fecha_finalizacion'] = evento['fecha_finalizacion']
+
+
+class DiarioProgreso:
+    """
+    Archivo de solo-añadir con un evento JSON por línea.
+
+    - anotar(evento): añade una línea (coste constante, independiente del histórico).
+    - leer(generacion): eventos en orden; una última línea incompleta (corte de luz
+      a mitad de escritura) se ignora.
+    - compactar(escribir_snapshot): guarda el snapshot y empieza un diario nuevo,
+      con el bloqueo del diario tomado durante ambos pasos (ningún proceso puede
+      anotar un evento entre medias y perderlo).
+
+    Generaciones: la primera línea del diario es una cabecera {"generacion": id} y
+    el snapshot guarda la generación del diario que empieza tras él. Un diario de
+    otra generación ya está incluido en el snapshot (p. ej. el proceso cayó entre
+    guardar el snapshot y sustituir el diario) y no se reaplica: así un reset de
+    progreso o un bono borrado y vuelto a crear no recuperan eventos antiguos.
+    Un diario sin cabecera (versiones anteriores) es de la generación None.
+
+    El bloqueo entre procesos usa un archivo <ruta>.lock aparte, porque el diario
+    se sustituye en cada compactación.
+    """
+
+    def __init__(self, ruta: str, sincronizar: bool = True):
+        self.ruta = ruta
+        self.sincronizar = sincronizar
+        self._lock = threading.Lock()
+        self._num_eventos = None
+        self._generacion = None  # generación del diario vigente (la del último snapshot leído o escrito)
+
+    def firma(self):
+        """Firma (mtime, tamaño) actual del diario, None si no existe"""
+        return firma_archivo(self.ruta)
+
+    def _bloqueo(self):
+        return bloqueo_archivo(f"{self.ruta}.lock")
+
+    @staticmethod
+    def _cabecera(generacion: str) -> str:
+        return json.dumps({'generacion': generacion}) + '\n'
+
+    def _reiniciar(self, generacion: Optional[str]) -> None:
+        """Sustituir el diario (escritura atómica) por uno vacío de la generación indicada"""
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            if generacion is not None:
+                f.write(self._cabecera(generacion))
+            f.flush()
+            if self.sincronizar:
+                os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+        self._generacion = generacion
+        self._num_eventos = 0
+
+    def anotar(self, evento: Dict) -> None:
+        """Añadir un evento al final del diario"""
+        linea = json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock, self._bloqueo():
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            nuevo = not os.path.exists(self.ruta)
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                if nuevo and self._generacion is not None:
+                    f.write(self._cabecera(self._generacion))
+                f.write(linea)
+                f.flush()
+                if self.sincronizar:
+                    os.fsync(f.fileno())
+            if self._num_eventos is not None:
+                self._num_eventos += 1
+
+    def leer(self, generacion: Optional[str] = None) -> List[Dict]:
+        """
+        Eventos del diario posteriores al snapshot de la generación `generacion`,
+        en el orden en que se anotaron (ninguno si el diario es de otra generación)
+        """
+        eventos = []
+        generacion_diario = None
+        with self._lock:
+            self._generacion = generacion
+            if not os.path.exists(self.ruta):
+                self._num_eventos = 0
+                return eventos
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                for num_linea, linea in enumerate(f, start=1):
+                    linea = linea.strip()
+                    if not linea:
+                        continue
+                    try:
+                        evento = json.loads(linea)
+                    except json.JSONDecodeError:
+                        print(f"Línea {num_linea} del diario {self.ruta} inválida, se ignora")
+                        continue
+                    if num_linea == 1 and isinstance(evento, dict) and set(evento) == {'generacion'}:
+                        generacion_diario = evento['generacion']
+                        continue
+                    eventos.append(evento)
+
+            if generacion_diario != generacion:
+                # El snapshot ya incluye este diario: se descarta para no volver a aplicarlo
+                print(f"Diario {self.ruta} anterior al snapshot ({len(eventos)} eventos ya incluidos), se reinicia")
+                with self._bloqueo():
+                    self._reiniciar(generacion)
+                return []
+
+            self._num_eventos = len(eventos)
+        return eventos
+
+    def num_eventos(self) -> int:
+        """Eventos pendientes de compactar"""
+        if self._num_eventos is None:
+            self.leer(self._generacion)
+        return self._num_eventos
+
+    def compactar(self, escribir_snapshot: Callable[[Optional[str]], None]) -> None:
+        """
+        Guardar el snapshot que ya contiene todos los eventos y empezar un diario nuevo
+        `escribir_snapshot(generacion)` debe guardar la generación en el snapshot
+        """
+        generacion = uuid.uuid4().hex
+        with self._lock, self._bloqueo():
+            escribir_snapshot(generacion)
+            self._reiniciar(generacion)
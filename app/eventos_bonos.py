@@ -0,0 +1,79 @@
+"""
+Bus de eventos en memoria para notificar cambios de progreso de los bonos
+Lo usa el endpoint SSE /api/bonos/<nombre_bono>/stream: cada conexión se suscribe
+al canal del bono y recibe los eventos que publica ProyectoManager al guardar.
+"""
+import json
+import queue
+import threading
+from typing import Dict, Optional, Set
+
+from config import Config
+
+
+class BusEventos:
+    """
+    Publicación/suscripción por canal (nombre del bono) dentro del proceso.
+
+    Cada suscriptor tiene una cola acotada; si un cliente lento la llena, se
+    descartan sus eventos pendientes y se le envía 'resincronizar' para que
+    vuelva a pedir el estado completo en lugar de perder deltas.
+
+    Como cada suscriptor es un stream que ocupa un hilo del servidor, el total de
+    suscriptores del proceso está limitado a `max_suscriptores` (None = sin límite).
+    """
+
+    def __init__(self, max_pendientes: int = 100, max_suscriptores: Optional[int] = None):
+        self.max_pendientes = max_pendientes
+        self.max_suscriptores = max_suscriptores
+        self._suscriptores: Dict[str, Set[queue.Queue]] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def suscribir(self, canal: str) -> Optional[queue.Queue]:
+        """Cola del nuevo suscriptor, o None si ya se alcanzó el máximo de suscriptores"""
+        cola = queue.Queue(maxsize=self.max_pendientes)
+        with self._lock:
+            if self.max_suscriptores is not None and self._total >= self.max_suscriptores:
+                return None
+            self._suscriptores.setdefault(canal, set()).add(cola)
+            self._total += 1
+        return cola
+
+    def cancelar(self, canal: str, cola: queue.Queue) -> None:
+        with self._lock:
+            colas = self._suscriptores.get(canal)
+            if colas is None or cola not in colas:
+                return
+            colas.discard(cola)
+            self._total -= 1
+            if not colas:
+                del self._suscriptores[canal]
+
+    def num_suscriptores(self, canal: str) -> int:
+        with self._lock:
+            return len(self._suscriptores.get(canal, ()))
+
+    def publicar(self, canal: str, tipo: str, datos=None) -> None:
+        """
+        Enviar un evento a todos los suscriptores del canal (sin bloquear).
+        Los datos se serializan aquí, en el momento de publicar, para que los
+        suscriptores no lean estructuras que se siguen modificando.
+        """
+        with self._lock:
+            colas = list(self._suscriptores.get(canal, ()))
+        if not colas:
+            return
+
+        mensaje = (tipo, json.dumps(datos, ensure_ascii=False))
+        for cola in colas:
+            try:
+                cola.put_nowait(mensaje)
+            except queue.Full:
+                with cola.mutex:
+                    cola.queue.clear()
+                cola.put_nowait(('resincronizar', 'null'))
+
+
+# Instancia global compartida por el gestor de proyectos y las rutas
+bus_eventos = BusEventos(max_suscriptores=Config.SSE_MAX_CONEXIONES)
@@ -0,0 +1,188 @@
+"""
+Caché de hojas Excel ya parseadas para el sistema de engastado
+Evita repetir pd.read_excel (openpyxl) sobre libros que no han cambiado
+
+Además de la caché en memoria, cada hoja leída se guarda en un archivo binario
+auxiliar (sidecar pickle) junto al Excel en data/cortes/, de modo que tras un
+reinicio no haga falta volver a parsear el XLSX.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pandas as pd
+
+from config import Config
+from app.json_store import firma_archivo
+from app.modelo_corte import ModeloCorte
+
+
+class ExcelCache:
+    """
+    Caché LRU de hojas compiladas (ModeloCorte), compartida por todo el proceso.
+
+    Cada entrada se identifica por (ruta, hoja) y guarda la firma (mtime, tamaño)
+    del archivo con la que se leyó: si el archivo cambia en disco, la entrada deja
+    de ser válida y se vuelve a parsear. Las entradas menos usadas se expulsan
+    cuando se supera el presupuesto de memoria; cada entrada cuenta con el tamaño
+    completo del modelo (DataFrame + índices y grupos precalculados).
+
+    IMPORTANTE: los modelos y DataFrames devueltos son compartidos; no se deben modificar.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes_totales = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+
+    def obtener(self, filepath: str, sheet) -> pd.DataFrame:
+        """
+        Obtener la hoja `sheet` de `filepath`, parseándola solo si no está en caché
+        o si el archivo ha cambiado desde la última lectura
+        """
+        return self.cargar(filepath, sheet).df
+
+    def cargar(self, filepath: str, sheet) -> ModeloCorte:
+        """
+        Igual que obtener(), pero devuelve la hoja compilada (ModeloCorte) con todos
+        sus índices, que se construyen una única vez al leer el archivo
+        """
+        clave = (os.path.abspath(filepath), sheet)
+        firma = firma_archivo(filepath)
+        if firma is None:
+            raise FileNotFoundError(filepath)
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada['firma'] == firma:
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                return entrada['modelo']
+            self.misses += 1
+
+        # Leer fuera del lock para no bloquear lecturas de otros archivos
+        modelo = ModeloCorte(leer_hoja(filepath, sheet))
+        tamano = modelo.tamano_bytes
+
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes_totales -= anterior['bytes']
+
+            self._entradas[clave] = {'firma': firma, 'modelo': modelo, 'bytes': tamano}
+            self._bytes_totales += tamano
+            self._expulsar()
+
+        return modelo
+
+    def _expulsar(self) -> None:
+        """Expulsar entradas LRU hasta respetar el presupuesto (siempre queda la más reciente)"""
+        while self._bytes_totales > self.max_bytes and len(self._entradas) > 1:
+            _, entrada = self._entradas.popitem(last=False)
+            self._bytes_totales -= entrada['bytes']
+            self.expulsiones += 1
+
+    def invalidar(self, filepath: Optional[str] = None) -> None:
+        """Eliminar de la caché un archivo concreto (todas sus hojas) o todo si filepath es None"""
+        with self._lock:
+            if filepath is None:
+                self._entradas.clear()
+                self._bytes_totales = 0
+                return
+
+            ruta = os.path.abspath(filepath)
+            for clave in [c for c in self._entradas if c[0] == ruta]:
+                self._bytes_totales -= self._entradas.pop(clave)['bytes']
+
+    def estadisticas(self) -> Dict:
+        """Contadores de uso de la caché para el panel de administración"""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes_totales,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expulsiones': self.expulsiones,
+                'ratio_hits': round(self.hits / consultas, 4) if consultas else 0.0,
+                'archivos': [
+                    {
+                        'archivo': os.path.basename(ruta),
+                        'hoja': hoja,
+                        'bytes': entrada['bytes']
+                    }
+                    for (ruta, hoja), entrada in self._entradas.items()
+                ]
+            }
+
+
+SIDECAR_EXT = '.pkl'
+
+
+def ruta_sidecar(filepath: str, sheet) -> str:
+    """Ruta del sidecar binario de una hoja: <archivo>.<hoja>.pkl"""
+    return f"{filepath}.{sheet}{SIDECAR_EXT}"
+
+
+def es_sidecar(filename: str) -> bool:
+    """Indica si un nombre de archivo de la carpeta de cortes es un sidecar"""
+    return filename.endswith(SIDECAR_EXT)
+
+
+def generar_sidecar(filepath: str, sheet, df: Optional[pd.DataFrame] = None) -> str:
+    """
+    Convertir una hoja Excel a sidecar binario (escritura atómica)
+    Si se pasa `df` se reutiliza en lugar de volver a leer el Excel
+    """
+    if df is None:
+        df = pd.read_excel(filepath, sheet_name=sheet)
+
+    destino = ruta_sidecar(filepath, sheet)
+    temporal = f"{destino}.tmp"
+    df.to_pickle(temporal)
+    os.replace(temporal, destino)
+    return destino
+
+
+def eliminar_sidecars(filepath: str) -> None:
+    """Eliminar todos los sidecars (de cualquier hoja) de un archivo Excel"""
+    carpeta = os.path.dirname(filepath) or '.'
+    prefijo = os.path.basename(filepath) + '.'
+    try:
+        for nombre in os.listdir(carpeta):
+            if nombre.startswith(prefijo) and es_sidecar(nombre):
+                os.remove(os.path.join(carpeta, nombre))
+    except OSError as e:
+        print(f"No se pudieron eliminar sidecars de {filepath}: {e}")
+
+
+def leer_hoja(filepath: str, sheet) -> pd.DataFrame:
+    """
+    Leer una hoja desde su sidecar si es más reciente que el Excel;
+    si no, parsear el XLSX y regenerar el sidecar
+    """
+    sidecar = ruta_sidecar(filepath, sheet)
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(filepath):
+            return pd.read_pickle(sidecar)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Sidecar inválido {sidecar}, se vuelve a leer el Excel: {e}")
+
+    df = pd.read_excel(filepath, sheet_name=sheet)
+    try:
+        generar_sidecar(filepath, sheet, df)
+    except Exception as e:
+        print(f"No se pudo guardar sidecar de {filepath}: {e}")
+    return df
+
+
+# Instancia global compartida por todos los ExcelManager del proceso
+excel_cache = ExcelCache(max_bytes=Config.EXCEL_CACHE_MAX_MB * 1024 * 1024)
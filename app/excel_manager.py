@@ -4,8 +4,13 @@ Gestor de archivos Excel para el sistema de engastado
 import pandas as pd
 import openpyxl
 import os
-import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from app.excel_cache import excel_cache, eliminar_sidecars, es_sidecar, generar_sidecar
+from app.catalogo_terminales import catalogo_terminales
+from app.grupos_etiquetas import cache_grupos_etiquetas
+from app.json_store import obtener_store
+from app.dataset_excel import DatasetExcel
+from app.modelo_corte import agrupar_por_cable_elemento
 
 class ExcelManager:
     def __init__(self, upload_folder: str, codigos_file: str, default_sheet: str = 'Format'):
@@ -14,6 +19,8 @@ class ExcelManager:
         self.default_sheet = default_sheet
         self.current_df = None
         self.current_file = None
+        self.current_modelo = None
+        self.codigos_store = obtener_store(codigos_file, por_defecto=lambda: {"cortes": []})
         
         # Crear archivo de códigos si no existe
         if not os.path.exists(self.codigos_file):
@@ -31,25 +38,25 @@ class ExcelManager:
         """Guardar el último archivo Excel cargado para autoload futuro"""
         try:
             payload = {"archivo": nombre_archivo}
-            with open(self._last_loaded_path(), 'w', encoding='utf-8') as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            obtener_store(self._last_loaded_path()).escribir(payload)
         except Exception as e:
             print(f"No se pudo guardar last_loaded: {e}")
 
     def _try_autoload_last_file(self) -> None:
         """Intentar cargar el último archivo usado o un único archivo disponible"""
         try:
-            last_path = self._last_loaded_path()
-            if os.path.exists(last_path):
-                with open(last_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    archivo = data.get('archivo')
-                    if archivo:
-                        self.cargar_excel(archivo)
-                        return
+            last_store = obtener_store(self._last_loaded_path())
+            if last_store.existe():
+                archivo = last_store.leer().get('archivo')
+                if archivo:
+                    self.cargar_excel(archivo)
+                    return
             # Si no hay last_loaded, pero hay exactamente un archivo en la carpeta, cargarlo
             if os.path.isdir(self.upload_folder):
-                archivos = [f for f in os.listdir(self.upload_folder) if os.path.isfile(os.path.join(self.upload_folder, f))]
+                archivos = [
+                    f for f in os.listdir(self.upload_folder)
+                    if os.path.isfile(os.path.join(self.upload_folder, f)) and not es_sidecar(f)
+                ]
                 if len(archivos) == 1:
                     self.cargar_excel(archivos[0])
         except Exception as e:
@@ -58,55 +65,47 @@ class ExcelManager:
     def _init_codigos_file(self):
         """Inicializar archivo de códigos de barras"""
         initial_data = {"cortes": []}
-        with open(self.codigos_file, 'w', encoding='utf-8') as f:
-            json.dump(initial_data, f, indent=2, ensure_ascii=False)
+        self.codigos_store.escribir(initial_data)
     
     def get_cortes(self) -> List[Dict]:
         """Obtener lista de cortes registrados"""
-        if os.path.exists(self.codigos_file):
-            with open(self.codigos_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('cortes', [])
-        return []
+        return self.codigos_store.leer().get('cortes', [])
     
     def add_corte(self, codigo_barras: str, archivo: str, descripcion: str, proyecto: str = "") -> bool:
         """Agregar nuevo corte de cable"""
-        cortes = self.get_cortes()
-        
-        # Verificar que el código no exista ya
-        if any(c['codigo_barras'] == codigo_barras for c in cortes):
-            return False
-        
-        # Agregar nuevo corte
-        nuevo_corte = {
-            "codigo_barras": codigo_barras,
-            "archivo": archivo,
-            "descripcion": descripcion,
-            "proyecto": proyecto
-        }
-        
-        cortes.append(nuevo_corte)
-        
-        # Guardar
-        with open(self.codigos_file, 'w', encoding='utf-8') as f:
-            json.dump({"cortes": cortes}, f, indent=2, ensure_ascii=False)
+        with self.codigos_store.transaccion() as data:
+            cortes = data.setdefault('cortes', [])
+            
+            # Verificar que el código no exista ya
+            if any(c['codigo_barras'] == codigo_barras for c in cortes):
+                return False
+            
+            # Agregar nuevo corte (se guarda al cerrar la transacción)
+            nuevo_corte = {
+                "codigo_barras": codigo_barras,
+                "archivo": archivo,
+                "descripcion": descripcion,
+                "proyecto": proyecto
+            }
+            
+            cortes.append(nuevo_corte)
         
         return True
     
     def delete_corte(self, codigo_barras: str) -> bool:
         """Eliminar corte de cable por código de barras"""
-        cortes = self.get_cortes()
-        
-        # Buscar y eliminar el corte
-        cortes_filtrados = [c for c in cortes if c['codigo_barras'] != codigo_barras]
-        
-        # Si no cambió nada, el código no existía
-        if len(cortes_filtrados) == len(cortes):
-            return False
-        
-        # Guardar
-        with open(self.codigos_file, 'w', encoding='utf-8') as f:
-            json.dump({"cortes": cortes_filtrados}, f, indent=2, ensure_ascii=False)
+        with self.codigos_store.transaccion() as data:
+            cortes = data.get('cortes', [])
+            
+            # Buscar y eliminar el corte
+            cortes_filtrados = [c for c in cortes if c['codigo_barras'] != codigo_barras]
+            
+            # Si no cambió nada, el código no existía
+            if len(cortes_filtrados) == len(cortes):
+                return False
+            
+            # Guardar al cerrar la transacción
+            data['cortes'] = cortes_filtrados
         
         return True
     
@@ -116,6 +115,10 @@ class ExcelManager:
         if os.path.exists(filepath):
             try:
                 os.remove(filepath)
+                eliminar_sidecars(filepath)
+                excel_cache.invalidar(filepath)
+                catalogo_terminales.invalidar(filepath)
+                cache_grupos_etiquetas.invalidar(filepath)
                 return True
             except Exception as e:
                 print(f"Error al eliminar archivo: {e}")
@@ -132,6 +135,11 @@ class ExcelManager:
                     if os.path.isfile(filepath):
                         os.remove(filepath)
             
+            # Vaciar caché de Excel parseados, catálogo de terminales y grupos de etiquetas
+            excel_cache.invalidar()
+            catalogo_terminales.invalidar()
+            cache_grupos_etiquetas.invalidar()
+            
             # Resetear archivo de códigos
             self._init_codigos_file()
 
@@ -146,6 +154,7 @@ class ExcelManager:
             # Limpiar DataFrame actual
             self.current_df = None
             self.current_file = None
+            self.current_modelo = None
             
             return True
         except Exception as e:
@@ -169,7 +178,8 @@ class ExcelManager:
         
         try:
             sheet = sheet_name or self.default_sheet
-            self.current_df = pd.read_excel(filepath, sheet_name=sheet)
+            self.current_modelo = excel_cache.cargar(filepath, sheet)
+            self.current_df = self.current_modelo.df
             self.current_file = nombre_archivo
             # Recordar este archivo para futuras sesiones
             self._save_last_loaded(nombre_archivo)
@@ -187,7 +197,8 @@ class ExcelManager:
         
         try:
             sheet = sheet_name or self.default_sheet
-            self.current_df = pd.read_excel(filepath, sheet_name=sheet)
+            self.current_modelo = excel_cache.cargar(filepath, sheet)
+            self.current_df = self.current_modelo.df
             self.current_file = nombre_archivo
             # NO guardar en last_loaded ya que es una carga temporal
             return True
@@ -195,18 +206,54 @@ class ExcelManager:
             print(f"Error al cargar Excel: {e}")
             return False
 
+    def obtener_dataset(self, nombre_archivo: str, sheet_name: Optional[str] = None) -> Optional[DatasetExcel]:
+        """
+        Obtener la hoja de un archivo como DatasetExcel inmutable, sin tocar
+        current_df/current_file (seguro con varias peticiones en paralelo)
+        Retorna None si el archivo no existe o no se puede leer
+        """
+        filepath = os.path.join(self.upload_folder, nombre_archivo)
+        
+        if not os.path.exists(filepath):
+            return None
+        
+        try:
+            sheet = sheet_name or self.default_sheet
+            return DatasetExcel(nombre_archivo, sheet, excel_cache.cargar(filepath, sheet))
+        except Exception as e:
+            print(f"Error al cargar Excel: {e}")
+            return None
+    
+    def _dataset_actual(self) -> Optional[DatasetExcel]:
+        """DatasetExcel del archivo cargado actualmente (None si no hay ninguno)"""
+        if self.current_modelo is None:
+            return None
+        return DatasetExcel(self.current_file, self.default_sheet, self.current_modelo)
+    
+    def preparar_sidecar(self, nombre_archivo: str, sheet_name: Optional[str] = None) -> bool:
+        """Convertir la hoja de trabajo a sidecar binario para acelerar cargas futuras"""
+        filepath = os.path.join(self.upload_folder, nombre_archivo)
+        
+        if not os.path.exists(filepath):
+            return False
+        
+        try:
+            generar_sidecar(filepath, sheet_name or self.default_sheet)
+            return True
+        except Exception as e:
+            print(f"Error al generar sidecar de {nombre_archivo}: {e}")
+            return False
+
     def cargar_ultimo_si_existe(self) -> bool:
         """Cargar el último Excel utilizado si no hay uno en memoria"""
         if self.current_df is not None:
             return True
         try:
-            last_path = self._last_loaded_path()
-            if os.path.exists(last_path):
-                with open(last_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    archivo = data.get('archivo')
-                    if archivo:
-                        return self.cargar_excel(archivo)
+            last_store = obtener_store(self._last_loaded_path())
+            if last_store.existe():
+                archivo = last_store.leer().get('archivo')
+                if archivo:
+                    return self.cargar_excel(archivo)
         except Exception as e:
             print(f"Error al cargar último archivo: {e}")
         return False
@@ -224,165 +271,38 @@ class ExcelManager:
         Retorna lista de diccionarios con los datos encontrados
         BÚSQUEDA INSENSIBLE A MAYÚSCULAS/MINÚSCULAS
         """
-        if self.current_df is None:
+        df = self.buscar_terminal_df(terminal)
+        if df.empty:
             return []
-        
-        # Convertir terminal a mayúsculas para búsqueda
-        terminal_upper = str(terminal).upper().strip()
-        
-        # Preparar máscaras seguras incluso si faltan columnas
-        cols = self.current_df.columns
-        
-        if 'De Terminal' in cols:
-            mask_origen = self.current_df['De Terminal'].astype(str).str.upper() == terminal_upper
-        else:
-            mask_origen = pd.Series(False, index=self.current_df.index)
-        
-        if 'Para Terminal' in cols:
-            mask_destino = self.current_df['Para Terminal'].astype(str).str.upper() == terminal_upper
-        else:
-            mask_destino = pd.Series(False, index=self.current_df.index)
-
-        # Seleccionar filas que coincidan en ORIGEN o DESTINO (una sola vez por fila)
-        mask_any = mask_origen | mask_destino
-        if not mask_any.any():
-            return []
-
-        df = self.current_df[mask_any].copy()
-
-        # Etiquetar el tipo de coincidencia por fila: origen, destino o ambas
-        tipo = pd.Series(index=self.current_df.index, dtype=object)
-        tipo[(mask_origen) & (~mask_destino)] = 'origen'
-        tipo[(~mask_origen) & (mask_destino)] = 'destino'
-        tipo[(mask_origen) & (mask_destino)] = 'ambas'
-        df['tipo_conexion'] = tipo.loc[df.index].fillna('origen')
-
         return df.to_dict('records')
     
-    def agrupar_por_cable_elemento(self, resultados: List[Dict], terminal_buscado: str) -> Dict:
+    def buscar_terminal_df(self, terminal: str) -> pd.DataFrame:
+        """
+        Igual que buscar_terminal, pero devuelve las filas como DataFrame
+        (columna extra 'tipo_conexion'), listo para agrupar_por_cable_elemento
+        """
+        dataset = self._dataset_actual()
+        if dataset is None:
+            return pd.DataFrame()
+        return dataset.buscar_terminal_df(terminal)
+    
+    def grupos_terminal(self, terminal: str) -> Tuple[int, Dict]:
+        """
+        Grupos cable + elemento de un terminal en el archivo cargado, ya compilados
+        al cargarlo. Retorna (filas donde aparece el terminal, grupos)
+        """
+        dataset = self._dataset_actual()
+        if dataset is None:
+            return 0, {}
+        return dataset.grupos_terminal(terminal)
+    
+    def agrupar_por_cable_elemento(self, resultados, terminal_buscado: str) -> Dict:
         """
         Agrupar resultados por código de cable y elemento (De Elemento)
-        
-        REGLAS:
-        1. Agrupar por Código de Cable + De Elemento (como los corta la máquina)
-        2. Un mismo cable puede aparecer VARIAS VECES en el mismo elemento (cables duplicados)
-        3. AZUL: terminal solo en un lado (1 terminal)
-        4. ROJO: terminal en AMBOS lados (2 terminales en la MISMA fila)
-        5. Total esperado: ~98 cables mostrados, 150 terminales
+        Ver modelo_corte.agrupar_por_cable_elemento; para el archivo cargado es
+        preferible grupos_terminal(), que usa los grupos ya compilados
         """
-        if not resultados:
-            return {}
-        
-        grupos = {}
-        
-        # Helper para evitar NaN/None en JSON
-        def _safe_str(v):
-            try:
-                import pandas as _pd
-                if _pd.isna(v):
-                    return ''
-            except Exception:
-                pass
-            return '' if v is None else v
-        
-        def _safe_num(v):
-            try:
-                import pandas as _pd
-                if _pd.isna(v):
-                    return ''
-            except Exception:
-                pass
-            return v
-        
-        for row in resultados:
-            # Datos de la fila
-            cod_cable = row.get('Cod. cable', 'Sin código')
-            cable_marca = str(row.get('Cable / Marca', '')).strip()
-            de_elemento = row.get('De Elemento', 'Sin elemento')
-            de_terminal = row.get('De Terminal', '')
-            para_terminal = row.get('Para Terminal', '')
-            
-            # Clave del grupo
-            clave = f"{cod_cable}|{de_elemento}"
-
-            if clave not in grupos:
-                # Buscar columnas por nombre normalizado (sin acentos/casos) para tolerar problemas de codificación
-                def _get_by_normalized_key(d: Dict, target: str, default=''):
-                    try:
-                        import unicodedata as _ud
-                        def _norm(s: str) -> str:
-                            s = ''.join(c for c in _ud.normalize('NFKD', s) if not _ud.combining(c))
-                            return s.lower().strip()
-                        target_norm = _norm(target)
-                        for k in d.keys():
-                            try:
-                                if _norm(str(k)) == target_norm:
-                                    return d.get(k, default)
-                            except Exception:
-                                continue
-                    except Exception:
-                        pass
-                    return default
-
-                descripcion_val = _get_by_normalized_key(row, 'Descripción Cable', '')
-                seccion_val = _get_by_normalized_key(row, 'Sección', '')
-
-                grupos[clave] = {
-                    'cod_cable': _safe_str(cod_cable),
-                    'elemento': _safe_str(de_elemento),
-                    'descripcion': _safe_str(descripcion_val),
-                    'seccion': _safe_str(seccion_val),
-                    'longitud': _safe_num(row.get('Longitud', '')),
-                    'de_terminal': _safe_str(de_terminal),
-                    'cables_lista': [],
-                    'cables_doble_terminal': [],  # ROJO: terminal en ambas puntas (DE ESTA FILA)
-                    'cables_de_terminal': [],     # AZUL: terminal solo en "De Terminal"
-                    'cables_para_terminal': [],   # VERDE: terminal solo en "Para Terminal"
-                    'num_terminales': 0
-                }
-
-            if cable_marca:
-                # Verificar si ESTA FILA tiene el terminal en ambos lados (CASE-INSENSITIVE)
-                terminal_buscado_upper = str(terminal_buscado).upper().strip()
-                de_terminal_upper = str(de_terminal).upper().strip()
-                para_terminal_upper = str(para_terminal).upper().strip()
-                
-                tiene_origen = de_terminal_upper == terminal_buscado_upper
-                tiene_destino = para_terminal_upper == terminal_buscado_upper
-                es_doble_en_esta_fila = tiene_origen and tiene_destino
-                
-                # Agregar cable a la lista (puede aparecer múltiples veces)
-                grupos[clave]['cables_lista'].append(cable_marca)
-                
-                if es_doble_en_esta_fila:
-                    # Esta fila tiene terminal en AMBOS lados (ROJO) - 2 terminales
-                    grupos[clave]['cables_doble_terminal'].append(cable_marca)
-                    grupos[clave]['num_terminales'] += 2
-                elif tiene_origen:
-                    # Esta fila tiene terminal solo en "De Terminal" (AZUL) - 1 terminal
-                    grupos[clave]['cables_de_terminal'].append(cable_marca)
-                    grupos[clave]['num_terminales'] += 1
-                elif tiene_destino:
-                    # Esta fila tiene terminal solo en "Para Terminal" (VERDE) - 1 terminal
-                    grupos[clave]['cables_para_terminal'].append(cable_marca)
-                    grupos[clave]['num_terminales'] += 1
-        
-        # Ordenar cables y preparar datos finales
-        for grupo in grupos.values():
-            def sort_cable(cable):
-                cable_str = str(cable).strip()
-                try:
-                    return (0, int(cable_str))  # Números primero
-                except ValueError:
-                    return (1, cable_str)  # Strings después
-            
-            grupo['todos_cables'] = sorted(grupo['cables_lista'], key=sort_cable)
-            grupo['num_cables'] = len(grupo['cables_lista'])
-            
-            # Limpiar
-            del grupo['cables_lista']
-        
-        return grupos
+        return agrupar_por_cable_elemento(resultados, terminal_buscado)
     
     def get_columnas(self) -> List[str]:
         """Obtener nombres de columnas del DataFrame actual"""
@@ -406,73 +326,17 @@ class ExcelManager:
         Obtener lista de todos los terminales únicos en el Excel actual
         (De Terminal y Para Terminal), excluyendo 'S/T' y valores vacíos
         """
-        if self.current_df is None:
+        dataset = self._dataset_actual()
+        if dataset is None:
             return []
-        
-        terminales = set()
-        
-        # Obtener terminales de origen
-        if 'De Terminal' in self.current_df.columns:
-            for terminal in self.current_df['De Terminal'].dropna().unique():
-                terminal_str = str(terminal).strip().upper()
-                if terminal_str and terminal_str != 'S/T' and terminal_str != 'NAN':
-                    terminales.add(terminal_str)
-        
-        # Obtener terminales de destino
-        if 'Para Terminal' in self.current_df.columns:
-            for terminal in self.current_df['Para Terminal'].dropna().unique():
-                terminal_str = str(terminal).strip().upper()
-                if terminal_str and terminal_str != 'S/T' and terminal_str != 'NAN':
-                    terminales.add(terminal_str)
-        
-        # Ordenar alfabéticamente
-        return sorted(list(terminales))
+        return dataset.listar_terminales_unicos()
 
     def buscar_elementos_por_codigo_cable(self, codigo_cable: str) -> List[Dict]:
         """
         Buscar todos los elementos (De Elemento) asociados a un código de cable específico
         Retorna lista de diccionarios con: elemento, descripción, cantidad, terminal
         """
-        if self.current_df is None:
-            return []
-        
-        codigo_cable_upper = str(codigo_cable).upper().strip()
-        
-        # Filtrar por código de cable
-        if 'Cod. cable' not in self.current_df.columns:
+        dataset = self._dataset_actual()
+        if dataset is None:
             return []
-        
-        mask = self.current_df['Cod. cable'].astype(str).str.upper().str.strip() == codigo_cable_upper
-        df_filtrado = self.current_df[mask].copy()
-        
-        if df_filtrado.empty:
-            return []
-        
-        # Agrupar por 'De Elemento' y contar
-        elementos_dict = {}
-        
-        for _, row in df_filtrado.iterrows():
-            elemento = row.get('De Elemento', 'Sin elemento')
-            if pd.isna(elemento):
-                elemento = 'Sin elemento'
-            
-            elemento = str(elemento).strip()
-            
-            if elemento not in elementos_dict:
-                elementos_dict[elemento] = {
-                    'elemento': elemento,
-                    'descripcion': str(row.get('De Descripción', '')).strip() if not pd.isna(row.get('De Descripción')) else '',
-                    'terminal': str(row.get('De Terminal', '')).strip() if not pd.isna(row.get('De Terminal')) else '',
-                    'cantidad': 0
-                }
-            
-            elementos_dict[elemento]['cantidad'] += 1
-        
-        # Convertir a lista
-        elementos_lista = list(elementos_dict.values())
-        
-        # Ordenar por elemento
-        elementos_lista.sort(key=lambda x: x['elemento'])
-        
-        return elementos_lista
-
+        return dataset.elementos_por_codigo_cable(codigo_cable)
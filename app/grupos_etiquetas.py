@@ -0,0 +1,146 @@
+"""
+Caché de grupos de etiquetas (cod.cable + elemento) por archivo Excel
+Los grupos se calculan al registrar el corte y se guardan uno por libro en
+data/grupos_etiquetas/, de modo que la página de Etiquetas y V3 (también para
+todos los archivos de un bono) los leen sin volver a parsear los Excel.
+"""
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from app.json_store import JsonStore, firma_archivo, obtener_store
+
+
+class CacheGruposEtiquetas:
+    """
+    Grupos de etiquetas por archivo, con invalidación por firma (mtime, tamaño) y hoja.
+
+    Cada libro tiene su propia entrada (en memoria y en un JSON en `directorio`);
+    si el Excel cambia en disco la entrada deja de ser válida y se recalcula.
+    Cada entrada tiene además un índice numero_etiqueta -> grupo para las búsquedas
+    por número de etiqueta de V3.
+
+    IMPORTANTE: las listas devueltas son compartidas; no se deben modificar.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self._entradas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _ruta_entrada(self, filepath: str) -> str:
+        nombre = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directorio, f"{nombre}.json")
+
+    def _store(self, filepath: str) -> JsonStore:
+        """JSON persistido de un archivo (escritura atómica y bloqueos de JsonStore)"""
+        return obtener_store(self._ruta_entrada(filepath), indent=None)
+
+    def _leer_entrada(self, filepath: str) -> Optional[Dict]:
+        clave = os.path.abspath(filepath)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+        if entrada is not None:
+            return entrada
+
+        store = self._store(filepath)
+        if not store.existe():
+            return None
+        try:
+            data = store.leer()
+            entrada = {'firma': tuple(data['firma']), 'hoja': data.get('hoja'), 'grupos': data['grupos']}
+        except Exception as e:
+            print(f"Caché de grupos de etiquetas inválida {store.ruta}, se regenerará: {e}")
+            return None
+
+        with self._lock:
+            self._entradas[clave] = entrada
+        return entrada
+
+    def _guardar(self, filepath: str, firma: tuple, hoja, grupos: List[Dict]) -> Dict:
+        """Guardar en memoria y en disco"""
+        entrada = {'firma': firma, 'hoja': hoja, 'grupos': grupos}
+        with self._lock:
+            self._entradas[os.path.abspath(filepath)] = entrada
+        try:
+            self._store(filepath).escribir({
+                'archivo': os.path.basename(filepath),
+                'firma': list(firma),
+                'hoja': hoja,
+                'total_grupos': len(grupos),
+                'grupos': grupos
+            })
+        except Exception as e:
+            print(f"No se pudo guardar la caché de grupos de etiquetas: {e}")
+        return entrada
+
+    def _entrada(self, filepath: str, hoja,
+                 calcular: Callable[[], Optional[List[Dict]]]) -> Tuple[Optional[Dict], bool]:
+        """Entrada vigente del archivo (calculándola si hace falta) y si venía de la caché"""
+        firma = firma_archivo(filepath)
+        if firma is None:
+            return None, False
+
+        entrada = self._leer_entrada(filepath)
+        if entrada is not None and entrada['firma'] == firma and entrada['hoja'] == hoja:
+            return entrada, True
+
+        # La firma se toma antes de calcular: si el archivo cambia mientras tanto,
+        # la entrada guardada quedará obsoleta y se recalculará la próxima vez
+        grupos = calcular()
+        if grupos is None:
+            return None, False
+        return self._guardar(filepath, firma, hoja, grupos), False
+
+    def obtener(self, filepath: str, hoja,
+                calcular: Callable[[], Optional[List[Dict]]]) -> Tuple[Optional[List[Dict]], bool]:
+        """
+        Grupos del archivo; si no están en caché o el Excel cambió, se calculan con
+        `calcular()` y se guardan.
+        Retorna (grupos, desde_cache); grupos es None si el archivo no existe o no se
+        pudo calcular.
+        """
+        entrada, desde_cache = self._entrada(filepath, hoja, calcular)
+        return (entrada['grupos'] if entrada is not None else None), desde_cache
+
+    def buscar_numero(self, filepath: str, hoja, numero: int,
+                      calcular: Callable[[], Optional[List[Dict]]]) -> Optional[Dict]:
+        """
+        Grupo con ese numero_etiqueta en el archivo, None si no existe.
+        El índice número -> grupo se construye una vez por versión del archivo.
+        """
+        entrada, _ = self._entrada(filepath, hoja, calcular)
+        if entrada is None:
+            return None
+        indice = entrada.get('por_numero')
+        if indice is None:
+            indice = {grupo.get('numero_etiqueta'): grupo for grupo in entrada['grupos']}
+            entrada['por_numero'] = indice
+        return indice.get(numero)
+
+    def invalidar(self, filepath: Optional[str] = None) -> None:
+        """Olvidar un archivo concreto o toda la caché si filepath es None"""
+        with self._lock:
+            if filepath is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(os.path.abspath(filepath), None)
+
+        if filepath is not None:
+            rutas = [self._ruta_entrada(filepath)]
+        elif os.path.isdir(self.directorio):
+            rutas = [os.path.join(self.directorio, nombre) for nombre in os.listdir(self.directorio)
+                     if nombre.endswith('.json')]
+        else:
+            rutas = []
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+# Instancia global compartida por todas las peticiones
+cache_grupos_etiquetas = CacheGruposEtiquetas(Config.GRUPOS_ETIQUETAS_DIR)
@@ -0,0 +1,217 @@
+"""
+Índice de etiquetas simuladas (modo simulación de la impresora)
+Las etiquetas se guardan en subcarpetas por día (<carpeta>/AAAA-MM-DD/*.zpl) y cada
+una se registra en un índice SQLite con sus metadatos, de modo que listar, filtrar
+por bono/carro o contar no recorre ni hace stat de todo el directorio.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+_CARPETA_DIA = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_LINEA_METADATO = re.compile(r'^#\s{3}([^:]+):\s?(.*)$')
+
+
+class IndiceEtiquetasSimuladas:
+    """
+    Índice (SQLite) de los archivos .zpl de la carpeta de simulación.
+
+    - registrar(): una fila por etiqueta al guardarla.
+    - listar(): más recientes primero, con paginación por cursor (el id de la
+      última fila devuelta) y filtros por bono, carro y tipo.
+    - Si el índice no existe (primera vez o borrado a mano) se reconstruye
+      leyendo las cabeceras de los .zpl que haya, incluidos los del formato
+      antiguo sin subcarpetas.
+    """
+
+    def __init__(self, carpeta: str):
+        self.carpeta = carpeta
+        self.ruta = os.path.join(carpeta, 'indice.sqlite3')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._preparado = False
+
+    def _conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is not None and self._local.pid == os.getpid():
+            return conexion
+
+        os.makedirs(self.carpeta, exist_ok=True)
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=NORMAL')
+        self._local.conexion = conexion
+        self._local.pid = os.getpid()
+
+        with self._lock:
+            if not self._preparado:
+                self._preparar(conexion)
+                self._preparado = True
+        return conexion
+
+    def _preparar(self, conexion: sqlite3.Connection) -> None:
+        conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS etiquetas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ruta TEXT NOT NULL UNIQUE,
+                fecha TEXT NOT NULL,
+                tipo TEXT,
+                carro TEXT,
+                bono TEXT,
+                tamano INTEGER NOT NULL,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_etiquetas_bono ON etiquetas(bono, id);
+            CREATE INDEX IF NOT EXISTS idx_etiquetas_carro ON etiquetas(carro, id);
+        """)
+        # user_version 0 = índice recién creado: indexar los archivos que ya hubiera
+        if conexion.execute('PRAGMA user_version').fetchone()[0] == 0:
+            conexion.execute('BEGIN IMMEDIATE')
+            try:
+                if conexion.execute('PRAGMA user_version').fetchone()[0] == 0:
+                    for fila in self._escanear():
+                        conexion.execute(
+                            'INSERT OR IGNORE INTO etiquetas (ruta, fecha, tipo, carro, bono, tamano, metadata) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?)', fila
+                        )
+                    conexion.execute('PRAGMA user_version = 1')
+                conexion.execute('COMMIT')
+            except Exception:
+                conexion.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def _fila(ruta: str, fecha: str, metadata: Optional[Dict], tamano: int) -> Tuple:
+        metadata = metadata or {}
+        carro = metadata.get('carro')
+        bono = metadata.get('bono')
+        return (
+            ruta, fecha, metadata.get('tipo'),
+            str(carro) if carro is not None else None,
+            str(bono) if bono is not None else None,
+            tamano, json.dumps(metadata, ensure_ascii=False, default=str)
+        )
+
+    def _escanear(self) -> List[Tuple]:
+        """Filas de índice para los .zpl existentes (carpeta raíz y subcarpetas por día)"""
+        rutas = []
+        with os.scandir(self.carpeta) as entradas:
+            entradas = list(entradas)
+        for entrada in entradas:
+            if entrada.is_file() and entrada.name.endswith('.zpl'):
+                rutas.append(entrada.name)
+            elif entrada.is_dir() and _CARPETA_DIA.match(entrada.name):
+                rutas.extend(os.path.join(entrada.name, nombre)
+                             for nombre in os.listdir(entrada.path) if nombre.endswith('.zpl'))
+
+        filas = []
+        for ruta in rutas:
+            ruta_completa = os.path.join(self.carpeta, ruta)
+            try:
+                stat = os.stat(ruta_completa)
+                metadata = self._leer_cabecera(ruta_completa)
+            except OSError:
+                continue
+            filas.append(self._fila(ruta, datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                                    metadata, stat.st_size))
+        filas.sort(key=lambda fila: fila[1])
+        return filas
+
+    @staticmethod
+    def _leer_cabecera(ruta: str) -> Dict:
+        """Metadatos de la cabecera '#   clave: valor' que escribe la simulación"""
+        metadata = {}
+        with open(ruta, 'r', encoding='utf-8', errors='replace') as f:
+            for linea in f:
+                if not linea.startswith('#'):
+                    break
+                coincidencia = _LINEA_METADATO.match(linea.rstrip('\n'))
+                if coincidencia:
+                    metadata[coincidencia.group(1).strip()] = coincidencia.group(2)
+        return metadata
+
+    def carpeta_del_dia(self, fecha: datetime) -> str:
+        """Subcarpeta donde se guardan las etiquetas de un día (se crea si no existe)"""
+        carpeta = os.path.join(self.carpeta, fecha.strftime('%Y-%m-%d'))
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    def registrar(self, ruta_completa: str, fecha: datetime, metadata: Optional[Dict], tamano: int) -> None:
+        ruta = os.path.relpath(ruta_completa, self.carpeta)
+        self._conexion().execute(
+            'INSERT OR REPLACE INTO etiquetas (ruta, fecha, tipo, carro, bono, tamano, metadata) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            self._fila(ruta, fecha.isoformat(), metadata, tamano)
+        )
+
+    @staticmethod
+    def _filtros(bono: Optional[str], carro: Optional[str], tipo: Optional[str]) -> Tuple[List[str], List]:
+        condiciones, parametros = [], []
+        for columna, valor in (('bono', bono), ('carro', carro), ('tipo', tipo)):
+            if valor not in (None, ''):
+                condiciones.append(f'{columna} = ?')
+                parametros.append(str(valor))
+        return condiciones, parametros
+
+    def listar(self, limite: int = 100, cursor: Optional[int] = None, bono: Optional[str] = None,
+               carro: Optional[str] = None, tipo: Optional[str] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Una página de etiquetas, más recientes primero
+        Retorna (etiquetas, cursor de la página siguiente o None si no hay más)
+        """
+        condiciones, parametros = self._filtros(bono, carro, tipo)
+        if cursor is not None:
+            condiciones.append('id < ?')
+            parametros.append(int(cursor))
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        filas = self._conexion().execute(
+            f'SELECT id, ruta, fecha, tipo, carro, bono, tamano, metadata FROM etiquetas {where} '
+            f'ORDER BY id DESC LIMIT ?', (*parametros, limite + 1)
+        ).fetchall()
+
+        etiquetas = [{
+            'id': fila[0],
+            'nombre': os.path.basename(fila[1]),
+            'ruta': os.path.join(self.carpeta, fila[1]),
+            'fecha': fila[2],
+            'tipo': fila[3],
+            'carro': fila[4],
+            'bono': fila[5],
+            'tamano': fila[6],
+            'metadata': json.loads(fila[7]) if fila[7] else {}
+        } for fila in filas[:limite]]
+
+        siguiente = etiquetas[-1]['id'] if len(filas) > limite else None
+        return etiquetas, siguiente
+
+    def contar(self, bono: Optional[str] = None, carro: Optional[str] = None,
+               tipo: Optional[str] = None) -> int:
+        condiciones, parametros = self._filtros(bono, carro, tipo)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        return self._conexion().execute(f'SELECT COUNT(*) FROM etiquetas {where}', parametros).fetchone()[0]
+
+    def eliminar_todas(self) -> int:
+        """Borrar los archivos indexados, las subcarpetas vacías y el índice. Retorna cuántas había."""
+        conexion = self._conexion()
+        rutas = [fila[0] for fila in conexion.execute('SELECT ruta FROM etiquetas')]
+        for ruta in rutas:
+            try:
+                os.remove(os.path.join(self.carpeta, ruta))
+            except FileNotFoundError:
+                pass
+        conexion.execute('DELETE FROM etiquetas')
+
+        with os.scandir(self.carpeta) as entradas:
+            entradas = list(entradas)
+        for entrada in entradas:
+            if entrada.is_dir() and _CARPETA_DIA.match(entrada.name):
+                try:
+                    os.rmdir(entrada.path)
+                except OSError:
+                    pass
+        return len(rutas)
@@ -0,0 +1,58 @@
+"""
+Índice invertido de terminales para búsquedas rápidas en un Excel de corte
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+_SIN_FILAS = np.empty(0, dtype=np.intp)
+
+
+class IndiceTerminales:
+    """
+    Mapa terminal normalizado -> posiciones de fila, para 'De Terminal' y 'Para Terminal'.
+
+    Se construye una sola vez al cargar el archivo; una búsqueda cuesta O(coincidencias)
+    en lugar de recorrer y normalizar las dos columnas completas en cada escaneo.
+    La normalización es la misma que usaba buscar_terminal: astype(str).str.upper().
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.num_filas = len(df)
+        self.origen = self._indexar(df, 'De Terminal')
+        self.destino = self._indexar(df, 'Para Terminal')
+
+    @staticmethod
+    def _indexar(df: pd.DataFrame, columna: str) -> Dict[str, np.ndarray]:
+        """Agrupar posiciones de fila por valor normalizado de la columna"""
+        if columna not in df.columns:
+            return {}
+
+        claves = df[columna].astype(str).str.upper()
+        posiciones = claves.groupby(claves.to_numpy(), sort=False).indices
+        return {clave: np.asarray(pos, dtype=np.intp) for clave, pos in posiciones.items()}
+
+    def buscar(self, terminal: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Buscar un terminal (insensible a mayúsculas)
+        Retorna (posiciones ordenadas, tipo de conexión por posición: origen/destino/ambas)
+        """
+        terminal_upper = str(terminal).upper().strip()
+
+        pos_origen = self.origen.get(terminal_upper, _SIN_FILAS)
+        pos_destino = self.destino.get(terminal_upper, _SIN_FILAS)
+
+        posiciones = np.union1d(pos_origen, pos_destino)
+        if posiciones.size == 0:
+            return posiciones, np.empty(0, dtype=object)
+
+        en_origen = np.isin(posiciones, pos_origen, assume_unique=True)
+        en_destino = np.isin(posiciones, pos_destino, assume_unique=True)
+
+        tipos = np.where(
+            en_origen & en_destino, 'ambas',
+            np.where(en_origen, 'origen', 'destino')
+        ).astype(object)
+
+        return posiciones, tipos
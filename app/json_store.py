@@ -0,0 +1,194 @@
+"""
+Almacenamiento transaccional de los archivos JSON de data/
+Escrituras atómicas (temporal + rename), bloqueo lectores/escritor dentro del
+proceso, bloqueo advisory (fcntl) entre procesos y lecturas cacheadas por mtime
+"""
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo bloqueo dentro del proceso
+    fcntl = None
+
+
+def firma_archivo(ruta: str) -> Optional[Tuple[int, int]]:
+    """
+    Firma de un archivo en disco: (mtime en ns, tamaño), None si no existe.
+    Es la que usan todas las cachés invalidadas por cambios en disco.
+    """
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def bloqueo_archivo(ruta: str):
+    """
+    Bloqueo advisory exclusivo entre procesos sobre el archivo `ruta` (no-op si no
+    hay fcntl). No es reentrante: un mismo proceso no debe tomarlo dos veces.
+    """
+    if fcntl is None:
+        yield
+        return
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class RWLock:
+    """Bloqueo de lectores/escritor: varias lecturas a la vez o una única escritura"""
+
+    def __init__(self):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escribiendo = False
+
+    @contextmanager
+    def lectura(self):
+        with self._condicion:
+            while self._escribiendo:
+                self._condicion.wait()
+            self._lectores += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._lectores -= 1
+                if self._lectores == 0:
+                    self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        with self._condicion:
+            while self._escribiendo or self._lectores:
+                self._condicion.wait()
+            self._escribiendo = True
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escribiendo = False
+                self._condicion.notify_all()
+
+
+class JsonStore:
+    """
+    Un archivo JSON de datos (proyectos, órdenes, puestos, códigos...).
+
+    - leer(): devuelve una copia independiente del contenido; solo se vuelve a
+      parsear el archivo si cambió su firma (mtime, tamaño) en disco.
+    - escribir(data): reemplaza el archivo de forma atómica.
+    - transaccion(): lectura-modificación-escritura con el bloqueo tomado, para
+      que dos peticiones concurrentes no pierdan actualizaciones:
+
+          with store.transaccion() as data:
+              data['puestos'].append(puesto)
+
+      Si el bloque lanza una excepción o no cambia nada, no se escribe.
+
+    El bloqueo entre procesos usa un archivo <ruta>.lock aparte, porque el archivo
+    de datos se sustituye en cada escritura.
+    """
+
+    def __init__(self, ruta: str, por_defecto: Optional[Callable[[], Any]] = None,
+                 indent: Optional[int] = 2, ensure_ascii: bool = False):
+        self.ruta = ruta
+        self.por_defecto = por_defecto or dict
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self._rw = RWLock()
+        self._cache = None  # (firma, contenido serializado con pickle)
+
+    def _bloqueo_archivo(self):
+        """Bloqueo advisory exclusivo entre procesos (no-op si no hay fcntl)"""
+        return bloqueo_archivo(f"{self.ruta}.lock")
+
+    def _cargar(self):
+        """Contenido actual (objeto nuevo), usando la caché si el archivo no cambió"""
+        firma = firma_archivo(self.ruta)
+        if firma is None:
+            return self.por_defecto()
+
+        cache = self._cache
+        if cache is not None and cache[0] == firma:
+            return pickle.loads(cache[1])
+
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self._cache = (firma, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        return data
+
+    def _volcar(self, data) -> None:
+        """Escritura atómica: archivo temporal en la misma carpeta + os.replace"""
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=self.indent, ensure_ascii=self.ensure_ascii)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        self._cache = (firma_archivo(self.ruta), pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def existe(self) -> bool:
+        return os.path.exists(self.ruta)
+
+    def firma(self):
+        """Firma (mtime, tamaño) actual del archivo, None si no existe"""
+        return firma_archivo(self.ruta)
+
+    def leer(self):
+        """Copia del contenido del archivo (o del valor por defecto si no existe)"""
+        with self._rw.lectura():
+            return self._cargar()
+
+    def escribir(self, data) -> None:
+        """Reemplazar el contenido completo del archivo"""
+        with self._rw.escritura(), self._bloqueo_archivo():
+            self._volcar(data)
+
+    @contextmanager
+    def transaccion(self):
+        """Leer, modificar y guardar con el bloqueo de escritura tomado"""
+        with self._rw.escritura(), self._bloqueo_archivo():
+            data = self._cargar()
+            antes = json.dumps(data, sort_keys=True)
+            yield data
+            if json.dumps(data, sort_keys=True) != antes or not self.existe():
+                self._volcar(data)
+
+
+_stores: Dict[str, JsonStore] = {}
+_stores_lock = threading.Lock()
+
+
+def obtener_store(ruta: str, por_defecto: Optional[Callable[[], Any]] = None, **opciones) -> JsonStore:
+    """
+    JsonStore compartido para `ruta` (uno por archivo en todo el proceso, para que
+    todos los usuarios del archivo compartan bloqueos y caché)
+    """
+    clave = os.path.abspath(ruta)
+    with _stores_lock:
+        store = _stores.get(clave)
+        if store is None:
+            store = JsonStore(clave, por_defecto=por_defecto, **opciones)
+            _stores[clave] = store
+        return store
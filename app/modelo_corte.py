@@ -0,0 +1,548 @@
+"""
+Modelo compilado de una hoja de corte
+Al cargar un Excel, la hoja se compila una sola vez en un ModeloCorte inmutable con
+todos los índices que usan las rutas y el gestor de proyectos: terminales únicos,
+índice de filas por terminal, grupos cable + elemento de cada terminal, grupos de
+etiquetas y elementos por código de cable. Las cadenas repetidas (códigos, elementos,
+terminales, cables) se internan, de modo que cada valor distinto está una sola vez
+en memoria aunque aparezca en cientos de filas y en varios índices.
+"""
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.indice_terminales import IndiceTerminales
+
+
+def _safe_str(v):
+    """Evitar NaN/None en JSON para campos de texto"""
+    try:
+        if pd.isna(v):
+            return ''
+    except Exception:
+        pass
+    return '' if v is None else v
+
+
+def _safe_num(v):
+    """Evitar NaN en JSON para campos numéricos"""
+    try:
+        if pd.isna(v):
+            return ''
+    except Exception:
+        pass
+    return v
+
+
+def _normalizar_nombre(s: str) -> str:
+    """Normalizar nombre de columna: sin acentos, minúsculas y sin espacios extremos"""
+    s = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+    return s.lower().strip()
+
+
+@lru_cache(maxsize=64)
+def _mapa_columnas_normalizadas(columnas: tuple) -> Dict:
+    """Nombre normalizado -> primera columna real que lo tiene (tolera problemas de codificación)"""
+    mapa = {}
+    for col in columnas:
+        try:
+            mapa.setdefault(_normalizar_nombre(str(col)), col)
+        except Exception:
+            continue
+    return mapa
+
+
+class _ColumnasResultados:
+    """
+    Acceso por columnas (arrays NumPy de objetos Python nativos) a los resultados
+    de una búsqueda, tanto si vienen como lista de registros como si son un DataFrame
+    """
+
+    def __init__(self, resultados):
+        self._df = resultados if isinstance(resultados, pd.DataFrame) else None
+        self._registros = None if self._df is not None else resultados
+        if self._df is not None:
+            self.nombres = list(self._df.columns)
+        else:
+            self.nombres = list(self._registros[0].keys())
+        self._num_filas = len(resultados)
+
+    def valores(self, columna, default) -> np.ndarray:
+        """Valores de la columna, o `default` en todas las filas si no existe"""
+        array = np.empty(self._num_filas, dtype=object)
+        if columna is None:
+            array[:] = [default] * self._num_filas
+        elif self._df is not None:
+            if columna in self._df.columns:
+                array[:] = self._df[columna].tolist()
+            else:
+                array[:] = [default] * self._num_filas
+        else:
+            array[:] = [r.get(columna, default) for r in self._registros]
+        return array
+
+
+# Normalizaciones elemento a elemento sobre arrays de objetos
+_texto_limpio = np.frompyfunc(lambda v: str(v).strip(), 1, 1)
+_texto_normalizado = np.frompyfunc(lambda v: str(v).upper().strip(), 1, 1)
+_concatenar_clave = np.frompyfunc(lambda a, sep, b: f"{a}{sep}{b}", 3, 1)
+
+
+@lru_cache(maxsize=8192)
+def _clave_orden_cable(cable):
+    """Clave de ordenación de cables: números primero (por valor), después textos"""
+    cable_str = str(cable).strip()
+    try:
+        return (0, int(cable_str))
+    except ValueError:
+        return (1, cable_str)
+
+
+def _rango_orden_cables(cables: np.ndarray) -> np.ndarray:
+    """Rango de cada cable según _clave_orden_cable (cables con la misma clave empatan)"""
+    valores, inversa = np.unique(cables, return_inverse=True)
+    claves = [_clave_orden_cable(v) for v in valores]
+    claves_ordenadas = sorted(set(claves))
+    posicion = {clave: i for i, clave in enumerate(claves_ordenadas)}
+    rangos = np.fromiter((posicion[c] for c in claves), dtype=np.int64, count=len(claves))
+    return rangos[inversa]
+
+
+def _listas_por_grupo(codigos: np.ndarray, valores: np.ndarray, orden: np.ndarray,
+                      mascara: np.ndarray, num_grupos: int) -> List[List]:
+    """
+    Repartir valores[mascara] en una lista por grupo
+    `orden` es una permutación de filas ordenada por código de grupo; dentro de cada
+    grupo las listas respetan ese orden
+    """
+    seleccion = orden[mascara[orden]]
+    valores_sel = valores[seleccion].tolist()
+    limites = np.searchsorted(codigos[seleccion], np.arange(num_grupos + 1)).tolist()
+    return [valores_sel[limites[i]:limites[i + 1]] for i in range(num_grupos)]
+
+
+def _internar(valores: np.ndarray) -> np.ndarray:
+    """
+    Sustituir cada cadena por su versión internada (una sola copia por valor distinto)
+    Se interna una vez por valor único (factorize), no por celda; el resto de valores
+    (números, NaN, None) se conservan tal cual
+    """
+    codigos, unicos = pd.factorize(valores)
+    if len(unicos) == 0:
+        return valores
+    internados = np.empty(len(unicos), dtype=object)
+    internados[:] = [sys.intern(u) if type(u) is str else None for u in unicos]
+    # Una cadena solo es igual a otra cadena: esas celdas se pueden sustituir sin cambiar el tipo
+    es_texto = np.fromiter((type(u) is str for u in unicos), dtype=bool, count=len(unicos))
+    seleccion = (codigos >= 0) & es_texto[codigos]
+    resultado = valores.copy()
+    resultado[seleccion] = internados[codigos[seleccion]]
+    return resultado
+
+
+def _texto_o_vacio(valores: np.ndarray) -> list:
+    """Textos sin espacios extremos, '' en los valores nulos (NaN/None)"""
+    return np.where(pd.isna(valores), '', _texto_limpio(valores)).tolist()
+
+
+def _terminal_real(terminales: np.ndarray) -> np.ndarray:
+    """Máscara de filas con terminal (no nulo, no vacío y distinto de 'S/T')"""
+    normalizados = _texto_normalizado(terminales)
+    return ~pd.isna(terminales) & (normalizados != '') & (normalizados != 'S/T')
+
+
+class _ColumnasAgrupacion:
+    """
+    Columnas ya normalizadas para agrupar por cable + elemento respecto a un terminal.
+    Se calculan una vez para todas las filas; agrupar un subconjunto (las filas de un
+    terminal) solo indexa estos arrays, sin volver a normalizar texto.
+    """
+
+    __slots__ = ('claves', 'cables', 'con_cable', 'de_normalizado', 'para_normalizado', 'rango_cables',
+                 'cod_cable', 'de_elemento', 'descripcion', 'seccion', 'longitud', 'de_terminal')
+
+    def __init__(self, columnas: _ColumnasResultados, internar: bool = False):
+        # Columnas con nombre variable (acentos/codificación) resueltas una vez por conjunto de columnas
+        columnas_norm = _mapa_columnas_normalizadas(tuple(columnas.nombres))
+
+        self.cod_cable = columnas.valores('Cod. cable', 'Sin código')
+        self.de_elemento = columnas.valores('De Elemento', 'Sin elemento')
+        self.de_terminal = columnas.valores('De Terminal', '')
+        self.descripcion = columnas.valores(columnas_norm.get(_normalizar_nombre('Descripción Cable')), '')
+        self.seccion = columnas.valores(columnas_norm.get(_normalizar_nombre('Sección')), '')
+        self.longitud = columnas.valores('Longitud', '')
+
+        self.claves = _concatenar_clave(self.cod_cable, '|', self.de_elemento)
+        self.cables = _texto_limpio(columnas.valores('Cable / Marca', ''))
+        if internar:
+            self.claves = _internar(self.claves)
+            self.cables = _internar(self.cables)
+        self.con_cable = self.cables != ''
+        self.de_normalizado = _texto_normalizado(self.de_terminal)
+        self.para_normalizado = _texto_normalizado(columnas.valores('Para Terminal', ''))
+        self.rango_cables = _rango_orden_cables(self.cables)
+
+    def agrupar(self, terminal_buscado: str, filas: Optional[np.ndarray] = None) -> Dict:
+        """
+        Grupos cable + elemento de las filas indicadas (todas si filas es None),
+        clasificando cada fila respecto a terminal_buscado (ver agrupar_por_cable_elemento)
+        """
+        def columna(valores):
+            return valores if filas is None else valores[filas]
+
+        # Clave del grupo, numerada por orden de primera aparición
+        codigos, claves_unicas = pd.factorize(columna(self.claves), sort=False)
+        num_grupos = len(claves_unicas)
+        _, primeras = np.unique(codigos, return_index=True)
+
+        # Clasificación de cada fila respecto al terminal buscado (CASE-INSENSITIVE)
+        terminal_upper = str(terminal_buscado).upper().strip()
+        cables = columna(self.cables)
+        con_cable = columna(self.con_cable)
+        tiene_origen = con_cable & (columna(self.de_normalizado) == terminal_upper)
+        tiene_destino = con_cable & (columna(self.para_normalizado) == terminal_upper)
+
+        doble = tiene_origen & tiene_destino          # ROJO: terminal en ambas puntas (DE ESTA FILA)
+        solo_origen = tiene_origen & ~tiene_destino   # AZUL: terminal solo en "De Terminal"
+        solo_destino = tiene_destino & ~tiene_origen  # VERDE: terminal solo en "Para Terminal"
+
+        num_terminales = np.bincount(
+            codigos,
+            weights=2 * doble + solo_origen + solo_destino,
+            minlength=num_grupos
+        ).astype(np.int64)
+
+        # Filas ordenadas por grupo (estable: conserva el orden original dentro del grupo)
+        orden = np.argsort(codigos, kind='stable')
+        cables_doble = _listas_por_grupo(codigos, cables, orden, doble, num_grupos)
+        cables_de = _listas_por_grupo(codigos, cables, orden, solo_origen, num_grupos)
+        cables_para = _listas_por_grupo(codigos, cables, orden, solo_destino, num_grupos)
+
+        # Lista completa de cables ordenada (números primero) dentro de cada grupo
+        orden_cables = np.lexsort((columna(self.rango_cables), codigos))
+        todos_cables = _listas_por_grupo(codigos, cables, orden_cables, con_cable, num_grupos)
+
+        # Valores de la primera fila de cada grupo
+        primeras = primeras if filas is None else filas[primeras]
+        cod_cable_0 = self.cod_cable[primeras]
+        de_elemento_0 = self.de_elemento[primeras]
+        descripcion_0 = self.descripcion[primeras]
+        seccion_0 = self.seccion[primeras]
+        longitud_0 = self.longitud[primeras]
+        de_terminal_0 = self.de_terminal[primeras]
+
+        grupos = {}
+        for i, clave in enumerate(claves_unicas):
+            grupos[clave] = {
+                'cod_cable': _safe_str(cod_cable_0[i]),
+                'elemento': _safe_str(de_elemento_0[i]),
+                'descripcion': _safe_str(descripcion_0[i]),
+                'seccion': _safe_str(seccion_0[i]),
+                'longitud': _safe_num(longitud_0[i]),
+                'de_terminal': _safe_str(de_terminal_0[i]),
+                'cables_doble_terminal': cables_doble[i],
+                'cables_de_terminal': cables_de[i],
+                'cables_para_terminal': cables_para[i],
+                'num_terminales': int(num_terminales[i]),
+                'todos_cables': todos_cables[i],
+                'num_cables': len(todos_cables[i])
+            }
+
+        return grupos
+
+
+def agrupar_por_cable_elemento(resultados, terminal_buscado: str) -> Dict:
+    """
+    Agrupar resultados por código de cable y elemento (De Elemento)
+
+    REGLAS:
+    1. Agrupar por Código de Cable + De Elemento (como los corta la máquina)
+    2. Un mismo cable puede aparecer VARIAS VECES en el mismo elemento (cables duplicados)
+    3. AZUL: terminal solo en un lado (1 terminal)
+    4. ROJO: terminal en AMBOS lados (2 terminales en la MISMA fila)
+    5. Total esperado: ~98 cables mostrados, 150 terminales
+
+    `resultados` puede ser la lista de registros de buscar_terminal o un DataFrame.
+    La clasificación de filas y el recuento se hacen por columnas (groupby/NumPy);
+    solo se itera en Python una vez por grupo para montar el diccionario de salida.
+    """
+    if resultados is None or len(resultados) == 0:
+        return {}
+    return _ColumnasAgrupacion(_ColumnasResultados(resultados)).agrupar(terminal_buscado)
+
+
+def agrupar_por_cod_cable_elemento(registros) -> Dict:
+    """
+    Agrupar registros por Cod.cable + De Elemento (grupos de etiquetas de un libro)
+    Similar a agrupar_por_cable_elemento pero sin filtrar por terminal: num_cables
+    son las filas del grupo y num_terminales las puntas con terminal (no 'S/T').
+
+    `registros` puede ser una lista de registros o el DataFrame de la hoja. Las
+    columnas se normalizan una sola vez y el recuento se hace con factorize/bincount;
+    solo se itera en Python una vez por grupo para montar el diccionario de salida.
+    """
+    if registros is None or len(registros) == 0:
+        return {}
+
+    columnas = _ColumnasResultados(registros)
+
+    cod_cable = columnas.valores('Cod. cable', 'Sin código')
+    de_elemento = columnas.valores('De Elemento', 'Sin elemento')
+
+    # Saltar filas sin código o sin elemento (nulos o vacíos)
+    cod_cable_txt = _texto_limpio(cod_cable)
+    de_elemento_txt = _texto_limpio(de_elemento)
+    validas = (~pd.isna(cod_cable) & ~pd.isna(de_elemento)
+               & (cod_cable_txt != '') & (de_elemento_txt != ''))
+    filas = np.flatnonzero(validas)
+    if filas.size == 0:
+        return {}
+
+    # Clave del grupo, numerada por orden de primera aparición
+    claves = _concatenar_clave(cod_cable_txt[filas], '|', de_elemento_txt[filas])
+    codigos, claves_unicas = pd.factorize(claves, sort=False)
+    num_grupos = len(claves_unicas)
+    _, primeras = np.unique(codigos, return_index=True)
+    primeras = filas[primeras]
+
+    num_cables = np.bincount(codigos, minlength=num_grupos)
+    num_terminales = np.bincount(
+        codigos,
+        weights=(_terminal_real(columnas.valores('De Terminal', None)[filas]).astype(np.int64)
+                 + _terminal_real(columnas.valores('Para Terminal', None)[filas])),
+        minlength=num_grupos
+    ).astype(np.int64)
+
+    # Valores de la primera fila de cada grupo
+    longitud_0 = columnas.valores('Longitud', None)[primeras]
+
+    grupos = {}
+    for clave, cod, elemento, descripcion, seccion, longitud, de_terminal, terminales, cables in zip(
+            claves_unicas,
+            cod_cable_txt[primeras].tolist(),
+            de_elemento_txt[primeras].tolist(),
+            _texto_o_vacio(columnas.valores('Descripción Cable', None)[primeras]),
+            _texto_o_vacio(columnas.valores('Sección', None)[primeras]),
+            np.where(pd.isna(longitud_0), '', longitud_0).tolist(),
+            _texto_o_vacio(columnas.valores('De Terminal', None)[primeras]),
+            num_terminales.tolist(),
+            num_cables.tolist()):
+        grupos[clave] = {
+            'cod_cable': cod,
+            'elemento': elemento,
+            'descripcion': descripcion,
+            'seccion': seccion,
+            'longitud': longitud,
+            'de_terminal': de_terminal,
+            'num_terminales': terminales,
+            'num_cables': cables
+        }
+
+    return grupos
+
+
+def terminales_unicos(df: pd.DataFrame) -> List[str]:
+    """
+    Terminales únicos de un DataFrame de corte (De Terminal y Para Terminal),
+    excluyendo 'S/T' y valores vacíos, ordenados alfabéticamente
+    """
+    terminales = set()
+
+    for columna in ('De Terminal', 'Para Terminal'):
+        if columna not in df.columns:
+            continue
+        for terminal in df[columna].dropna().unique():
+            terminal_str = str(terminal).strip().upper()
+            if terminal_str and terminal_str != 'S/T' and terminal_str != 'NAN':
+                terminales.add(terminal_str)
+
+    return sorted(terminales)
+
+
+def _elementos_por_codigo_cable(df: pd.DataFrame) -> Dict[str, Tuple[Dict, ...]]:
+    """
+    Código de cable normalizado (mayúsculas, sin espacios extremos) -> elementos
+    (De Elemento) con descripción, terminal de la primera fila y número de filas,
+    ordenados por elemento
+    """
+    if 'Cod. cable' not in df.columns or len(df) == 0:
+        return {}
+
+    columnas = _ColumnasResultados(df)
+    codigos_cable = _internar(_texto_normalizado(columnas.valores('Cod. cable', '')))
+    elementos = columnas.valores('De Elemento', 'Sin elemento')
+    elementos = _internar(_texto_limpio(np.where(pd.isna(elementos), 'Sin elemento', elementos)))
+
+    # Un grupo por (código, elemento), numerado por orden de primera aparición
+    codigos, _ = pd.factorize(_concatenar_clave(codigos_cable, '\x00', elementos), sort=False)
+    cantidades = np.bincount(codigos)
+    _, primeras = np.unique(codigos, return_index=True)
+
+    por_codigo = {}
+    for codigo, elemento, descripcion, terminal, cantidad in zip(
+            codigos_cable[primeras].tolist(),
+            elementos[primeras].tolist(),
+            _texto_o_vacio(columnas.valores('De Descripción', None)[primeras]),
+            _texto_o_vacio(columnas.valores('De Terminal', None)[primeras]),
+            cantidades.tolist()):
+        por_codigo.setdefault(codigo, []).append({
+            'elemento': elemento,
+            'descripcion': descripcion,
+            'terminal': terminal,
+            'cantidad': cantidad
+        })
+
+    return {codigo: tuple(sorted(lista, key=lambda x: x['elemento'])) for codigo, lista in por_codigo.items()}
+
+
+_CONTENEDORES = (dict, list, tuple, np.ndarray)
+
+
+def _tamano_profundo(raices, vistos: set) -> int:
+    """
+    Bytes ocupados por los objetos alcanzables desde `raices` (diccionarios, listas,
+    tuplas, arrays NumPy y sus valores), contando cada objeto una sola vez.
+    Los ids de `vistos` ya están contabilizados y no se vuelven a sumar.
+    """
+    total = 0
+    pendientes = list(raices)
+    while pendientes:
+        objeto = pendientes.pop()
+        if id(objeto) in vistos:
+            continue
+        vistos.add(id(objeto))
+        if isinstance(objeto, np.ndarray):
+            total += sys.getsizeof(objeto) + (0 if objeto.base is None else objeto.nbytes)
+            hijos = objeto.ravel().tolist() if objeto.dtype == object else ()
+        else:
+            total += sys.getsizeof(objeto)
+            if isinstance(objeto, dict):
+                hijos = [*objeto.keys(), *objeto.values()]
+            elif isinstance(objeto, (list, tuple)):
+                hijos = objeto
+            else:
+                continue
+        if not hijos or vistos.issuperset(map(id, hijos)):
+            continue
+        # Hijos nuevos: los valores simples (cadenas, números) se suman en bloque y
+        # solo los contenedores pasan a la pila
+        nuevos = {id(h): h for h in hijos if id(h) not in vistos}
+        contenedores = [h for h in nuevos.values() if isinstance(h, _CONTENEDORES)]
+        for h in contenedores:
+            del nuevos[id(h)]
+        vistos.update(nuevos)
+        total += sum(map(sys.getsizeof, nuevos.values()))
+        pendientes.extend(contenedores)
+    return total
+
+
+def _tamano_dataframe(df: pd.DataFrame, vistos: set) -> int:
+    """
+    Bytes del DataFrame: arrays de las columnas más cada objeto de las columnas de
+    texto contado una vez (las cadenas internadas que comparten los índices quedan
+    en `vistos` y no se vuelven a sumar)
+    """
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    for posicion, tipo in enumerate(df.dtypes):
+        if tipo == object:
+            # La lista auxiliar no forma parte del modelo: se descuenta
+            celdas = df.iloc[:, posicion].tolist()
+            total += _tamano_profundo([celdas], vistos) - sys.getsizeof(celdas)
+    return total
+
+
+def _internar_columnas_texto(df: pd.DataFrame) -> None:
+    """Internar las cadenas de las columnas de texto (el DataFrame aún no es compartido)"""
+    for posicion, tipo in enumerate(df.dtypes):
+        if tipo == object:
+            df.isetitem(posicion, _internar(df.iloc[:, posicion].to_numpy()))
+
+
+class ModeloCorte:
+    """
+    Hoja de corte compilada: DataFrame + todos sus índices, construidos en una sola
+    pasada al cargar el archivo (excel_cache) y compartidos por todas las peticiones.
+
+    - terminales: terminales únicos (sin 'S/T' ni vacíos), ordenados
+    - indice: filas de cada terminal en 'De Terminal' / 'Para Terminal'
+    - grupos_terminal(): grupos cable + elemento de cada terminal (precalculados)
+    - grupos_etiquetas: grupos cod.cable + elemento del libro completo
+    - elementos_por_codigo_cable(): elementos de cada código de cable
+    - tamano_bytes: memoria estimada del DataFrame más todos los índices (caché LRU)
+
+    Inmutable: no se pueden reasignar atributos, y los DataFrames, diccionarios y
+    listas devueltos son compartidos; NO se deben modificar.
+    """
+
+    __slots__ = ('df', 'indice', 'terminales', 'grupos_etiquetas', 'tamano_bytes',
+                 '_columnas', '_grupos_por_terminal', '_elementos_por_cable')
+
+    def __init__(self, df: pd.DataFrame):
+        _internar_columnas_texto(df)
+        indice = IndiceTerminales(df)
+        terminales = tuple(sys.intern(t) for t in terminales_unicos(df))
+
+        columnas = _ColumnasAgrupacion(_ColumnasResultados(df), internar=True) if len(df) else None
+        grupos_por_terminal = {}
+        for terminal in terminales:
+            grupos_por_terminal[terminal] = self._agrupar_terminal(indice, columnas, terminal)
+
+        object.__setattr__(self, 'df', df)
+        object.__setattr__(self, 'indice', indice)
+        object.__setattr__(self, 'terminales', terminales)
+        object.__setattr__(self, 'grupos_etiquetas', agrupar_por_cod_cable_elemento(df))
+        object.__setattr__(self, '_columnas', columnas)
+        object.__setattr__(self, '_grupos_por_terminal', grupos_por_terminal)
+        object.__setattr__(self, '_elementos_por_cable', _elementos_por_codigo_cable(df))
+        object.__setattr__(self, 'tamano_bytes', self._calcular_tamano())
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('ModeloCorte es inmutable')
+
+    def __delattr__(self, nombre):
+        raise AttributeError('ModeloCorte es inmutable')
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _calcular_tamano(self) -> int:
+        """
+        Memoria estimada del modelo: DataFrame + índice de terminales + columnas de
+        agrupación + grupos precalculados (terminales, etiquetas, elementos por cable).
+        Las cadenas internadas compartidas con el DataFrame se cuentan una sola vez.
+        """
+        vistos = set()
+        total = _tamano_dataframe(self.df, vistos)
+        raices = [self.indice.origen, self.indice.destino, self.terminales, self.grupos_etiquetas,
+                  self._grupos_por_terminal, self._elementos_por_cable]
+        if self._columnas is not None:
+            raices.extend(getattr(self._columnas, nombre) for nombre in _ColumnasAgrupacion.__slots__)
+        return total + _tamano_profundo(raices, vistos)
+
+    @staticmethod
+    def _agrupar_terminal(indice: IndiceTerminales, columnas: Optional[_ColumnasAgrupacion],
+                          terminal: str) -> Tuple[int, Dict]:
+        posiciones, _ = indice.buscar(terminal)
+        if posiciones.size == 0:
+            return 0, {}
+        return int(posiciones.size), columnas.agrupar(terminal, posiciones)
+
+    def grupos_terminal(self, terminal: str) -> Tuple[int, Dict]:
+        """
+        Grupos cable + elemento de un terminal (insensible a mayúsculas)
+        Retorna (filas donde aparece el terminal, grupos); (0, {}) si no aparece
+        """
+        terminal_upper = str(terminal).upper().strip()
+        resultado = self._grupos_por_terminal.get(terminal_upper)
+        if resultado is None:
+            # Terminal fuera del catálogo (p. ej. 'S/T'): se agrupa al vuelo
+            resultado = self._agrupar_terminal(self.indice, self._columnas, terminal)
+        return resultado
+
+    def elementos_por_codigo_cable(self, codigo_cable: str) -> List[Dict]:
+        """Elementos (De Elemento) de un código de cable, ordenados por elemento"""
+        return list(self._elementos_por_cable.get(str(codigo_cable).upper().strip(), ()))
@@ -1,14 +1,21 @@
 """
 Gestor de impresión para Zebra GK420T
-Soporta modo producción (CUPS) y modo simulación (archivos .txt)
+Soporta modo producción (CUPS, TCP raw o USB directo) y modo simulación (archivos .txt)
 """
 import os
 import subprocess
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import logging
 
+from app.indice_simuladas import IndiceEtiquetasSimuladas
+from app.spool_impresion import SpoolImpresion
+from app.transporte_impresora import obtener_transporte
+from app.zpl_templates import anteponer_formatos
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,17 +35,69 @@ class PrinterManager:
             self.enabled = getattr(config, 'PRINTER_ENABLED', True)
             self.simulation_dir = getattr(config, 'PRINTER_SIMULATION_DIR', 'data/etiquetas_simuladas')
             self.pending_file = getattr(config, 'PRINTER_PENDING_FILE', 'data/etiquetas_pendientes.json')
+            self.transport = getattr(config, 'PRINTER_TRANSPORT', 'cups')
+            self.printer_host = getattr(config, 'PRINTER_HOST', '')
+            self.printer_port = getattr(config, 'PRINTER_PORT', 9100)
+            self.usb_device = getattr(config, 'PRINTER_USB_DEVICE', '/dev/usb/lp0')
+            self.timeout = getattr(config, 'PRINTER_TIMEOUT', 10)
+            self.spool_dir = getattr(config, 'PRINTER_SPOOL_DIR', 'data/spool_impresion')
+            self.spool_backoff_base = getattr(config, 'PRINTER_SPOOL_BACKOFF_BASE', 5)
+            self.spool_backoff_max = getattr(config, 'PRINTER_SPOOL_BACKOFF_MAX', 600)
+            self.spool_max_intentos = getattr(config, 'PRINTER_SPOOL_MAX_INTENTOS', 20)
+            self.spool_lote = getattr(config, 'PRINTER_SPOOL_LOTE', 50)
         else:
             self.printer_name = 'ZebraGK420T'
             self.simulation_mode = True
             self.enabled = True
             self.simulation_dir = 'data/etiquetas_simuladas'
             self.pending_file = 'data/etiquetas_pendientes.json'
+            self.transport = 'cups'
+            self.printer_host = ''
+            self.printer_port = 9100
+            self.usb_device = '/dev/usb/lp0'
+            self.timeout = 10
+            self.spool_dir = 'data/spool_impresion'
+            self.spool_backoff_base = 5
+            self.spool_backoff_max = 600
+            self.spool_max_intentos = 20
+            self.spool_lote = 50
+        
+        # Transporte directo compartido (TCP/USB); None = CUPS
+        self.transporte = obtener_transporte(
+            self.transport,
+            host=self.printer_host,
+            port=self.printer_port,
+            dispositivo=self.usb_device,
+            timeout=self.timeout
+        )
+        
+        # Spool de pendientes (un archivo por trabajo); se importa el antiguo JSON si existe
+        self.spool = SpoolImpresion(
+            self.spool_dir,
+            backoff_base=self.spool_backoff_base,
+            backoff_max=self.spool_backoff_max,
+            max_intentos=self.spool_max_intentos
+        )
+        importadas = self.spool.importar_json(self.pending_file)
+        if importadas:
+            logger.info(f"Migradas {importadas} etiquetas pendientes de {self.pending_file} al spool")
+        self._drainer_thread = None
+        self._drainer_pid = None
         
         # Crear directorio de simulación si no existe
         if self.simulation_mode:
             os.makedirs(self.simulation_dir, exist_ok=True)
         
+        # Índice de etiquetas simuladas (subcarpetas por día + SQLite con metadatos)
+        self.simulated_index = IndiceEtiquetasSimuladas(self.simulation_dir)
+        
+        # Estado cacheado, refrescado por la sonda en segundo plano (start_status_probe)
+        self._status_lock = threading.Lock()
+        self._cached_status = None
+        self._status_checked_at = None
+        self._probe_thread = None
+        self._probe_pid = None
+        
         # Verificar disponibilidad real solo si no está en modo simulación
         if not self.simulation_mode and self.enabled:
             self.available = self._check_printer_available()
@@ -52,6 +111,14 @@ class PrinterManager:
         Returns:
             True si la impresora está disponible, False en caso contrario
         """
+        if self.transporte is not None:
+            available = self.transporte.disponible()
+            if available:
+                logger.info(f"Impresora {self.transporte.descripcion()} ({self.transport}) disponible")
+            else:
+                logger.warning(f"Impresora {self.transporte.descripcion()} ({self.transport}) no disponible")
+            return available
+        
         try:
             result = subprocess.run(
                 ['lpstat', '-p', self.printer_name],
@@ -115,7 +182,8 @@ class PrinterManager:
             Resultado de la simulación
         """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            now = datetime.now()
+            timestamp = now.strftime("%Y%m%d_%H%M%S_%f")
             
             # Generar nombre de archivo descriptivo
             if metadata:
@@ -125,12 +193,13 @@ class PrinterManager:
             else:
                 filename = f"{timestamp}_etiqueta.zpl"
             
-            file_path = os.path.join(self.simulation_dir, filename)
+            # Una subcarpeta por día para que ningún directorio crezca sin límite
+            file_path = os.path.join(self.simulated_index.carpeta_del_dia(now), filename)
             
             # Guardar código ZPL
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(f"# SIMULACIÓN DE IMPRESIÓN ZEBRA GK420T\n")
-                f.write(f"# Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"# Fecha: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 
                 if metadata:
                     f.write(f"# Metadatos:\n")
@@ -141,8 +210,10 @@ class PrinterManager:
                 f.write(f"# Dimensiones: 55mm x 15mm (2.17\" x 0.59\")\n")
                 f.write(f"# DPI: 203 (8 dpmm)\n")
                 f.write(f"\n{'='*60}\n\n")
-                f.write(zpl_code)
+                f.write(anteponer_formatos(zpl_code))
+                size = f.tell()
             
+            self.simulated_index.registrar(file_path, now, metadata, size)
             logger.info(f"Etiqueta simulada guardada en: {file_path}")
             
             return {
@@ -161,6 +232,77 @@ class PrinterManager:
                 'simulation': True
             }
     
+    def print_zpl_batch(self, etiquetas: List[Tuple[str, Dict]]) -> List[Dict[str, any]]:
+        """
+        Imprimir varias etiquetas como un único trabajo de impresión
+        
+        ZPL permite concatenar varios formatos ^XA...^XZ en un mismo envío raw, así
+        que en producción todas las etiquetas (p.ej. las de un bono) van en un solo
+        lpr en lugar de un lpr + lpstat por etiqueta.
+        
+        Args:
+            etiquetas: Lista de (zpl_code, metadata)
+        
+        Returns:
+            Lista de resultados, uno por etiqueta y en el mismo orden
+        """
+        if not etiquetas:
+            return []
+        
+        if not self.enabled:
+            return [self.print_zpl(zpl, metadata) for zpl, metadata in etiquetas]
+        
+        # Modo simulación: un archivo por etiqueta (igual que print_zpl)
+        if self.simulation_mode:
+            return [self._simulate_print(zpl, metadata) for zpl, metadata in etiquetas]
+        
+        if len(etiquetas) == 1:
+            return [self._real_print(*etiquetas[0])]
+        
+        return self._real_print_batch(etiquetas)
+    
+    def _send_raw(self, zpl_code: str) -> Tuple[bool, Optional[int], str]:
+        """
+        Enviar código ZPL a la impresora: por el transporte directo (TCP/USB) si está
+        configurado, o a CUPS con lpr en modo raw
+        
+        Returns:
+            (éxito, job_id, mensaje de error); job_id solo existe con CUPS
+        """
+        # Definiciones ^DF de los formatos guardados que usen las etiquetas (una vez por envío)
+        zpl_code = anteponer_formatos(zpl_code)
+        
+        if self.transporte is not None:
+            self.transporte.enviar(zpl_code)
+            return True, None, ''
+        
+        # Crear archivo temporal con el código ZPL
+        timestamp = datetime.now().timestamp()
+        temp_file = f'/tmp/zpl_{timestamp}.zpl'
+        
+        with open(temp_file, 'w') as f:
+            f.write(zpl_code)
+        
+        try:
+            # Imprimir usando lpr con opción raw (sin procesamiento)
+            result = subprocess.run(
+                ['lpr', '-P', self.printer_name, '-o', 'raw', temp_file],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        finally:
+            # Limpiar archivo temporal
+            try:
+                os.remove(temp_file)
+            except:
+                pass
+        
+        if result.returncode == 0:
+            return True, self._get_last_job_id(), ''
+        
+        return False, None, result.stderr or "Error desconocido"
+    
     def _real_print(self, zpl_code: str, metadata: Dict = None) -> Dict[str, any]:
         """
         Imprimir realmente via CUPS
@@ -183,38 +325,17 @@ class PrinterManager:
             }
         
         try:
-            # Crear archivo temporal con el código ZPL
-            timestamp = datetime.now().timestamp()
-            temp_file = f'/tmp/zpl_{timestamp}.zpl'
-            
-            with open(temp_file, 'w') as f:
-                f.write(zpl_code)
-            
-            # Imprimir usando lpr con opción raw (sin procesamiento)
-            result = subprocess.run(
-                ['lpr', '-P', self.printer_name, '-o', 'raw', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            # Limpiar archivo temporal
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+            ok, job_id, error_msg = self._send_raw(zpl_code)
             
-            if result.returncode == 0:
-                job_id = self._get_last_job_id()
+            if ok:
                 logger.info(f"Etiqueta enviada a impresora - Job ID: {job_id}")
                 
                 return {
                     'success': True,
-                    'message': f'Etiqueta enviada a impresión (Job #{job_id})',
+                    'message': self._sent_message('Etiqueta enviada a impresión', job_id),
                     'job_id': job_id
                 }
             else:
-                error_msg = result.stderr or "Error desconocido"
                 logger.error(f"Error imprimiendo: {error_msg}")
                 
                 # Guardar en pendientes
@@ -248,6 +369,54 @@ class PrinterManager:
                 'pending': True
             }
     
+    def _real_print_batch(self, etiquetas: List[Tuple[str, Dict]]) -> List[Dict[str, any]]:
+        """
+        Imprimir varias etiquetas via CUPS en un único trabajo raw
+        Si el envío falla, cada etiqueta se guarda por separado en pendientes
+        """
+        if not self.available:
+            error_msg = "Impresora no disponible"
+            resultado = {
+                'success': False,
+                'message': 'Impresora no disponible - guardado en cola de pendientes',
+                'pending': True
+            }
+        else:
+            # Un formato ^XA...^XZ detrás de otro
+            zpl_lote = '\n'.join(zpl.strip() for zpl, _ in etiquetas) + '\n'
+            
+            try:
+                ok, job_id, error_msg = self._send_raw(zpl_lote)
+            except subprocess.TimeoutExpired:
+                ok, error_msg = False, "Timeout al imprimir (impresora no responde)"
+            except Exception as e:
+                ok, error_msg = False, str(e)
+            
+            if ok:
+                logger.info(f"Lote de {len(etiquetas)} etiquetas enviado a impresora - Job ID: {job_id}")
+                return [{
+                    'success': True,
+                    'message': self._sent_message('Etiqueta enviada a impresión en lote', job_id),
+                    'job_id': job_id
+                } for _ in etiquetas]
+            
+            logger.error(f"Error imprimiendo lote de {len(etiquetas)} etiquetas: {error_msg}")
+            resultado = {
+                'success': False,
+                'message': f'Error de impresión: {error_msg}',
+                'pending': True
+            }
+        
+        for zpl, metadata in etiquetas:
+            self._save_pending_label(zpl, metadata, error_msg)
+        return [dict(resultado) for _ in etiquetas]
+    
+    def _sent_message(self, message: str, job_id: Optional[int]) -> str:
+        """Mensaje de envío correcto: con el Job de CUPS o con el destino directo"""
+        if self.transporte is not None:
+            return f'{message} ({self.transport.upper()} {self.transporte.descripcion()})'
+        return f'{message} (Job #{job_id})'
+    
     def _get_last_job_id(self) -> Optional[int]:
         """
         Obtener ID del último trabajo de impresión
@@ -284,28 +453,10 @@ class PrinterManager:
             error: Mensaje de error
         """
         try:
-            # Leer pendientes existentes
-            if os.path.exists(self.pending_file):
-                with open(self.pending_file, 'r') as f:
-                    pendientes = json.load(f)
+            if self.spool.agregar(zpl_code, metadata, error):
+                logger.info("Etiqueta guardada en cola de pendientes")
             else:
-                pendientes = []
-            
-            # Agregar nueva etiqueta pendiente
-            pendientes.append({
-                'zpl': zpl_code,
-                'metadata': metadata or {},
-                'error': error,
-                'fecha': datetime.now().isoformat(),
-                'intentos': 0
-            })
-            
-            # Guardar
-            os.makedirs(os.path.dirname(self.pending_file), exist_ok=True)
-            with open(self.pending_file, 'w') as f:
-                json.dump(pendientes, f, indent=2)
-            
-            logger.info(f"Etiqueta guardada en cola de pendientes ({len(pendientes)} total)")
+                logger.info("Etiqueta ya estaba en la cola de pendientes")
             
         except Exception as e:
             logger.error(f"Error guardando etiqueta pendiente: {e}")
@@ -336,6 +487,9 @@ class PrinterManager:
                 'message': 'Impresión deshabilitada en configuración'
             }
         
+        if self.transporte is not None:
+            return self._direct_status()
+        
         try:
             # Verificar estado con lpstat
             result = subprocess.run(
@@ -399,78 +553,254 @@ class PrinterManager:
                 'has_paper': False
             }
     
+    def refresh_status(self) -> Dict[str, any]:
+        """
+        Consultar el estado real de la impresora, actualizar la caché y la
+        disponibilidad que usa la impresión
+        """
+        status = self.get_printer_status()
+        
+        if self.enabled and not self.simulation_mode:
+            self.available = bool(status.get('available'))
+        
+        with self._status_lock:
+            self._cached_status = status
+            self._status_checked_at = datetime.now()
+        return status
+    
+    def get_cached_status(self) -> Dict[str, any]:
+        """
+        Último estado conocido (sin lanzar procesos ni abrir conexiones)
+        Solo la primera vez, antes de que la sonda haya terminado, se consulta en el momento
+        """
+        with self._status_lock:
+            status = self._cached_status
+            checked_at = self._status_checked_at
+        
+        if status is None:
+            status = self.refresh_status()
+            with self._status_lock:
+                checked_at = self._status_checked_at
+        
+        return {**status, 'last_check': checked_at.isoformat() if checked_at else None}
+    
+    def start_status_probe(self, interval: int) -> None:
+        """
+        Arrancar (una sola vez por proceso) el hilo que refresca el estado cada
+        `interval` segundos. Con interval <= 0 no hay sonda.
+        """
+        if interval <= 0:
+            return
+        
+        with self._status_lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive() and self._probe_pid == os.getpid():
+                return
+            
+            def probe():
+                while True:
+                    try:
+                        self.refresh_status()
+                    except Exception as e:
+                        logger.error(f"Error en la sonda de estado de la impresora: {e}")
+                    time.sleep(interval)
+            
+            self._probe_pid = os.getpid()
+            self._probe_thread = threading.Thread(target=probe, name='sonda-impresora', daemon=True)
+            self._probe_thread.start()
+    
+    def _direct_status(self) -> Dict[str, any]:
+        """Estado con transporte directo: ~HS por TCP, solo accesibilidad del dispositivo por USB"""
+        if not self.transporte.disponible():
+            return {
+                'available': False,
+                'status': 'offline',
+                'mode': 'Producción',
+                'message': f'Impresora {self.transporte.descripcion()} no accesible',
+                'has_paper': False
+            }
+        
+        estado = self.transporte.consultar_estado()
+        if estado is None:
+            status, message, has_paper = 'idle', 'Impresora accesible', True
+        elif estado['papel_agotado']:
+            status, message, has_paper = 'media-empty', 'Sin papel o etiquetas', False
+        elif estado['en_pausa']:
+            status, message, has_paper = 'paused', 'Impresora en pausa', True
+        else:
+            status, message, has_paper = 'idle', 'Impresora lista', True
+        
+        return {
+            'available': True,
+            'status': status,
+            'mode': 'Producción',
+            'message': message,
+            'has_paper': has_paper,
+            'printer_name': f'{self.printer_name} ({self.transport.upper()} {self.transporte.descripcion()})'
+        }
+    
     def _count_simulated_labels(self) -> int:
-        """Contar etiquetas simuladas guardadas"""
+        """Contar etiquetas simuladas guardadas (consulta al índice)"""
         try:
-            if os.path.exists(self.simulation_dir):
-                files = [f for f in os.listdir(self.simulation_dir) if f.endswith('.zpl')]
-                return len(files)
-        except:
-            pass
+            return self.simulated_index.contar()
+        except Exception as e:
+            logger.error(f"Error contando etiquetas simuladas: {e}")
         return 0
     
+    def list_simulated_labels(self, limit: int = 100, cursor: Optional[int] = None,
+                              bono: Optional[str] = None, carro: Optional[str] = None,
+                              tipo: Optional[str] = None) -> Dict[str, any]:
+        """
+        Página de etiquetas simuladas, más recientes primero
+        
+        Args:
+            limit: Etiquetas por página
+            cursor: Valor de next_cursor de la página anterior (None = primera página)
+            bono, carro, tipo: Filtros opcionales
+        
+        Returns:
+            Dict con etiquetas, total (con los filtros) y next_cursor (None en la última página)
+        """
+        etiquetas, next_cursor = self.simulated_index.listar(limit, cursor, bono, carro, tipo)
+        return {
+            'etiquetas': etiquetas,
+            'total': self.simulated_index.contar(bono, carro, tipo),
+            'next_cursor': next_cursor
+        }
+    
     def get_pending_labels(self) -> List[Dict]:
         """
         Obtener lista de etiquetas pendientes de impresión
         
         Returns:
-            Lista de etiquetas pendientes
+            Lista de etiquetas pendientes (estado 'pendiente') y de las que agotaron
+            los reintentos automáticos (estado 'fallida')
         """
         try:
-            if os.path.exists(self.pending_file):
-                with open(self.pending_file, 'r') as f:
-                    return json.load(f)
+            etiquetas = [{**trabajo, 'estado': 'pendiente'} for _, trabajo in self.spool.pendientes()]
+            etiquetas += [{**trabajo, 'estado': 'fallida'} for _, trabajo in self.spool.fallidas()]
+            for etiqueta in etiquetas:
+                etiqueta['proximo_intento'] = datetime.fromtimestamp(etiqueta['proximo_intento']).isoformat()
+            return etiquetas
         except Exception as e:
             logger.error(f"Error leyendo etiquetas pendientes: {e}")
         
         return []
     
+    def drain_pending(self, force: bool = False, wait: bool = True) -> Dict[str, int]:
+        """
+        Reintentar las etiquetas del spool cuyo backoff ha vencido (todas con force)
+        
+        Se envían en lotes de spool_lote etiquetas; si un lote falla, sus trabajos
+        cuentan un intento y se aplaza el resto hasta el siguiente drenado.
+        
+        Args:
+            force: Ignorar el backoff (reintento manual)
+            wait: Esperar si otro hilo/proceso está drenando; si no, no hacer nada
+        
+        Returns:
+            Contadores processed / successful / failed / remaining
+        """
+        resumen = {'processed': 0, 'successful': 0, 'failed': 0, 'remaining': 0}
+        
+        with self.spool.bloqueo(esperar=wait) as adquirido:
+            if not adquirido:
+                return resumen
+            
+            vencidos = self.spool.pendientes(solo_vencidos=not force)
+            
+            for inicio in range(0, len(vencidos), self.spool_lote):
+                lote = vencidos[inicio:inicio + self.spool_lote]
+                zpl_lote = '\n'.join(trabajo['zpl'].strip() for _, trabajo in lote) + '\n'
+                
+                try:
+                    ok, job_id, error_msg = self._send_raw(zpl_lote)
+                except subprocess.TimeoutExpired:
+                    ok, error_msg = False, "Timeout al imprimir (impresora no responde)"
+                except Exception as e:
+                    ok, error_msg = False, str(e)
+                
+                resumen['processed'] += len(lote)
+                if ok:
+                    for nombre, _ in lote:
+                        self.spool.marcar_enviada(nombre)
+                    resumen['successful'] += len(lote)
+                    continue
+                
+                logger.error(f"Error reintentando {len(lote)} etiquetas pendientes: {error_msg}")
+                for nombre, trabajo in lote:
+                    self.spool.marcar_fallo(nombre, trabajo, error_msg)
+                resumen['failed'] += len(lote)
+                break
+            
+            if resumen['successful']:
+                logger.info(f"Reenviadas {resumen['successful']} etiquetas pendientes")
+                self.spool.podar_enviadas()
+            resumen['remaining'] = len(self.spool.pendientes())
+        
+        return resumen
+    
+    def start_spool_drainer(self, interval: int) -> None:
+        """
+        Arrancar (una sola vez por proceso) el hilo que reintenta el spool cada
+        `interval` segundos mientras la impresora esté disponible
+        """
+        if interval <= 0 or self.simulation_mode or not self.enabled:
+            return
+        
+        with self._status_lock:
+            if self._drainer_thread is not None and self._drainer_thread.is_alive() and self._drainer_pid == os.getpid():
+                return
+            
+            def drainer():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        if self.available and self.spool.hay_pendientes():
+                            self.drain_pending(wait=False)
+                    except Exception as e:
+                        logger.error(f"Error drenando etiquetas pendientes: {e}")
+            
+            self._drainer_pid = os.getpid()
+            self._drainer_thread = threading.Thread(target=drainer, name='spool-impresora', daemon=True)
+            self._drainer_thread.start()
+    
     def retry_pending_labels(self) -> Dict[str, any]:
         """
-        Reintentar imprimir todas las etiquetas pendientes
+        Reintentar imprimir todas las etiquetas pendientes (también las que agotaron
+        los reintentos automáticos), sin esperar al backoff
         
         Returns:
             Resumen de resultados
         """
-        pendientes = self.get_pending_labels()
+        self.spool.reactivar_fallidas()
         
-        if not pendientes:
+        if not self.spool.hay_pendientes():
             return {
                 'success': True,
                 'message': 'No hay etiquetas pendientes',
                 'processed': 0,
                 'successful': 0,
-                'failed': 0
+                'failed': 0,
+                'remaining': 0
             }
         
-        successful = 0
-        failed = 0
-        still_pending = []
+        if self.simulation_mode or not self.enabled:
+            pendientes = self.spool.pendientes()
+            return {
+                'success': False,
+                'message': 'La impresora no está en modo producción',
+                'processed': 0,
+                'successful': 0,
+                'failed': 0,
+                'remaining': len(pendientes)
+            }
         
-        for etiqueta in pendientes:
-            result = self.print_zpl(etiqueta['zpl'], etiqueta.get('metadata'))
-            
-            if result['success']:
-                successful += 1
-            else:
-                failed += 1
-                etiqueta['intentos'] += 1
-                still_pending.append(etiqueta)
-        
-        # Actualizar archivo de pendientes
-        try:
-            with open(self.pending_file, 'w') as f:
-                json.dump(still_pending, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error actualizando pendientes: {e}")
+        resumen = self.drain_pending(force=True)
         
         return {
             'success': True,
-            'message': f'Procesadas {len(pendientes)} etiquetas',
-            'processed': len(pendientes),
-            'successful': successful,
-            'failed': failed,
-            'remaining': len(still_pending)
+            'message': f"Procesadas {resumen['processed']} etiquetas",
+            **resumen
         }
     
     def clear_simulated_labels(self) -> Dict[str, any]:
@@ -481,22 +811,19 @@ class PrinterManager:
             Resultado de la operación
         """
         try:
-            if not os.path.exists(self.simulation_dir):
+            deleted = self.simulated_index.eliminar_todas()
+            
+            if not deleted:
                 return {
                     'success': True,
                     'message': 'No hay etiquetas simuladas',
                     'deleted': 0
                 }
             
-            files = [f for f in os.listdir(self.simulation_dir) if f.endswith('.zpl')]
-            
-            for file in files:
-                os.remove(os.path.join(self.simulation_dir, file))
-            
             return {
                 'success': True,
-                'message': f'Eliminadas {len(files)} etiquetas simuladas',
-                'deleted': len(files)
+                'message': f'Eliminadas {deleted} etiquetas simuladas',
+                'deleted': deleted
             }
             
         except Exception as e:
@@ -506,3 +833,24 @@ class PrinterManager:
                 'message': f'Error: {str(e)}',
                 'deleted': 0
             }
+
+_shared_printer = None
+_shared_lock = threading.Lock()
+
+
+def get_printer_manager() -> PrinterManager:
+    """
+    PrinterManager compartido por todo el proceso (cola de impresión y rutas),
+    con la sonda de estado en marcha. Evita construir uno (y comprobar la
+    impresora con lpstat) en cada impresión o consulta de estado.
+    """
+    global _shared_printer
+    from config import Config
+    
+    with _shared_lock:
+        if _shared_printer is None:
+            _shared_printer = PrinterManager(Config)
+    
+    _shared_printer.start_status_probe(getattr(Config, 'PRINTER_STATUS_INTERVAL', 15))
+    _shared_printer.start_spool_drainer(getattr(Config, 'PRINTER_SPOOL_INTERVAL', 5))
+    return _shared_printer
@@ -1,34 +1,155 @@
-import json
+import copy
 import os
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
+from functools import wraps
 from config import Config
-from app.excel_manager import ExcelManager
+from app.catalogo_terminales import catalogo_terminales
+from app.almacenamiento import obtener_almacen, obtener_diario_progreso
+from app.diario_progreso import aplicar_evento_progreso
+from app.json_store import bloqueo_archivo
+from app.eventos_bonos import bus_eventos
+
+
+def _con_bloqueo(metodo):
+    """
+    Ejecutar un método que modifica los proyectos con el bloqueo del gestor tomado
+    (dentro del proceso y entre procesos), recargando antes el archivo si otro
+    proceso lo ha cambiado
+    """
+    @wraps(metodo)
+    def envoltorio(self, *args, **kwargs):
+        with self._lock, self._bloqueo_procesos():
+            self._recargar_si_cambio()
+            return metodo(self, *args, **kwargs)
+    return envoltorio
+
 
 class ProyectoManager:
     """Gestor de proyectos y asignación a carros"""
     
     def __init__(self):
         self.archivo_proyectos = Config.PROYECTOS_FILE
+        self.store = obtener_almacen('PROYECTOS_FILE')
+        self.diario = obtener_diario_progreso()
+        self._lock = threading.RLock()
+        self._profundidad_bloqueo = 0
+        self._firma = None
+        self._indice_proyectos = None
+        # Versión de los datos en memoria (ETags): identificador de instancia + contador de cambios
+        self._instancia = uuid.uuid4().hex
+        self._cambios = 0
         self.cargar_proyectos()
     
+    @contextmanager
+    def _bloqueo_procesos(self):
+        """
+        Bloqueo entre procesos (Config.PROYECTOS_LOCK_FILE), reentrante dentro del
+        proceso; se toma con self._lock ya tomado. Mientras se tiene, ningún otro
+        proceso recarga, modifica ni anota eventos en el diario, de modo que la
+        recarga, el cambio, el snapshot y el diario son coherentes entre sí.
+        """
+        self._profundidad_bloqueo += 1
+        try:
+            if self._profundidad_bloqueo > 1:
+                yield
+            else:
+                with bloqueo_archivo(Config.PROYECTOS_LOCK_FILE):
+                    yield
+        finally:
+            self._profundidad_bloqueo -= 1
+    
     def cargar_proyectos(self):
-        """Cargar proyectos desde archivo JSON"""
-        if os.path.exists(self.archivo_proyectos):
-            with open(self.archivo_proyectos, 'r', encoding='utf-8') as f:
-                self.proyectos = json.load(f)
+        """Cargar proyectos desde archivo JSON y reaplicar el diario de progreso"""
+        with self._lock, self._bloqueo_procesos():
+            if self.store.existe():
+                self.proyectos = self.store.leer()
+                self._indice_proyectos = None
+                self._cambios += 1
+                for evento in self.diario.leer(self.proyectos.get('generacion_diario')):
+                    self._aplicar_evento_progreso(evento)
+                self._firma = self._firma_actual()
+            else:
+                self.proyectos = {
+                    'proyectos': [],
+                    'carros': {str(i): None for i in range(1, Config.NUM_CARROS + 1)}
+                }
+                self.guardar_proyectos()
+    
+    def _escribir_snapshot(self, generacion):
+        """Guardar los proyectos (escritura atómica) junto con la generación del diario que empieza"""
+        if generacion is None:
+            self.proyectos.pop('generacion_diario', None)
         else:
-            self.proyectos = {
-                'proyectos': [],
-                'carros': {str(i): None for i in range(1, Config.NUM_CARROS + 1)}
-            }
-            self.guardar_proyectos()
+            self.proyectos['generacion_diario'] = generacion
+        self.store.escribir(self.proyectos)
     
     def guardar_proyectos(self):
-        """Guardar proyectos en archivo JSON"""
-        os.makedirs(os.path.dirname(self.archivo_proyectos), exist_ok=True)
-        with open(self.archivo_proyectos, 'w', encoding='utf-8') as f:
-            json.dump(self.proyectos, f, indent=2, ensure_ascii=False)
+        """
+        Guardar proyectos en archivo JSON (escritura atómica)
+        El snapshot ya incluye todos los eventos del diario, que empieza de nuevo
+        (ver DiarioProgreso.compactar)
+        """
+        with self._lock, self._bloqueo_procesos():
+            self.diario.compactar(self._escribir_snapshot)
+            self._indice_proyectos = None
+            self._cambios += 1
+            self._firma = self._firma_actual()
+    
+    def _firma_actual(self):
+        """Firma conjunta del snapshot y del diario de progreso"""
+        return (self.store.firma(), self.diario.firma())
+    
+    @_con_bloqueo
+    def version(self):
+        """
+        Versión de los proyectos y bonos en memoria: cambia con cada modificación
+        (propia o de otro proceso). Sirve para calcular ETags sin serializar nada.
+        """
+        return (self._instancia, self._cambios)
+    
+    def _recargar_si_cambio(self):
+        """Recargar los proyectos si el archivo o el diario se modificaron fuera de este gestor"""
+        if self._firma_actual() != self._firma:
+            self.cargar_proyectos()
+    
+    def _evento_progreso_bono(self, nombre_bono, terminal, carro):
+        """
+        Estado resultante de un escaneo (solo lo que cambia: el terminal, el carro y
+        el estado del bono). Es a la vez la entrada del diario y el delta que se
+        envía a los paneles conectados por SSE.
+        """
+        bono = self.proyectos['bonos'][nombre_bono]
+        return {
+            'tipo': 'progreso_bono',
+            'bono': nombre_bono,
+            'terminal': terminal,
+            'progreso': bono['progreso'][terminal],
+            'carro': str(carro),
+            'progreso_carro': bono['progreso_por_carro'][str(carro)],
+            'estado': bono.get('estado'),
+            'fecha_finalizacion': bono.get('fecha_finalizacion')
+        }
+    
+    def _anotar_progreso_bono(self, evento):
+        """
+        Registrar un evento de progreso en el diario en lugar de reescribir todo el archivo.
+        Cada PROYECTOS_JOURNAL_COMPACTAR eventos se compacta en el snapshot.
+        """
+        self.diario.anotar(evento)
+        self._firma = self._firma_actual()
+        self._cambios += 1
+        
+        if self.diario.num_eventos() >= Config.PROYECTOS_JOURNAL_COMPACTAR:
+            self.guardar_proyectos()
+    
+    def _aplicar_evento_progreso(self, evento):
+        """Reaplicar un evento del diario sobre los proyectos cargados del snapshot"""
+        aplicar_evento_progreso(self.proyectos, evento)
     
+    @_con_bloqueo
     def agregar_proyecto(self, nombre, archivo_excel, carro=None):
         """Agregar nuevo proyecto"""
         proyecto = {
@@ -51,6 +172,7 @@ class ProyectoManager:
         self.guardar_proyectos()
         return proyecto
     
+    @_con_bloqueo
     def asignar_carro(self, proyecto_id, carro):
         """Asignar proyecto a un carro"""
         carro_str = str(carro)
@@ -65,6 +187,7 @@ class ProyectoManager:
         self.proyectos['carros'][carro_str] = proyecto_id
         self.guardar_proyectos()
     
+    @_con_bloqueo
     def liberar_carro(self, carro):
         """Liberar un carro"""
         carro_str = str(carro)
@@ -80,6 +203,7 @@ class ProyectoManager:
         self.proyectos['carros'][carro_str] = None
         self.guardar_proyectos()
     
+    @_con_bloqueo
     def eliminar_proyecto(self, proyecto_id):
         """Eliminar un proyecto"""
         # Liberar carro si está asignado
@@ -100,11 +224,13 @@ class ProyectoManager:
         return self.proyectos['proyectos']
     
     def obtener_proyecto(self, proyecto_id):
-        """Obtener un proyecto específico"""
-        for p in self.proyectos['proyectos']:
-            if p['id'] == proyecto_id:
-                return p
-        return None
+        """Obtener un proyecto específico (índice por id, se rehace al cargar o guardar)"""
+        indice = self._indice_proyectos
+        proyecto = indice.get(proyecto_id) if indice is not None else None
+        if proyecto is None or proyecto.get('id') != proyecto_id:
+            self._indice_proyectos = {p['id']: p for p in self.proyectos['proyectos']}
+            proyecto = self._indice_proyectos.get(proyecto_id)
+        return proyecto
     
     def obtener_carros(self):
         """Obtener estado de todos los carros"""
@@ -131,6 +257,7 @@ class ProyectoManager:
         
         return carros_info
     
+    @_con_bloqueo
     def actualizar_progreso(self, proyecto_id, terminal_completado):
         """Actualizar progreso de un proyecto"""
         for p in self.proyectos['proyectos']:
@@ -166,6 +293,7 @@ class ProyectoManager:
         
         return f"{fecha}_{contador}"
     
+    @_con_bloqueo
     def generar_bono(self, nombre_bono):
         """Generar bono con todos los carros ocupados"""
         from datetime import datetime
@@ -214,7 +342,8 @@ class ProyectoManager:
             'ordenes': ordenes_ids,
             'fecha_generacion': datetime.now().isoformat(),
             'estado': 'activo',
-            'num_cortes': len(carros_ocupados)
+            'num_cortes': len(carros_ocupados),
+            'universo_terminales': self._calcular_universo_terminales(carros_ocupados)
         }
         
         self.guardar_proyectos()
@@ -223,44 +352,112 @@ class ProyectoManager:
         if Config.PRINT_ON_BONO_GENERATION:
             self._imprimir_etiquetas_bono(nombre_bono, carros_ocupados)
         
-        return self.proyectos['bonos'][nombre_bono], None
+        return self._vista_bono(self.proyectos['bonos'][nombre_bono]), None
+    
+    def _calcular_universo_terminales(self, carros):
+        """
+        Precalcular los terminales de cada carro del bono (desde el catálogo de terminales)
+        Devuelve:
+        {
+            'por_carro': {carro: [terminales del Excel del carro]},
+            'carros_por_terminal': {terminal: [carros que lo tienen]}
+        }
+        """
+        archivos = [c.get('archivo_excel') for c in carros if c.get('archivo_excel')]
+        terminales_por_archivo, archivos_con_error = catalogo_terminales.escanear(
+            Config.UPLOAD_FOLDER, archivos, Config.DEFAULT_SHEET
+        )
+        if archivos_con_error:
+            print(f"Error obteniendo terminales de los carros: {archivos_con_error}")
+        
+        por_carro = {}
+        carros_por_terminal = {}
+        for carro_info in carros:
+            carro = carro_info['carro']
+            terminales = list(terminales_por_archivo.get(carro_info.get('archivo_excel'), []))
+            
+            por_carro[str(carro)] = terminales
+            for terminal in terminales:
+                carros_por_terminal.setdefault(terminal, []).append(carro)
+        
+        return {
+            'por_carro': por_carro,
+            'carros_por_terminal': carros_por_terminal
+        }
+    
+    def _obtener_universo_terminales(self, bono):
+        """Universo de terminales del bono (se calcula y guarda si el bono es anterior a esta estructura)"""
+        if 'universo_terminales' not in bono:
+            bono['universo_terminales'] = self._calcular_universo_terminales(bono.get('carros', []))
+            self._cambios += 1
+        return bono['universo_terminales']
     
     def _actualizar_estado_ordenes(self, numeros_ordenes, nuevo_estado, nombre_bono=None):
         """Actualizar estado de múltiples órdenes"""
         from config import Config
         
-        ordenes_file = os.path.join(Config.DATA_FOLDER, 'ordenes_produccion.json')
+        ordenes_store = obtener_almacen('ORDENES_FILE')
         
-        if not os.path.exists(ordenes_file):
+        if not ordenes_store.existe():
             return
         
-        with open(ordenes_file, 'r', encoding='utf-8') as f:
-            ordenes_data = json.load(f)
-        
-        for orden in ordenes_data.get('ordenes', []):
-            if orden.get('numero') in numeros_ordenes:
-                orden['estado'] = nuevo_estado
-                if nombre_bono:
-                    orden['bono'] = nombre_bono
-                if nuevo_estado == 'en_bono':
-                    orden['fecha_inicio_bono'] = datetime.now().isoformat()
-                elif nuevo_estado == 'engastando':
-                    orden['fecha_inicio_engaste'] = datetime.now().isoformat()
-                elif nuevo_estado == 'finalizado':
-                    orden['fecha_finalizacion'] = datetime.now().isoformat()
-        
-        with open(ordenes_file, 'w', encoding='utf-8') as f:
-            json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
+        with ordenes_store.transaccion() as ordenes_data:
+            for orden in ordenes_data.get('ordenes', []):
+                if orden.get('numero') in numeros_ordenes:
+                    orden['estado'] = nuevo_estado
+                    if nombre_bono:
+                        orden['bono'] = nombre_bono
+                    if nuevo_estado == 'en_bono':
+                        orden['fecha_inicio_bono'] = datetime.now().isoformat()
+                    elif nuevo_estado == 'engastando':
+                        orden['fecha_inicio_engaste'] = datetime.now().isoformat()
+                    elif nuevo_estado == 'finalizado':
+                        orden['fecha_finalizacion'] = datetime.now().isoformat()
+    
+    @staticmethod
+    def _vista_bono(bono):
+        """
+        Bono tal como se expone a las rutas: sin el universo de terminales, que es
+        interno (puede ocupar cientos de KB y /api/bonos se consulta cada pocos segundos)
+        """
+        if bono is None:
+            return None
+        return {k: v for k, v in bono.items() if k != 'universo_terminales'}
     
     def obtener_bono(self, nombre_bono):
         """Obtener información de un bono"""
         bonos = self.proyectos.get('bonos', {})
-        return bonos.get(nombre_bono)
+        return self._vista_bono(bonos.get(nombre_bono))
+    
+    @_con_bloqueo
+    def obtener_estado_bono(self, nombre_bono):
+        """
+        Estado completo de un bono para el panel de progreso (copia independiente):
+        el bono, los terminales de sus carros y el total de terminales de cada carro
+        """
+        bono = self.proyectos.get('bonos', {}).get(nombre_bono)
+        if not bono:
+            return None
+        
+        universo = self._obtener_universo_terminales(bono)
+        totales_por_carro = {}
+        for carro_info in bono.get('carros', []):
+            carro = str(carro_info['carro'])
+            totales_por_carro[carro] = {
+                'total': len(universo['por_carro'].get(carro, [])),
+                'archivo': carro_info.get('archivo_excel')
+            }
+        
+        return copy.deepcopy({
+            'bono': self._vista_bono(bono),
+            'terminales': sorted(universo['carros_por_terminal']),
+            'totales_por_carro': totales_por_carro
+        })
     
     def obtener_todos_bonos(self):
         """Obtener lista de todos los bonos"""
         bonos = self.proyectos.get('bonos', {})
-        return list(bonos.values())
+        return [self._vista_bono(bono) for bono in bonos.values()]
     
     def validar_bono(self, nombre_bono):
         """Validar que un bono existe y está activo"""
@@ -273,6 +470,7 @@ class ProyectoManager:
         
         return True, bono
     
+    @_con_bloqueo
     def actualizar_progreso_bono(self, nombre_bono, terminal, carro, terminales_proyecto=None):
         """
         Actualizar progreso de un terminal en un carro del bono
@@ -356,80 +554,28 @@ class ProyectoManager:
             # Buscar si alguna orden está aún en estado "en_bono"
             self._actualizar_estado_ordenes_si_necesario(ordenes_bono, 'en_bono', 'engastando')
         
+        # Universo de terminales precalculado al generar el bono (sin releer los Excel)
+        universo_nuevo = 'universo_terminales' not in bono
+        universo = self._obtener_universo_terminales(bono)
+        carros_por_terminal = universo['carros_por_terminal']
+        
         # Verificar si el terminal está completo
         # Un terminal está completo cuando procesó TODOS los carros que LO TIENEN
-        carros_con_terminal = []
-        for carro_info in bono.get('carros', []):
-            archivo = carro_info.get('archivo_excel')
-            if not archivo:
-                continue
-            
-            # Verificar si este carro tiene el terminal
-            try:
-                temp_manager = ExcelManager(Config.UPLOAD_FOLDER, Config.CODIGOS_FILE)
-                if temp_manager.cargar_excel_directo(archivo):
-                    # Buscar si el terminal existe en este archivo
-                    registros = temp_manager.current_df.to_dict('records')
-                    terminal_en_carro = False
-                    for row in registros:
-                        de_term = str(row.get('De Terminal', '')).strip().upper()
-                        para_term = str(row.get('Para Terminal', '')).strip().upper()
-                        
-                        if de_term == terminal.upper() or para_term == terminal.upper():
-                            terminal_en_carro = True
-                            break
-                    
-                    if terminal_en_carro:
-                        carros_con_terminal.append(carro_info['carro'])
-            except Exception as e:
-                print(f"Error verificando terminal en carro: {e}")
+        carros_con_terminal = set(carros_por_terminal.get(str(terminal).strip().upper(), []))
         
         # Marcar como completado si procesó todos los carros que lo tienen
-        carros_completados_terminal = bono['progreso'][terminal]['carros_completados']
-        if len(carros_con_terminal) > 0 and all(c in carros_completados_terminal for c in carros_con_terminal):
+        carros_completados_terminal = set(bono['progreso'][terminal]['carros_completados'])
+        if carros_con_terminal and carros_con_terminal <= carros_completados_terminal:
             bono['progreso'][terminal]['estado'] = 'completado'
         
-        # Verificar si el bono está completamente terminado
-        # Para esto necesitamos obtener TODOS los terminales del bono desde los archivos Excel
-        try:
-            terminales_totales = set()
-            for carro in bono.get('carros', []):
-                archivo = carro.get('archivo_excel')
-                if not archivo:
-                    continue
-                
-                # Cargar Excel y extraer terminales
-                manager = ExcelManager(Config.UPLOAD_FOLDER, Config.CODIGOS_FILE)
-                if manager.cargar_excel(archivo):
-                    registros = manager.current_df.to_dict('records')
-                    for row in registros:
-                        de_terminal = str(row.get('De Terminal', '')).strip().upper()
-                        para_terminal = str(row.get('Para Terminal', '')).strip().upper()
-                        
-                        if de_terminal and de_terminal != 'S/T':
-                            terminales_totales.add(de_terminal)
-                        if para_terminal and para_terminal != 'S/T':
-                            terminales_totales.add(para_terminal)
-            
-            # Verificar si TODOS los terminales del bono están en progreso Y completados
-            todos_terminales_completados = False
-            if terminales_totales and bono.get('progreso'):
-                # Verificar que todos los terminales del Excel estén completados
-                terminales_en_progreso = set(bono['progreso'].keys())
-                
-                # Solo está completado si:
-                # 1. Todos los terminales del Excel están en progreso
-                # 2. Todos tienen estado 'completado'
-                if terminales_en_progreso >= terminales_totales:
-                    todos_completados = True
-                    for term in terminales_totales:
-                        if term not in bono['progreso'] or bono['progreso'][term].get('estado') != 'completado':
-                            todos_completados = False
-                            break
-                    todos_terminales_completados = todos_completados
-        except Exception as e:
-            print(f"Error al verificar terminales totales del bono: {e}")
-            todos_terminales_completados = False
+        # Verificar si el bono está completamente terminado:
+        # TODOS los terminales del bono deben estar en progreso y con estado 'completado'
+        terminales_totales = set(carros_por_terminal)
+        terminales_completados = {
+            term for term, info in bono['progreso'].items()
+            if info.get('estado') == 'completado'
+        }
+        todos_terminales_completados = bool(terminales_totales) and terminales_totales <= terminales_completados
         
         # Si todos los terminales están completados, actualizar estado del bono a completado
         if todos_terminales_completados:
@@ -440,7 +586,15 @@ class ProyectoManager:
         if todos_terminales_completados and ordenes_bono:
             self._actualizar_estado_ordenes(ordenes_bono, 'finalizado')
         
-        self.guardar_proyectos()
+        evento = self._evento_progreso_bono(nombre_bono, terminal, carro)
+        if universo_nuevo:
+            # Bono anterior al universo precalculado: guardarlo una vez en el snapshot
+            self.guardar_proyectos()
+        else:
+            self._anotar_progreso_bono(evento)
+        
+        # Notificar a los paneles de progreso conectados (stream SSE)
+        bus_eventos.publicar(nombre_bono, 'progreso', evento)
         
         # IMPRIMIR ETIQUETA DE FINALIZACIÓN si el carro se acaba de completar
         if carro_recien_completado and Config.PRINT_ON_CARRO_COMPLETION:
@@ -462,25 +616,18 @@ class ProyectoManager:
         """Actualizar estado solo si las órdenes están en el estado_actual"""
         from config import Config
         
-        ordenes_file = os.path.join(Config.DATA_FOLDER, 'ordenes_produccion.json')
+        ordenes_store = obtener_almacen('ORDENES_FILE')
         
-        if not os.path.exists(ordenes_file):
+        if not ordenes_store.existe():
             return
         
-        with open(ordenes_file, 'r', encoding='utf-8') as f:
-            ordenes_data = json.load(f)
-        
-        cambios = False
-        for orden in ordenes_data.get('ordenes', []):
-            if orden.get('numero') in numeros_ordenes and orden.get('estado') == estado_actual:
-                orden['estado'] = nuevo_estado
-                if nuevo_estado == 'engastando':
-                    orden['fecha_inicio_engaste'] = datetime.now().isoformat()
-                cambios = True
-        
-        if cambios:
-            with open(ordenes_file, 'w', encoding='utf-8') as f:
-                json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
+        # La transacción solo reescribe el archivo si alguna orden cambió
+        with ordenes_store.transaccion() as ordenes_data:
+            for orden in ordenes_data.get('ordenes', []):
+                if orden.get('numero') in numeros_ordenes and orden.get('estado') == estado_actual:
+                    orden['estado'] = nuevo_estado
+                    if nuevo_estado == 'engastando':
+                        orden['fecha_inicio_engaste'] = datetime.now().isoformat()
     
     def obtener_progreso_bono(self, nombre_bono):
         """Obtener progreso completo de un bono"""
@@ -528,6 +675,7 @@ class ProyectoManager:
         
         return progreso_por_carro
     
+    @_con_bloqueo
     def eliminar_bono(self, nombre_bono):
         """Eliminar un bono"""
         if 'bonos' not in self.proyectos:
@@ -536,10 +684,12 @@ class ProyectoManager:
         if nombre_bono in self.proyectos['bonos']:
             del self.proyectos['bonos'][nombre_bono]
             self.guardar_proyectos()
+            bus_eventos.publicar(nombre_bono, 'eliminado', {'bono': nombre_bono})
             return True
         
         return False
     
+    @_con_bloqueo
     def actualizar_bono(self, nombre_bono, nuevo_nombre, estado=None):
         """Actualizar información de un bono"""
         if 'bonos' not in self.proyectos:
@@ -560,8 +710,14 @@ class ProyectoManager:
             bono['estado'] = estado
         
         self.guardar_proyectos()
+        
+        if nuevo_nombre and nuevo_nombre != nombre_bono:
+            bus_eventos.publicar(nombre_bono, 'eliminado', {'bono': nombre_bono, 'nuevo_nombre': nuevo_nombre})
+        else:
+            bus_eventos.publicar(nombre_bono, 'resincronizar')
         return True
     
+    @_con_bloqueo
     def crear_proyecto_y_asignar_carro(self, nombre, archivo, numero_carro):
         """Crear un proyecto temporal y asignarlo directamente a un carro"""
         # Crear proyecto
@@ -589,16 +745,17 @@ class ProyectoManager:
         """
         Imprimir etiquetas para todos los carros del bono
         Se imprimen LABELS_PER_CARRO etiquetas por cada carro (config: 2)
+        Las etiquetas se generan aquí y se envían a la cola de impresión en segundo
+        plano, así que la generación del bono no espera a la impresora.
+        Retorna el trabajo de impresión (o None si no se pudo encolar)
         """
         try:
-            from app.printer_manager import PrinterManager
+            from app.cola_impresion import cola_impresion
             from app.zpl_templates import ZPLTemplates
             import logging
             
             logger = logging.getLogger(__name__)
-            printer = PrinterManager(Config)
-            
-            logger.info(f"Iniciando impresión de etiquetas para bono {nombre_bono}")
+            etiquetas = []
             
             for carro_info in carros_ocupados:
                 carro = carro_info['carro']
@@ -636,8 +793,7 @@ class ProyectoManager:
                     cantidad_terminales=cantidad_terminales
                 )
                 
-                resultado = printer.print_zpl(zpl_asignacion, metadata)
-                logger.info(f"Etiqueta asignación Carro {carro}: {resultado['message']}")
+                etiquetas.append((zpl_asignacion, metadata))
                 
                 # SEGUNDA ETIQUETA: Duplicado
                 if Config.LABELS_PER_CARRO >= 2:
@@ -650,28 +806,35 @@ class ProyectoManager:
                         codigo_corte=codigo_corte
                     )
                     
-                    resultado_dup = printer.print_zpl(zpl_duplicado, metadata_dup)
-                    logger.info(f"Etiqueta duplicado Carro {carro}: {resultado_dup['message']}")
+                    etiquetas.append((zpl_duplicado, metadata_dup))
             
-            logger.info(f"Finalizada impresión de etiquetas para bono {nombre_bono}")
+            trabajo, error = cola_impresion.encolar(
+                etiquetas, descripcion=f"Etiquetas del bono {nombre_bono}", bono=nombre_bono
+            )
+            if error:
+                logger.error(f"No se pudieron encolar las etiquetas del bono {nombre_bono}: {error}")
+            else:
+                logger.info(f"Etiquetas del bono {nombre_bono} en cola de impresión (trabajo {trabajo['id']})")
+            return trabajo
             
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error al imprimir etiquetas del bono: {e}")
+            return None
     
     def _imprimir_etiqueta_finalizacion(self, nombre_bono, carro, operario, 
                                        terminales_completados, terminales_totales, proyecto_nombre=None):
         """
         Imprimir etiqueta de finalización cuando un carro se completa
+        (en segundo plano, a través de la cola de impresión)
         """
         try:
-            from app.printer_manager import PrinterManager
+            from app.cola_impresion import cola_impresion
             from app.zpl_templates import ZPLTemplates
             import logging
             
             logger = logging.getLogger(__name__)
-            printer = PrinterManager(Config)
             
             metadata = {
                 'tipo': 'finalizacion',
@@ -690,14 +853,18 @@ class ProyectoManager:
                 proyecto=proyecto_nombre
             )
             
-            resultado = printer.print_zpl(zpl, metadata)
-            logger.info(f"Etiqueta finalización Carro {carro}: {resultado['message']}")
+            trabajo, error = cola_impresion.encolar(
+                [(zpl, metadata)], descripcion=f"Finalización carro {carro} del bono {nombre_bono}", bono=nombre_bono
+            )
+            if error:
+                logger.error(f"No se pudo encolar la etiqueta de finalización del carro {carro}: {error}")
             
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error al imprimir etiqueta de finalización: {e}")
     
+    @_con_bloqueo
     def resetear_progreso_bono(self, nombre_bono):
         """Resetear todo el progreso de un bono (progreso y progreso_por_carro)"""
         if 'bonos' not in self.proyectos:
@@ -713,6 +880,7 @@ class ProyectoManager:
         
         # Guardar cambios
         self.guardar_proyectos()
+        bus_eventos.publicar(nombre_bono, 'resincronizar')
         return True
 
 # Instancia global
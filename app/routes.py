@@ -1,16 +1,25 @@
 """
 Rutas y endpoints de la aplicación
 """
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, Response, stream_with_context
 from werkzeug.utils import secure_filename
+from markupsafe import escape
 import os
 import json
+import hashlib
 import logging
-from datetime import datetime
+import queue
 import time
+from datetime import datetime
+import threading
 import pandas as pd
 from app.excel_manager import ExcelManager
+from app.excel_cache import excel_cache
+from app.catalogo_terminales import catalogo_terminales
+from app.grupos_etiquetas import cache_grupos_etiquetas
+from app.almacenamiento import obtener_almacen
 from app.proyecto_manager import proyecto_manager
+from app.eventos_bonos import bus_eventos
 
 logger = logging.getLogger(__name__)
 
@@ -18,65 +27,70 @@ bp = Blueprint('main', __name__)
 
 # Variable global para el gestor de Excel
 excel_manager = None
-terminales_cache = {
-    'signature': None,
-    'timestamp': 0,
-    'terminales': None,
-    'archivos_con_error': None
-}
+_excel_manager_lock = threading.Lock()
 
 def get_excel_manager():
     """Obtener instancia del gestor de Excel"""
     global excel_manager
     if excel_manager is None:
-        excel_manager = ExcelManager(
-            upload_folder=current_app.config['UPLOAD_FOLDER'],
-            codigos_file=current_app.config['CODIGOS_FILE'],
-            default_sheet=current_app.config['DEFAULT_SHEET']
-        )
+        with _excel_manager_lock:
+            if excel_manager is None:
+                excel_manager = ExcelManager(
+                    upload_folder=current_app.config['UPLOAD_FOLDER'],
+                    codigos_file=current_app.config['CODIGOS_FILE'],
+                    default_sheet=current_app.config['DEFAULT_SHEET']
+                )
     return excel_manager
 
-def _build_terminales_signature(codigos_file, upload_folder, cortes):
-    codigos_mtime = os.path.getmtime(codigos_file) if os.path.exists(codigos_file) else None
-    archivos_info = []
-    for corte in cortes:
-        archivo = corte.get('archivo')
-        if not archivo:
-            continue
-        archivo_path = os.path.join(upload_folder, archivo)
-        try:
-            mtime = os.path.getmtime(archivo_path)
-        except OSError:
-            mtime = None
-        archivos_info.append((archivo, mtime))
-    return (codigos_mtime, tuple(sorted(archivos_info)))
-
-def _build_terminales_globales(upload_folder, codigos_file, default_sheet, cortes):
-    terminales_sistema = set()
-    archivos_con_error = []
-
-    for corte in cortes:
-        archivo = corte.get('archivo')
-        if not archivo:
-            continue
 
-        archivo_path = os.path.join(upload_folder, archivo)
-        if not os.path.exists(archivo_path):
-            archivos_con_error.append(archivo)
-            continue
+def get_dataset(archivo):
+    """
+    Obtener la hoja de trabajo de un archivo como DatasetExcel inmutable.
+    No modifica el archivo "actual" del gestor global, así que es seguro
+    usarlo desde varias peticiones a la vez. Retorna None si no se puede cargar.
+    """
+    return get_excel_manager().obtener_dataset(archivo)
 
-        try:
-            temp_manager = ExcelManager(
-                upload_folder=upload_folder,
-                codigos_file=codigos_file,
-                default_sheet=default_sheet
-            )
-            temp_manager.cargar_excel_directo(archivo)
-            terminales_sistema.update(temp_manager.listar_terminales_unicos())
-        except Exception as e:
-            archivos_con_error.append(f"{archivo} (error: {str(e)})")
+def get_store(clave_config, por_defecto=None):
+    """
+    Almacén compartido del archivo de datos configurado en `clave_config`:
+    JsonStore (lecturas cacheadas por mtime, escrituras atómicas y transacciones con
+    bloqueo) o, con STORAGE_BACKEND='sqlite', las tablas equivalentes
+    """
+    return obtener_almacen(clave_config, por_defecto, ruta=current_app.config[clave_config])
+
+def responder_con_etag(version, construir_respuesta):
+    """
+    Respuesta con ETag fuerte para endpoints de lectura muy consultados.
+    `version` identifica el estado de los datos (firma del almacén o contador de
+    versión) y se calcula ANTES de leerlos; si el cliente ya tiene esa versión
+    (If-None-Match) se responde 304 sin construir ni serializar el contenido.
+    """
+    etag = hashlib.sha1(repr((request.full_path, version)).encode('utf-8')).hexdigest()
+    
+    if request.if_none_match.contains(etag):
+        respuesta = current_app.response_class(status=304)
+    else:
+        respuesta = construir_respuesta()
+        if respuesta.status_code != 200:
+            return respuesta
+    
+    respuesta.set_etag(etag)
+    # Revalidar siempre: el navegador reutiliza su copia solo tras un 304
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
 
-    return terminales_sistema, archivos_con_error
+def get_terminales_catalogo(archivos):
+    """
+    Terminales de varios archivos Excel desde el catálogo persistente compartido
+    (solo se parsean los archivos nuevos o modificados)
+    Retorna (terminales, archivos procesados, archivos con error)
+    """
+    return catalogo_terminales.terminales(
+        current_app.config['UPLOAD_FOLDER'],
+        archivos,
+        current_app.config['DEFAULT_SHEET']
+    )
 
 def allowed_file(filename):
     """Verificar si el archivo tiene una extensión permitida"""
@@ -161,16 +175,15 @@ def etiquetas():
 def listar_codigos_cortes():
     """Obtener lista de todos los códigos de corte disponibles"""
     try:
-        codigos_file = current_app.config['CODIGOS_FILE']
+        codigos_store = get_store('CODIGOS_FILE')
         
-        if not os.path.exists(codigos_file):
+        if not codigos_store.existe():
             return jsonify({
                 'success': True,
                 'codigos': []
             })
         
-        with open(codigos_file, 'r', encoding='utf-8') as f:
-            codigos_data = json.load(f)
+        codigos_data = codigos_store.leer()
         
         cortes = codigos_data.get('cortes', [])
         
@@ -206,17 +219,16 @@ def validar_codigo_corte():
                 'message': 'Código de corte vacío'
             })
         
-        codigos_file = current_app.config['CODIGOS_FILE']
+        codigos_store = get_store('CODIGOS_FILE')
         
-        if not os.path.exists(codigos_file):
+        if not codigos_store.existe():
             return jsonify({
                 'success': False,
                 'tiene_excel': False,
                 'mensaje': 'No hay archivos Excel registrados'
             })
         
-        with open(codigos_file, 'r', encoding='utf-8') as f:
-            codigos_data = json.load(f)
+        codigos_data = codigos_store.leer()
         
         for corte in codigos_data.get('cortes', []):
             if corte.get('codigo_barras', '').upper() == codigo_corte:
@@ -269,16 +281,15 @@ def listar_terminales():
     manager = get_excel_manager()
     
     # Leer códigos de barras asociados
-    codigos_file = current_app.config['CODIGOS_FILE']
+    codigos_store = get_store('CODIGOS_FILE')
     
-    if not os.path.exists(codigos_file):
+    if not codigos_store.existe():
         return jsonify({
             'success': False,
             'message': 'No hay archivos Excel asociados a códigos de barras'
         }), 400
     
-    with open(codigos_file, 'r', encoding='utf-8') as f:
-        codigos_data = json.load(f)
+    codigos_data = codigos_store.leer()
     
     # Obtener la lista de cortes
     cortes = codigos_data.get('cortes', [])
@@ -290,37 +301,8 @@ def listar_terminales():
         }), 400
     
     # Recopilar terminales únicos de todos los archivos
-    todos_terminales = set()
-    archivos_procesados = []
-    archivos_con_error = []
-    
-    for corte in cortes:
-        archivo = corte.get('archivo')
-        if not archivo:
-            continue
-            
-        archivo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], archivo)
-        
-        if not os.path.exists(archivo_path):
-            archivos_con_error.append(archivo)
-            continue
-        
-        try:
-            # Cargar temporalmente este archivo
-            temp_manager = ExcelManager(
-                upload_folder=current_app.config['UPLOAD_FOLDER'],
-                codigos_file=current_app.config['CODIGOS_FILE'],
-                default_sheet=current_app.config['DEFAULT_SHEET']
-            )
-            temp_manager.cargar_excel_directo(archivo)
-            
-            # Obtener terminales de este archivo
-            terminales = temp_manager.listar_terminales_unicos()
-            todos_terminales.update(terminales)
-            archivos_procesados.append(archivo)
-            
-        except Exception as e:
-            archivos_con_error.append(f"{archivo} (error: {str(e)})")
+    archivos = [corte.get('archivo') for corte in cortes if corte.get('archivo')]
+    todos_terminales, archivos_procesados, archivos_con_error = get_terminales_catalogo(archivos)
     
     if not todos_terminales:
         return jsonify({
@@ -332,12 +314,7 @@ def listar_terminales():
     terminales_lista = sorted(list(todos_terminales))
     
     # Obtener terminales desactivados
-    desactivados_file = os.path.join(current_app.config['DATA_FOLDER'], 'terminales_desactivados.json')
-    desactivados = []
-    
-    if os.path.exists(desactivados_file):
-        with open(desactivados_file, 'r', encoding='utf-8') as f:
-            desactivados = json.load(f)
+    desactivados = get_store('TERMINALES_DESACTIVADOS_FILE', list).leer()
     
     # Marcar terminales desactivados
     terminales_con_estado = []
@@ -374,18 +351,15 @@ def buscar_terminal():
                 'message': 'No hay ningún archivo Excel cargado'
             }), 400
     
-    # Buscar terminal
-    resultados = manager.buscar_terminal(terminal)
+    # Buscar terminal: grupos por cable y elemento ya compilados al cargar el archivo
+    total_resultados, grupos = manager.grupos_terminal(terminal)
     
-    if not resultados:
+    if not total_resultados:
         return jsonify({
             'success': False,
             'message': f'Terminal "{terminal}" no encontrado'
         }), 404
     
-    # Agrupar resultados
-    grupos = manager.agrupar_por_cable_elemento(resultados, terminal)
-    
     # Calcular total de terminales necesarios
     total_terminales = sum(grupo['num_terminales'] for grupo in grupos.values())
     
@@ -393,7 +367,7 @@ def buscar_terminal():
         'success': True,
         'terminal': terminal,
         'archivo': manager.current_file,
-        'total_resultados': len(resultados),
+        'total_resultados': total_resultados,
         'total_grupos': len(grupos),
         'total_terminales': total_terminales,
         'grupos': list(grupos.values())
@@ -417,6 +391,9 @@ def upload_file():
         # Guardar archivo
         file.save(filepath)
         
+        # Convertir la hoja de trabajo a sidecar binario (lecturas posteriores sin openpyxl)
+        get_excel_manager().preparar_sidecar(filename)
+        
         return jsonify({
             'success': True,
             'message': 'Archivo subido correctamente',
@@ -455,6 +432,9 @@ def add_corte():
     manager = get_excel_manager()
     
     if manager.add_corte(codigo_barras, archivo, descripcion, proyecto):
+        # Asegurar sidecar binario actualizado para este archivo
+        manager.preparar_sidecar(archivo)
+        
         # Generar automáticamente los grupos de etiquetas para V3 y sección Etiquetas
         generar_grupos_etiquetas_json(archivo)
         
@@ -545,6 +525,23 @@ def reset_system():
             'message': 'Error al resetear el sistema'
         }), 500
 
+@bp.route('/api/admin/cache_excel', methods=['GET'])
+def estadisticas_cache_excel():
+    """Estadísticas de la caché de Excel parseados (hits, misses, memoria usada)"""
+    return jsonify({
+        'success': True,
+        **excel_cache.estadisticas()
+    })
+
+@bp.route('/api/admin/cache_excel', methods=['DELETE'])
+def limpiar_cache_excel():
+    """Vaciar la caché de Excel parseados"""
+    excel_cache.invalidar()
+    return jsonify({
+        'success': True,
+        'message': 'Caché de Excel vaciada'
+    })
+
 @bp.route('/api/list_files', methods=['GET'])
 def list_files():
     """Listar archivos Excel en la carpeta de uploads"""
@@ -580,13 +577,7 @@ def list_files():
 @bp.route('/api/terminales_desactivados', methods=['GET'])
 def get_terminales_desactivados():
     """Obtener lista de terminales desactivados"""
-    desactivados_file = os.path.join(current_app.config['DATA_FOLDER'], 'terminales_desactivados.json')
-    
-    if os.path.exists(desactivados_file):
-        with open(desactivados_file, 'r', encoding='utf-8') as f:
-            desactivados = json.load(f)
-    else:
-        desactivados = []
+    desactivados = get_store('TERMINALES_DESACTIVADOS_FILE', list).leer()
     
     return jsonify({
         'success': True,
@@ -606,32 +597,21 @@ def toggle_terminal_desactivado():
             'message': 'Terminal no especificado'
         }), 400
     
-    desactivados_file = os.path.join(current_app.config['DATA_FOLDER'], 'terminales_desactivados.json')
-    
-    # Leer lista actual
-    if os.path.exists(desactivados_file):
-        with open(desactivados_file, 'r', encoding='utf-8') as f:
-            desactivados = json.load(f)
-    else:
-        desactivados = []
-    
-    # Modificar lista
-    if accion == 'desactivar':
-        if terminal not in desactivados:
-            desactivados.append(terminal)
-            mensaje = f'Terminal {terminal} desactivado'
-        else:
-            mensaje = f'Terminal {terminal} ya estaba desactivado'
-    else:  # activar
-        if terminal in desactivados:
-            desactivados.remove(terminal)
-            mensaje = f'Terminal {terminal} activado'
-        else:
-            mensaje = f'Terminal {terminal} ya estaba activado'
-    
-    # Guardar lista actualizada
-    with open(desactivados_file, 'w', encoding='utf-8') as f:
-        json.dump(desactivados, f, indent=2)
+    # Leer, modificar y guardar la lista en una sola transacción
+    with get_store('TERMINALES_DESACTIVADOS_FILE', list).transaccion() as desactivados:
+        # Modificar lista
+        if accion == 'desactivar':
+            if terminal not in desactivados:
+                desactivados.append(terminal)
+                mensaje = f'Terminal {terminal} desactivado'
+            else:
+                mensaje = f'Terminal {terminal} ya estaba desactivado'
+        else:  # activar
+            if terminal in desactivados:
+                desactivados.remove(terminal)
+                mensaje = f'Terminal {terminal} activado'
+            else:
+                mensaje = f'Terminal {terminal} ya estaba activado'
     
     return jsonify({
         'success': True,
@@ -643,6 +623,84 @@ def toggle_terminal_desactivado():
 # API ROUTES PARA ETIQUETAS
 # ================================
 
+def calcular_grupos_etiquetas(archivo):
+    """
+    Calcular los grupos (cod.cable + elemento) con sección de un archivo Excel,
+    ordenados y con numeración secuencial propia del archivo (desde 1)
+    Retorna None si no se pudo cargar el archivo
+    """
+    dataset = get_dataset(archivo)
+    
+    if dataset is None:
+        return None
+    
+    # Grupos cod.cable + elemento, compilados al cargar el archivo
+    grupos_dict = dataset.modelo.grupos_etiquetas
+    
+    # Convertir a lista
+    grupos_lista = []
+    for clave, grupo in grupos_dict.items():
+        grupos_lista.append({
+            'cod_cable': grupo['cod_cable'],
+            'elemento': grupo['elemento'],
+            'descripcion': grupo['descripcion'],
+            'seccion': grupo['seccion'],
+            'longitud': grupo['longitud'],
+            'de_terminal': grupo['de_terminal'],
+            'num_cables': grupo['num_cables'],
+            'num_terminales': grupo['num_terminales']
+        })
+    
+    # Ordenar por cod_cable y elemento
+    grupos_lista.sort(key=lambda x: (x['cod_cable'], x['elemento']))
+    
+    # Filtrar solo grupos con sección
+    grupos_con_seccion = [g for g in grupos_lista if g.get('seccion') and str(g.get('seccion')).strip()]
+    
+    # Añadir numeración secuencial solo a grupos con sección
+    for i, grupo in enumerate(grupos_con_seccion, start=1):
+        grupo['numero_etiqueta'] = i
+    
+    return grupos_con_seccion
+
+def grupos_etiquetas_archivo(archivo):
+    """
+    Grupos de etiquetas de un archivo desde la caché por libro (se calculan solo si
+    el Excel es nuevo o cambió). La lista es compartida: no modificarla.
+    Retorna (grupos o None, desde_cache)
+    """
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], archivo)
+    return cache_grupos_etiquetas.obtener(
+        filepath,
+        current_app.config['DEFAULT_SHEET'],
+        lambda: calcular_grupos_etiquetas(archivo)
+    )
+
+def codigo_corte_archivo(archivo):
+    """Código de barras del corte registrado para un archivo ('' si no hay)"""
+    try:
+        codigos_data = get_store('CODIGOS_FILE').leer()
+        for corte in codigos_data.get('cortes', []):
+            if corte.get('archivo', '').upper() == archivo.upper():
+                return corte.get('codigo_barras', '')
+    except Exception as e:
+        logger.warning(f"No se pudo obtener código de corte para {archivo}: {e}")
+    return ""
+
+def obtener_grupos_etiquetas_archivo(archivo):
+    """
+    Grupos con sección (numerados) y código de corte de un archivo Excel
+    
+    Returns:
+        (grupos, codigo_corte, fuente) o None si no se pudo cargar el archivo
+    """
+    grupos, desde_cache = grupos_etiquetas_archivo(archivo)
+    
+    if grupos is None:
+        return None
+    
+    return grupos, codigo_corte_archivo(archivo), 'cache' if desde_cache else 'generado'
+
 @bp.route('/api/etiquetas/cargar_grupos', methods=['POST'])
 def cargar_grupos_etiquetas():
     """Cargar grupos (cod.cable + elemento) de un archivo Excel para generar etiquetas"""
@@ -656,94 +714,23 @@ def cargar_grupos_etiquetas():
                 'message': 'Archivo no especificado'
             }), 400
         
-        # Primero intentar cargar desde el JSON generado automáticamente
-        json_path = os.path.join(current_app.config['DATA_FOLDER'], 'grupos_etiquetas.json')
+        resultado = obtener_grupos_etiquetas_archivo(archivo)
         
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data_json = json.load(f)
-                    
-                # Verificar si es el archivo correcto
-                if data_json.get('archivo') == archivo:
-                    return jsonify({
-                        'success': True,
-                        'grupos': data_json.get('grupos', []),
-                        'archivo': archivo,
-                        'codigo_corte': data_json.get('codigo_corte', ''),
-                        'total': data_json.get('total_grupos', 0),
-                        'fuente': 'cache'
-                    })
-            except Exception as e:
-                logger.warning(f"Error al leer grupos_etiquetas.json: {str(e)}")
-        
-        # Si no existe el JSON o es otro archivo, generar en tiempo real
-        manager = get_excel_manager()
-        
-        # Cargar el archivo Excel
-        if not manager.cargar_excel(archivo):
+        if resultado is None:
             return jsonify({
                 'success': False,
                 'message': f'Error al cargar archivo: {archivo}'
             }), 500
         
-        # Obtener TODOS los datos del Excel
-        if manager.current_df is None:
-            return jsonify({
-                'success': False,
-                'message': 'No hay datos en el archivo'
-            }), 500
-        
-        # Convertir DataFrame a lista de diccionarios
-        todos_registros = manager.current_df.to_dict('records')
-        
-        # Agrupar por cod.cable + elemento
-        grupos_dict = agrupar_por_cod_cable_elemento(todos_registros)
-        
-        # Convertir a lista
-        grupos_lista = []
-        for clave, grupo in grupos_dict.items():
-            grupos_lista.append({
-                'cod_cable': grupo['cod_cable'],
-                'elemento': grupo['elemento'],
-                'descripcion': grupo['descripcion'],
-                'seccion': grupo['seccion'],
-                'longitud': grupo['longitud'],
-                'num_cables': grupo['num_cables'],
-                'num_terminales': grupo['num_terminales'],
-                'de_terminal': grupo['de_terminal']
-            })
-        
-        # Ordenar por cod_cable y elemento
-        grupos_lista.sort(key=lambda x: (x['cod_cable'], x['elemento']))
-        
-        # Filtrar solo grupos con sección
-        grupos_con_seccion = [g for g in grupos_lista if g.get('seccion') and str(g.get('seccion')).strip()]
-        
-        # Añadir numeración secuencial solo a grupos con sección
-        for i, grupo in enumerate(grupos_con_seccion, start=1):
-            grupo['numero_etiqueta'] = i
-        
-        # Obtener el código del corte desde codigos_cortes.json
-        codigo_corte = ""
-        try:
-            codigos_path = os.path.join(current_app.config['DATA_FOLDER'], 'codigos_cortes.json')
-            with open(codigos_path, 'r', encoding='utf-8') as f:
-                codigos_data = json.load(f)
-                for corte in codigos_data.get('cortes', []):
-                    if corte.get('archivo', '').upper() == archivo.upper():
-                        codigo_corte = corte.get('codigo_barras', '')
-                        break
-        except Exception as e:
-            logger.warning(f"No se pudo obtener código de corte para {archivo}: {e}")
+        grupos, codigo_corte, fuente = resultado
         
         return jsonify({
             'success': True,
-            'grupos': grupos_con_seccion,
+            'grupos': grupos,
             'archivo': archivo,
             'codigo_corte': codigo_corte,
-            'total': len(grupos_con_seccion),
-            'fuente': 'generado'
+            'total': len(grupos),
+            'fuente': fuente
         })
         
     except Exception as e:
@@ -753,9 +740,44 @@ def cargar_grupos_etiquetas():
             'message': f'Error al cargar grupos: {str(e)}'
         }), 500
 
+def buscar_grupo_por_numero(archivo, numero_etiqueta):
+    """Grupo de un archivo con ese número de etiqueta (índice en memoria, O(1)), o None"""
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], archivo)
+    return cache_grupos_etiquetas.buscar_numero(
+        filepath,
+        current_app.config['DEFAULT_SHEET'],
+        numero_etiqueta,
+        lambda: calcular_grupos_etiquetas(archivo)
+    )
+
+# Último archivo con grupos generados (grupos_etiquetas.json), recordado por firma
+# para no releer el JSON completo en cada escaneo
+_ultimo_archivo_grupos = (None, None)
+
+def archivo_ultimos_grupos():
+    """Archivo del último corte registrado (el de grupos_etiquetas.json), o None"""
+    global _ultimo_archivo_grupos
+    grupos_store = get_store('GRUPOS_ETIQUETAS_FILE')
+    firma = grupos_store.firma()
+    if firma is None:
+        return None
+    
+    if _ultimo_archivo_grupos[0] != firma:
+        _ultimo_archivo_grupos = (firma, grupos_store.leer().get('archivo'))
+    return _ultimo_archivo_grupos[1]
+
 @bp.route('/api/etiquetas/buscar_por_numero', methods=['POST'])
 def buscar_etiqueta_por_numero():
-    """Buscar elemento por número de etiqueta para V3"""
+    """
+    Buscar elemento por número de etiqueta para V3
+    
+    Body:
+        numero_etiqueta: Número impreso en la etiqueta
+        archivo: Buscar en ese archivo (opcional)
+        bono: Buscar en todos los archivos del bono (opcional; la numeración es
+              propia de cada archivo, así que puede haber varias coincidencias)
+        Sin archivo ni bono se busca en el último corte registrado
+    """
     try:
         data = request.get_json()
         numero_etiqueta = data.get('numero_etiqueta')
@@ -775,36 +797,57 @@ def buscar_etiqueta_por_numero():
                 'message': 'Número de etiqueta debe ser un número entero'
             }), 400
         
-        # Leer archivo JSON de grupos de etiquetas
-        json_path = os.path.join(current_app.config['DATA_FOLDER'], 'grupos_etiquetas.json')
-        
-        if not os.path.exists(json_path):
-            return jsonify({
-                'success': False,
-                'message': 'No se encontraron etiquetas generadas. Por favor, genera etiquetas desde el Admin primero.'
-            }), 404
-        
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data_json = json.load(f)
-        
-        # Buscar el grupo con ese número
-        grupos = data_json.get('grupos', [])
-        grupo_encontrado = None
+        # Archivos donde buscar
+        nombre_bono = (data.get('bono') or '').strip()
+        archivo = (data.get('archivo') or '').strip()
         
-        for grupo in grupos:
-            if grupo.get('numero_etiqueta') == numero_etiqueta:
-                grupo_encontrado = grupo
-                break
+        if nombre_bono:
+            bono = proyecto_manager.obtener_bono(nombre_bono)
+            if not bono:
+                return jsonify({
+                    'success': False,
+                    'message': 'Bono no encontrado'
+                }), 404
+            archivos = list(dict.fromkeys(
+                c.get('archivo_excel') for c in bono.get('carros', []) if c.get('archivo_excel')
+            ))
+        elif archivo:
+            archivos = [archivo]
+        else:
+            archivo = archivo_ultimos_grupos()
+            if not archivo:
+                return jsonify({
+                    'success': False,
+                    'message': 'No se encontraron etiquetas generadas. Por favor, genera etiquetas desde el Admin primero.'
+                }), 404
+            archivos = [archivo]
+        
+        coincidencias = []
+        for archivo in archivos:
+            grupo = buscar_grupo_por_numero(archivo, numero_etiqueta)
+            if grupo is not None:
+                coincidencias.append({**grupo, 'archivo': archivo})
+        
+        # Último corte cuyo Excel ya no está en uploads: buscar en los grupos guardados
+        if not coincidencias and not nombre_bono and not data.get('archivo'):
+            if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], archivo)):
+                for grupo in get_store('GRUPOS_ETIQUETAS_FILE').leer().get('grupos', []):
+                    if grupo.get('numero_etiqueta') == numero_etiqueta:
+                        coincidencias.append({**grupo, 'archivo': archivo})
+                        break
         
-        if not grupo_encontrado:
+        if not coincidencias:
             return jsonify({
                 'success': False,
                 'message': f'No se encontró la etiqueta número {numero_etiqueta}'
             }), 404
         
+        grupo_encontrado = coincidencias[0]
+        
         return jsonify({
             'success': True,
             'grupo': grupo_encontrado,
+            'coincidencias': coincidencias,
             'mensaje': f'Etiqueta #{numero_etiqueta}: {grupo_encontrado["elemento"]} - Cable {grupo_encontrado["cod_cable"]}'
         })
         
@@ -819,24 +862,25 @@ def buscar_etiqueta_por_numero():
 def get_grupos_etiquetas_json():
     """Obtener el JSON de grupos de etiquetas para V3"""
     try:
-        json_path = os.path.join(current_app.config['DATA_FOLDER'], 'grupos_etiquetas.json')
+        grupos_store = get_store('GRUPOS_ETIQUETAS_FILE')
         
-        if not os.path.exists(json_path):
+        if not grupos_store.existe():
             return jsonify({
                 'success': False,
                 'message': 'Archivo de etiquetas no encontrado',
                 'grupos': []
             }), 404
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data_json = json.load(f)
+        def construir():
+            data_json = grupos_store.leer()
+            return jsonify({
+                'success': True,
+                'grupos': data_json.get('grupos', []),
+                'archivo': data_json.get('archivo', ''),
+                'total_grupos': data_json.get('total_grupos', 0)
+            })
         
-        return jsonify({
-            'success': True,
-            'grupos': data_json.get('grupos', []),
-            'archivo': data_json.get('archivo', ''),
-            'total_grupos': data_json.get('total_grupos', 0)
-        })
+        return responder_con_etag(grupos_store.firma(), construir)
         
     except Exception as e:
         logger.error(f"Error al obtener grupos de etiquetas: {str(e)}")
@@ -866,49 +910,15 @@ def get_grupos_etiquetas_bono(nombre_bono):
             if not archivo:
                 continue
             
-            # Cargar o generar las etiquetas de este archivo
-            manager = ExcelManager(
-                current_app.config['UPLOAD_FOLDER'],
-                current_app.config['CODIGOS_FILE']
-            )
+            # Grupos precalculados del archivo (numeración PROPIA de cada archivo, desde 1)
+            grupos, _ = grupos_etiquetas_archivo(archivo)
             
-            if not manager.cargar_excel(archivo):
+            if grupos is None:
                 logger.warning(f"No se pudo cargar archivo {archivo}")
                 continue
             
-            # Convertir DataFrame a registros
-            registros = manager.current_df.to_dict('records')
-            
-            # Agrupar por cod.cable + elemento
-            grupos_dict = agrupar_por_cod_cable_elemento(registros)
-            
-            # Convertir a lista
-            grupos_lista = []
-            for clave, grupo in grupos_dict.items():
-                grupos_lista.append({
-                    'cod_cable': grupo['cod_cable'],
-                    'elemento': grupo['elemento'],
-                    'descripcion': grupo['descripcion'],
-                    'seccion': grupo['seccion'],
-                    'longitud': grupo['longitud'],
-                    'de_terminal': grupo['de_terminal'],
-                    'num_cables': grupo['num_cables'],
-                    'num_terminales': grupo['num_terminales'],
-                    'archivo': archivo  # Agregar referencia al archivo
-                })
-            
-            # Ordenar por cod_cable y elemento
-            grupos_lista.sort(key=lambda x: (x['cod_cable'], x['elemento']))
-            
-            # Filtrar solo grupos con sección
-            grupos_con_seccion = [g for g in grupos_lista if g.get('seccion') and str(g.get('seccion')).strip()]
-            
-            # Añadir numeración secuencial PROPIA de este archivo (empezar desde 1)
-            for i, grupo in enumerate(grupos_con_seccion, start=1):
-                grupo['numero_etiqueta'] = i
-            
-            # Agregar a la lista total
-            todos_los_grupos.extend(grupos_con_seccion)
+            # Agregar referencia al archivo (copias: la lista de la caché es compartida)
+            todos_los_grupos.extend({**grupo, 'archivo': archivo} for grupo in grupos)
         
         return jsonify({
             'success': True,
@@ -925,9 +935,48 @@ def get_grupos_etiquetas_bono(nombre_bono):
             'grupos': []
         }), 500
 
+def _respuesta_html_etiquetas(grupos, archivo, codigo_corte):
+    """Documento de impresión como text/html en streaming (página a página)"""
+    return Response(
+        stream_with_context(generar_html_etiquetas_impresion_stream(grupos, archivo, codigo_corte)),
+        mimetype='text/html'
+    )
+
+@bp.route('/api/etiquetas/html/<archivo>', methods=['GET'])
+def etiquetas_html_archivo(archivo):
+    """
+    Documento HTML de etiquetas de un archivo, listo para abrir e imprimir
+    Se envía en streaming: el navegador empieza a pintar con la primera página
+    
+    Query params:
+        codigo_corte: Código de corte a mostrar (por defecto, el registrado para el archivo)
+    """
+    try:
+        # Solo nombres de archivo simples de la carpeta de cortes (sin rutas ni '..')
+        if secure_filename(archivo) != archivo:
+            return Response('Nombre de archivo no válido', status=400, mimetype='text/plain')
+        
+        resultado = obtener_grupos_etiquetas_archivo(archivo)
+        
+        if resultado is None:
+            return Response(f'Error al cargar archivo: {archivo}', status=404, mimetype='text/plain')
+        
+        grupos, codigo_corte, _ = resultado
+        codigo_corte = request.args.get('codigo_corte', codigo_corte).strip()
+        
+        return _respuesta_html_etiquetas(grupos, archivo, codigo_corte)
+        
+    except Exception as e:
+        logger.error(f"Error al generar HTML de etiquetas: {str(e)}")
+        return Response(f'Error al generar HTML: {str(e)}', status=500, mimetype='text/plain')
+
 @bp.route('/api/etiquetas/generar_html', methods=['POST'])
 def generar_etiquetas_html():
-    """Generar HTML de etiquetas para imprimir en impresora normal"""
+    """
+    Generar HTML de etiquetas para imprimir en impresora normal
+    Con ?formato=html (o 'formato': 'html' en el cuerpo) responde directamente
+    text/html en streaming en lugar del HTML dentro de un JSON
+    """
     try:
         data = request.get_json()
         archivo = data.get('archivo', '').strip()
@@ -940,6 +989,9 @@ def generar_etiquetas_html():
                 'message': 'Faltan datos requeridos (archivo, grupos)'
             }), 400
         
+        if request.args.get('formato', data.get('formato')) == 'html':
+            return _respuesta_html_etiquetas(grupos, archivo, codigo_corte)
+        
         # Generar HTML para imprimir
         html = generar_html_etiquetas_impresion(grupos, archivo, codigo_corte)
         
@@ -957,133 +1009,28 @@ def generar_etiquetas_html():
         }), 500
 
 
-def agrupar_por_cod_cable_elemento(registros):
-    """
-    Agrupar registros por Cod.cable + De Elemento
-    Similar a agrupar_por_cable_elemento pero sin filtrar por terminal
-    """
-    grupos = {}
-    
-    for row in registros:
-        cod_cable = row.get('Cod. cable', 'Sin código')
-        de_elemento = row.get('De Elemento', 'Sin elemento')
-        
-        # Saltar si son valores vacíos
-        if pd.isna(cod_cable) or pd.isna(de_elemento):
-            continue
-        
-        cod_cable = str(cod_cable).strip()
-        de_elemento = str(de_elemento).strip()
-        
-        if not cod_cable or not de_elemento:
-            continue
-        
-        clave = f"{cod_cable}|{de_elemento}"
-        
-        if clave not in grupos:
-            grupos[clave] = {
-                'cod_cable': cod_cable,
-                'elemento': de_elemento,
-                'descripcion': str(row.get('Descripción Cable', '')).strip() if not pd.isna(row.get('Descripción Cable')) else '',
-                'seccion': str(row.get('Sección', '')).strip() if not pd.isna(row.get('Sección')) else '',
-                'longitud': row.get('Longitud', '') if not pd.isna(row.get('Longitud')) else '',
-                'de_terminal': str(row.get('De Terminal', '')).strip() if not pd.isna(row.get('De Terminal')) else '',
-                'cables_lista': [],
-                'num_terminales': 0
-            }
-        
-        # Agregar cable
-        cable_marca = str(row.get('Cable / Marca', '')).strip()
-        grupos[clave]['cables_lista'].append(cable_marca)
-        
-        # Contar terminales
-        de_terminal = str(row.get('De Terminal', '')).strip().upper() if not pd.isna(row.get('De Terminal')) else ''
-        para_terminal = str(row.get('Para Terminal', '')).strip().upper() if not pd.isna(row.get('Para Terminal')) else ''
-        
-        if de_terminal and de_terminal != 'S/T':
-            grupos[clave]['num_terminales'] += 1
-        if para_terminal and para_terminal != 'S/T':
-            grupos[clave]['num_terminales'] += 1
-    
-    # Calcular num_cables
-    for grupo in grupos.values():
-        grupo['num_cables'] = len(grupo['cables_lista'])
-        del grupo['cables_lista']
-    
-    return grupos
-
-
 def generar_grupos_etiquetas_json(archivo):
     """
     Generar grupos de etiquetas y guardarlos en JSON para uso compartido entre Etiquetas y V3.
-    Se llama automáticamente al agregar un nuevo corte.
+    Se llama automáticamente al agregar un nuevo corte: deja los grupos del archivo en
+    la caché por libro y actualiza grupos_etiquetas.json (último corte registrado).
     """
     try:
-        manager = ExcelManager(
-            current_app.config['UPLOAD_FOLDER'],
-            current_app.config['CODIGOS_FILE']
-        )
-        
-        # Cargar el archivo Excel
-        if not manager.cargar_excel(archivo):
+        grupos_con_seccion, _ = grupos_etiquetas_archivo(archivo)
+        if grupos_con_seccion is None:
             logger.error(f"Error al cargar archivo {archivo} para generar grupos")
             return False
         
-        # Obtener el código del corte desde codigos_cortes.json
-        codigo_corte = ""
-        try:
-            codigos_path = os.path.join(current_app.config['DATA_FOLDER'], 'codigos_cortes.json')
-            with open(codigos_path, 'r', encoding='utf-8') as f:
-                codigos_data = json.load(f)
-                for corte in codigos_data.get('cortes', []):
-                    if corte.get('archivo', '').upper() == archivo.upper():
-                        codigo_corte = corte.get('codigo_barras', '')
-                        break
-        except Exception as e:
-            logger.warning(f"No se pudo obtener código de corte para {archivo}: {e}")
-        
-        # Convertir DataFrame a lista de diccionarios
-        todos_registros = manager.current_df.to_dict('records')
-        
-        # Obtener grupos usando la función existente
-        grupos_dict = agrupar_por_cod_cable_elemento(todos_registros)
-        
-        # Convertir a lista y ordenar
-        grupos_lista = []
-        for clave, grupo in grupos_dict.items():
-            grupos_lista.append({
-                'cod_cable': grupo['cod_cable'],
-                'elemento': grupo['elemento'],
-                'descripcion': grupo['descripcion'],
-                'seccion': grupo['seccion'],
-                'longitud': grupo['longitud'],
-                'de_terminal': grupo['de_terminal'],
-                'num_cables': grupo['num_cables'],
-                'num_terminales': grupo['num_terminales']
-            })
-        
-        # Ordenar por cod_cable y elemento
-        grupos_lista.sort(key=lambda x: (x['cod_cable'], x['elemento']))
-        
-        # Filtrar solo grupos con sección
-        grupos_con_seccion = [g for g in grupos_lista if g.get('seccion') and str(g.get('seccion')).strip()]
-        
-        # Añadir numeración secuencial solo a grupos con sección
-        for i, grupo in enumerate(grupos_con_seccion, start=1):
-            grupo['numero_etiqueta'] = i
-        
         # Guardar en archivo JSON compartido
-        json_path = os.path.join(current_app.config['DATA_FOLDER'], 'grupos_etiquetas.json')
         data_to_save = {
             'archivo': archivo,
-            'codigo_corte': codigo_corte,
+            'codigo_corte': codigo_corte_archivo(archivo),
             'fecha_generacion': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
             'total_grupos': len(grupos_con_seccion),
             'grupos': grupos_con_seccion
         }
         
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        get_store('GRUPOS_ETIQUETAS_FILE').escribir(data_to_save)
         
         logger.info(f"Grupos de etiquetas generados: {len(grupos_con_seccion)} grupos para {archivo}")
         return True
@@ -1093,17 +1040,97 @@ def generar_grupos_etiquetas_json(archivo):
         return False
 
 
+ETIQUETAS_POR_PAGINA = 65  # 13 columnas x 5 filas
+
+
+def generar_html_etiquetas_impresion_stream(grupos, archivo, codigo_corte=""):
+    """
+    Generar el HTML de impresión por partes: cabecera, una página de etiquetas
+    (13 columnas x 5 filas) en cada iteración y cierre del documento.
+    Permite enviarlo en streaming sin tener el documento completo en memoria.
+    """
+    # Filtrar grupos que tengan sección
+    grupos_con_seccion = [g for g in grupos if g.get('seccion') and str(g.get('seccion')).strip()]
+    
+    yield _html_etiquetas_cabecera(archivo, len(grupos_con_seccion))
+    
+    for inicio in range(0, len(grupos_con_seccion), ETIQUETAS_POR_PAGINA):
+        pagina = grupos_con_seccion[inicio:inicio + ETIQUETAS_POR_PAGINA]
+        partes = []
+        
+        # Salto de página antes de cada página salvo la primera
+        if inicio > 0:
+            partes.append("""
+    </div>
+    <div class="page-break"></div>
+    <div class="etiquetas-container">
+""")
+        
+        # Numeración secuencial solo para grupos con sección
+        for numero, grupo in enumerate(pagina, start=inicio + 1):
+            partes.append(_html_etiqueta(numero, grupo, codigo_corte))
+        
+        yield ''.join(partes)
+    
+    yield """
+    </div>
+</body>
+</html>
+"""
+
+
 def generar_html_etiquetas_impresion(grupos, archivo, codigo_corte=""):
     """
     Generar HTML con CSS para imprimir etiquetas en impresora normal
     Formato: 3 columnas de etiquetas por página
     """
-    html = f"""<!DOCTYPE html>
+    return ''.join(generar_html_etiquetas_impresion_stream(grupos, archivo, codigo_corte))
+
+
+def _html_etiqueta(numero, grupo, codigo_corte):
+    """HTML de una etiqueta (número, elemento, código de corte, cable y sección)"""
+    # Truncar textos para que quepan en etiquetas pequeñas y escaparlos (vienen del
+    # Excel o de la petición)
+    elemento = escape(str(grupo['elemento'])[:15])
+    cod_cable = escape(str(grupo['cod_cable'])[:12])
+    seccion = escape(str(grupo.get('seccion'))[:10]) if grupo.get('seccion') else ''
+    codigo_corte = escape(codigo_corte)
+    
+    partes = [f"""
+        <div class="etiqueta">
+            <div class="etiqueta-top">
+                <div class="etiqueta-numero">{numero}</div>
+                <div class="etiqueta-elemento">{elemento}</div>
+            </div>
+            <div class="etiqueta-bottom">"""]
+    
+    # Añadir código de corte si existe
+    if codigo_corte:
+        partes.append(f"""
+                <div class="etiqueta-info-line etiqueta-corte">{codigo_corte}</div>""")
+    
+    partes.append(f"""
+                <div class="etiqueta-info-line etiqueta-cable">{cod_cable}</div>""")
+    
+    if seccion:
+        partes.append(f"""
+                <div class="etiqueta-info-line etiqueta-seccion">{seccion}</div>""")
+    
+    partes.append("""
+            </div>
+        </div>
+""")
+    return ''.join(partes)
+
+
+def _html_etiquetas_cabecera(archivo, total):
+    """Cabecera del documento de impresión: estilos, botones y apertura de la primera página"""
+    return f"""<!DOCTYPE html>
 <html lang="es">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Etiquetas - {archivo}</title>
+    <title>Etiquetas - {escape(archivo)}</title>
     <style>
         @media print {{
             @page {{
@@ -1292,69 +1319,13 @@ def generar_html_etiquetas_impresion(grupos, archivo, codigo_corte=""):
     </div>
     
     <div class="header no-print">
-        <h2>Etiquetas de Grupos - {archivo}</h2>
+        <h2>Etiquetas de Grupos - {escape(archivo)}</h2>
+        <p style="margin-top: 10px; color: #666;">Total de etiquetas con sección: {total}</p>
     </div>
     
     <div class="etiquetas-container">
 """
-    
-    # Filtrar grupos que tengan sección
-    grupos_con_seccion = [g for g in grupos if g.get('seccion') and str(g.get('seccion')).strip()]
-    
-    # Añadir información del número de etiquetas filtradas al HTML
-    html = html.replace('<h2>Etiquetas de Grupos - {archivo}</h2>', 
-                       f'<h2>Etiquetas de Grupos - {{archivo}}</h2><p style="margin-top: 10px; color: #666;">Total de etiquetas con sección: {len(grupos_con_seccion)}</p>')
-    
-    # Generar etiquetas (hasta 65 por página: 13 columnas x 5 filas)
-    for i, grupo in enumerate(grupos_con_seccion):
-        numero = i + 1  # Numeración secuencial solo para grupos con sección
-        
-        # Truncar textos para que quepan en etiquetas pequeñas
-        elemento = grupo['elemento'][:15] if len(grupo['elemento']) > 15 else grupo['elemento']
-        cod_cable = grupo['cod_cable'][:12] if len(grupo['cod_cable']) > 12 else grupo['cod_cable']
-        seccion = grupo.get('seccion', '')[:10] if grupo.get('seccion') else ''
-        descripcion = grupo.get('descripcion', '')[:18] if grupo.get('descripcion') else ''
-        
-        html += f"""
-        <div class="etiqueta">
-            <div class="etiqueta-top">
-                <div class="etiqueta-numero">{numero}</div>
-                <div class="etiqueta-elemento">{elemento}</div>
-            </div>
-            <div class="etiqueta-bottom">"""
-        
-        # Añadir código de corte si existe
-        if codigo_corte:
-            html += f"""
-                <div class="etiqueta-info-line etiqueta-corte">{codigo_corte}</div>"""
-        
-        html += f"""
-                <div class="etiqueta-info-line etiqueta-cable">{cod_cable}</div>"""
-        
-        if seccion:
-            html += f"""
-                <div class="etiqueta-info-line etiqueta-seccion">{seccion}</div>"""
-        
-        html += """
-            </div>
-        </div>
-"""
-        
-        # Salto de página cada 65 etiquetas (13 columnas x 5 filas)
-        if (i + 1) % 65 == 0 and (i + 1) < len(grupos_con_seccion):
-            html += """
-    </div>
-    <div class="page-break"></div>
-    <div class="etiquetas-container">
-"""
-    
-    html += """
-    </div>
-</body>
-</html>
-"""
-    
-    return html
+
 
 # ================================
 # API ROUTES PARA PUESTOS Y MÁQUINAS
@@ -1364,9 +1335,11 @@ def generar_html_etiquetas_impresion(grupos, archivo, codigo_corte=""):
 def get_puestos():
     """Obtener lista de puestos"""
     try:
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify({'success': True, 'puestos': data.get('puestos', [])})
+        puestos_store = get_store('PUESTOS_FILE')
+        return responder_con_etag(
+            puestos_store.firma(),
+            lambda: jsonify({'success': True, 'puestos': puestos_store.leer().get('puestos', [])})
+        )
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -1376,31 +1349,25 @@ def create_puesto():
     try:
         datos = request.json
         
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Generar ID único
-        existing_ids = [p['id'] for p in data.get('puestos', [])]
-        new_id = f"puesto_{len(existing_ids) + 1}"
-        while new_id in existing_ids:
-            import random
-            new_id = f"puesto_{len(existing_ids) + 1}_{random.randint(100, 999)}"
-        
-        # Crear nuevo puesto
-        nuevo_puesto = {
-            'id': new_id,
-            'nombre': datos['nombre'],
-            'descripcion': datos.get('descripcion', ''),
-            'activo': True,
-            'maquinas': []
-        }
-        
-        data.setdefault('puestos', []).append(nuevo_puesto)
-        
-        # Guardar cambios
-        with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Generar ID único
+            existing_ids = [p['id'] for p in data.get('puestos', [])]
+            new_id = f"puesto_{len(existing_ids) + 1}"
+            while new_id in existing_ids:
+                import random
+                new_id = f"puesto_{len(existing_ids) + 1}_{random.randint(100, 999)}"
+            
+            # Crear nuevo puesto
+            nuevo_puesto = {
+                'id': new_id,
+                'nombre': datos['nombre'],
+                'descripcion': datos.get('descripcion', ''),
+                'activo': True,
+                'maquinas': []
+            }
+            
+            data.setdefault('puestos', []).append(nuevo_puesto)
         
         return jsonify({'success': True, 'puesto': nuevo_puesto})
         
@@ -1413,22 +1380,17 @@ def update_puesto(puesto_id):
     try:
         datos = request.json
         
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontrar y actualizar puesto
-        for puesto in data.get('puestos', []):
-            if puesto['id'] == puesto_id:
-                puesto['nombre'] = datos.get('nombre', puesto['nombre'])
-                puesto['descripcion'] = datos.get('descripcion', puesto['descripcion'])
-                puesto['activo'] = datos.get('activo', puesto['activo'])
-                
-                # Guardar cambios
-                with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                
-                return jsonify({'success': True, 'puesto': puesto})
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Encontrar y actualizar puesto
+            for puesto in data.get('puestos', []):
+                if puesto['id'] == puesto_id:
+                    puesto['nombre'] = datos.get('nombre', puesto['nombre'])
+                    puesto['descripcion'] = datos.get('descripcion', puesto['descripcion'])
+                    puesto['activo'] = datos.get('activo', puesto['activo'])
+            
+                    # Los cambios se guardan al cerrar la transacción
+                    return jsonify({'success': True, 'puesto': puesto})
         
         return jsonify({'success': False, 'message': 'Puesto no encontrado'})
         
@@ -1439,19 +1401,14 @@ def update_puesto(puesto_id):
 def delete_puesto(puesto_id):
     """Eliminar puesto"""
     try:
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Eliminar puesto
-        puestos_originales = len(data.get('puestos', []))
-        data['puestos'] = [p for p in data.get('puestos', []) if p['id'] != puesto_id]
-        
-        if len(data['puestos']) < puestos_originales:
-            # Guardar cambios
-            with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Eliminar puesto
+            puestos_originales = len(data.get('puestos', []))
+            data['puestos'] = [p for p in data.get('puestos', []) if p['id'] != puesto_id]
+            eliminado = len(data['puestos']) < puestos_originales
+        
+        if eliminado:
             return jsonify({'success': True, 'message': 'Puesto eliminado correctamente'})
         else:
             return jsonify({'success': False, 'message': 'Puesto no encontrado'})
@@ -1463,8 +1420,7 @@ def delete_puesto(puesto_id):
 def get_maquinas():
     """Obtener lista de máquinas con información del puesto"""
     try:
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = get_store('PUESTOS_FILE').leer()
         
         # Extraer todas las máquinas con información del puesto
         maquinas = []
@@ -1489,47 +1445,41 @@ def create_maquina():
         if not puesto_id:
             return jsonify({'success': False, 'message': 'Debe seleccionar un puesto'})
         
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontrar el puesto
-        puesto_encontrado = None
-        for puesto in data.get('puestos', []):
-            if puesto['id'] == puesto_id:
-                puesto_encontrado = puesto
-                break
-        
-        if not puesto_encontrado:
-            return jsonify({'success': False, 'message': 'Puesto no encontrado'})
-        
-        # Generar ID único para la máquina
-        existing_ids = []
-        for p in data.get('puestos', []):
-            for m in p.get('maquinas', []):
-                existing_ids.append(m['id'])
-        
-        import random
-        new_id = f"maquina_{len(existing_ids) + 1}"
-        while new_id in existing_ids:
-            new_id = f"maquina_{len(existing_ids) + 1}_{random.randint(100, 999)}"
-        
-        # Crear nueva máquina
-        nueva_maquina = {
-            'id': new_id,
-            'nombre': datos['nombre'],
-            'modelo': datos.get('modelo', ''),
-            'descripcion': datos.get('descripcion', ''),
-            'activo': True,
-            'terminales_asignados': []
-        }
-        
-        # Agregar máquina al puesto
-        puesto_encontrado.setdefault('maquinas', []).append(nueva_maquina)
-        
-        # Guardar cambios
-        with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Encontrar el puesto
+            puesto_encontrado = None
+            for puesto in data.get('puestos', []):
+                if puesto['id'] == puesto_id:
+                    puesto_encontrado = puesto
+                    break
+            
+            if not puesto_encontrado:
+                return jsonify({'success': False, 'message': 'Puesto no encontrado'})
+            
+            # Generar ID único para la máquina
+            existing_ids = []
+            for p in data.get('puestos', []):
+                for m in p.get('maquinas', []):
+                    existing_ids.append(m['id'])
+            
+            import random
+            new_id = f"maquina_{len(existing_ids) + 1}"
+            while new_id in existing_ids:
+                new_id = f"maquina_{len(existing_ids) + 1}_{random.randint(100, 999)}"
+            
+            # Crear nueva máquina
+            nueva_maquina = {
+                'id': new_id,
+                'nombre': datos['nombre'],
+                'modelo': datos.get('modelo', ''),
+                'descripcion': datos.get('descripcion', ''),
+                'activo': True,
+                'terminales_asignados': []
+            }
+            
+            # Agregar máquina al puesto
+            puesto_encontrado.setdefault('maquinas', []).append(nueva_maquina)
         
         # Preparar respuesta con información completa
         nueva_maquina['puesto_id'] = puesto_id
@@ -1552,68 +1502,62 @@ def update_maquina(maquina_id):
             print("[DEBUG] No se recibieron datos")
             return jsonify({'success': False, 'message': 'No se recibieron datos'})
         
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontrar y actualizar máquina
-        maquina_encontrada = None
-        puesto_padre = None
-        
-        for puesto in data.get('puestos', []):
-            for maquina in puesto.get('maquinas', []):
-                if maquina['id'] == maquina_id:
-                    maquina_encontrada = maquina
-                    puesto_padre = puesto
-                    break
-            if maquina_encontrada:
-                break
-        
-        if not maquina_encontrada:
-            print(f"[DEBUG] Máquina {maquina_id} no encontrada")
-            return jsonify({'success': False, 'message': 'Máquina no encontrada'})
-        
-        print(f"[DEBUG] Máquina encontrada: {maquina_encontrada}")
-        print(f"[DEBUG] Puesto padre: {puesto_padre['id']}")
-        
-        # Actualizar campos - asegurar que todos los campos existen
-        if 'nombre' in datos:
-            maquina_encontrada['nombre'] = datos['nombre']
-        if 'modelo' in datos:
-            maquina_encontrada['modelo'] = datos['modelo']
-        if 'descripcion' in datos:
-            maquina_encontrada['descripcion'] = datos['descripcion']
-        if 'activo' in datos:
-            maquina_encontrada['activo'] = datos['activo']
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Encontrar y actualizar máquina
+            maquina_encontrada = None
+            puesto_padre = None
             
-        # Asegurar que todos los campos requeridos existen
-        if 'descripcion' not in maquina_encontrada:
-            maquina_encontrada['descripcion'] = ''
-        if 'modelo' not in maquina_encontrada:
-            maquina_encontrada['modelo'] = ''
-        
-        print(f"[DEBUG] Máquina después de actualizar: {maquina_encontrada}")
-        
-        # Si se cambió el puesto, mover la máquina
-        nuevo_puesto_id = datos.get('puesto_id')
-        if nuevo_puesto_id and nuevo_puesto_id != puesto_padre['id']:
-            # Encontrar nuevo puesto
-            nuevo_puesto = None
             for puesto in data.get('puestos', []):
-                if puesto['id'] == nuevo_puesto_id:
-                    nuevo_puesto = puesto
+                for maquina in puesto.get('maquinas', []):
+                    if maquina['id'] == maquina_id:
+                        maquina_encontrada = maquina
+                        puesto_padre = puesto
+                        break
+                if maquina_encontrada:
                     break
             
-            if nuevo_puesto:
-                # Remover de puesto actual
-                puesto_padre['maquinas'].remove(maquina_encontrada)
-                # Agregar a nuevo puesto
-                nuevo_puesto.setdefault('maquinas', []).append(maquina_encontrada)
-                puesto_padre = nuevo_puesto
-        
-        # Guardar cambios
-        with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            if not maquina_encontrada:
+                print(f"[DEBUG] Máquina {maquina_id} no encontrada")
+                return jsonify({'success': False, 'message': 'Máquina no encontrada'})
+            
+            print(f"[DEBUG] Máquina encontrada: {maquina_encontrada}")
+            print(f"[DEBUG] Puesto padre: {puesto_padre['id']}")
+            
+            # Actualizar campos - asegurar que todos los campos existen
+            if 'nombre' in datos:
+                maquina_encontrada['nombre'] = datos['nombre']
+            if 'modelo' in datos:
+                maquina_encontrada['modelo'] = datos['modelo']
+            if 'descripcion' in datos:
+                maquina_encontrada['descripcion'] = datos['descripcion']
+            if 'activo' in datos:
+                maquina_encontrada['activo'] = datos['activo']
+            
+            # Asegurar que todos los campos requeridos existen
+            if 'descripcion' not in maquina_encontrada:
+                maquina_encontrada['descripcion'] = ''
+            if 'modelo' not in maquina_encontrada:
+                maquina_encontrada['modelo'] = ''
+            
+            print(f"[DEBUG] Máquina después de actualizar: {maquina_encontrada}")
+            
+            # Si se cambió el puesto, mover la máquina
+            nuevo_puesto_id = datos.get('puesto_id')
+            if nuevo_puesto_id and nuevo_puesto_id != puesto_padre['id']:
+                # Encontrar nuevo puesto
+                nuevo_puesto = None
+                for puesto in data.get('puestos', []):
+                    if puesto['id'] == nuevo_puesto_id:
+                        nuevo_puesto = puesto
+                        break
+            
+                if nuevo_puesto:
+                    # Remover de puesto actual
+                    puesto_padre['maquinas'].remove(maquina_encontrada)
+                    # Agregar a nuevo puesto
+                    nuevo_puesto.setdefault('maquinas', []).append(maquina_encontrada)
+                    puesto_padre = nuevo_puesto
         
         # Preparar respuesta
         maquina_encontrada['puesto_id'] = puesto_padre['id']
@@ -1633,26 +1577,20 @@ def update_maquina(maquina_id):
 def delete_maquina(maquina_id):
     """Eliminar máquina"""
     try:
-        # Cargar datos existentes
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontrar y eliminar máquina
-        maquina_eliminada = False
-        
-        for puesto in data.get('puestos', []):
-            maquinas_originales = len(puesto.get('maquinas', []))
-            puesto['maquinas'] = [m for m in puesto.get('maquinas', []) if m['id'] != maquina_id]
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Encontrar y eliminar máquina
+            maquina_eliminada = False
             
-            if len(puesto['maquinas']) < maquinas_originales:
-                maquina_eliminada = True
-                break
+            for puesto in data.get('puestos', []):
+                maquinas_originales = len(puesto.get('maquinas', []))
+                puesto['maquinas'] = [m for m in puesto.get('maquinas', []) if m['id'] != maquina_id]
+            
+                if len(puesto['maquinas']) < maquinas_originales:
+                    maquina_eliminada = True
+                    break
         
         if maquina_eliminada:
-            # Guardar cambios
-            with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
             return jsonify({'success': True, 'message': 'Máquina eliminada correctamente'})
         else:
             return jsonify({'success': False, 'message': 'Máquina no encontrada'})
@@ -1669,48 +1607,20 @@ def get_terminales_disponibles():
         if not os.path.exists(codigos_file):
             return jsonify({'success': False, 'message': 'No hay archivos Excel asociados a codigos de barras'}), 400
 
-        with open(codigos_file, 'r', encoding='utf-8') as f:
-            codigos_data = json.load(f)
+        codigos_data = get_store('CODIGOS_FILE').leer()
 
         cortes = codigos_data.get('cortes', [])
         if not cortes:
             return jsonify({'success': False, 'message': 'No hay archivos Excel asociados a codigos de barras'}), 400
 
-        cache_ttl = current_app.config.get('TERMINALES_CACHE_TTL', 300)
-        now = time.time()
-        signature = _build_terminales_signature(
-            codigos_file,
-            current_app.config['UPLOAD_FOLDER'],
-            cortes
-        )
-
-        cache_valid = (
-            terminales_cache['terminales'] is not None and
-            terminales_cache['signature'] == signature and
-            (cache_ttl <= 0 or (now - terminales_cache['timestamp']) <= cache_ttl)
-        )
-
-        if cache_valid:
-            terminales_sistema = set(terminales_cache['terminales'])
-            archivos_con_error = terminales_cache.get('archivos_con_error') or []
-        else:
-            terminales_sistema, archivos_con_error = _build_terminales_globales(
-                current_app.config['UPLOAD_FOLDER'],
-                codigos_file,
-                current_app.config['DEFAULT_SHEET'],
-                cortes
-            )
-            terminales_cache['terminales'] = sorted(list(terminales_sistema))
-            terminales_cache['archivos_con_error'] = archivos_con_error
-            terminales_cache['signature'] = signature
-            terminales_cache['timestamp'] = now
+        archivos = [corte.get('archivo') for corte in cortes if corte.get('archivo')]
+        terminales_sistema, _, archivos_con_error = get_terminales_catalogo(archivos)
 
         if not terminales_sistema:
             return jsonify({'success': False, 'message': 'No se encontraron terminales en los archivos'}), 400
 
         # Cargar asignaciones actuales
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = get_store('PUESTOS_FILE').leer()
         
         # Crear diccionario de terminales asignados
         terminales_asignados = {}
@@ -1758,42 +1668,36 @@ def asignar_terminal():
         if not terminal or not maquina_id:
             return jsonify({'success': False, 'message': 'Faltan datos requeridos'})
         
-        # Cargar datos
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Verificar que el terminal no esté ya asignado
-        terminal_ya_asignado = False
-        for puesto in data.get('puestos', []):
-            for maquina in puesto.get('maquinas', []):
-                if terminal in maquina.get('terminales_asignados', []):
-                    terminal_ya_asignado = True
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Verificar que el terminal no esté ya asignado
+            terminal_ya_asignado = False
+            for puesto in data.get('puestos', []):
+                for maquina in puesto.get('maquinas', []):
+                    if terminal in maquina.get('terminales_asignados', []):
+                        terminal_ya_asignado = True
+                        break
+                if terminal_ya_asignado:
                     break
+            
             if terminal_ya_asignado:
-                break
-        
-        if terminal_ya_asignado:
-            return jsonify({'success': False, 'message': 'El terminal ya está asignado a otra máquina'})
-        
-        # Encontrar la máquina y asignar terminal
-        maquina_encontrada = False
-        for puesto in data.get('puestos', []):
-            for maquina in puesto.get('maquinas', []):
-                if maquina['id'] == maquina_id:
-                    if 'terminales_asignados' not in maquina:
-                        maquina['terminales_asignados'] = []
-                    maquina['terminales_asignados'].append(terminal)
-                    maquina_encontrada = True
+                return jsonify({'success': False, 'message': 'El terminal ya está asignado a otra máquina'})
+            
+            # Encontrar la máquina y asignar terminal
+            maquina_encontrada = False
+            for puesto in data.get('puestos', []):
+                for maquina in puesto.get('maquinas', []):
+                    if maquina['id'] == maquina_id:
+                        if 'terminales_asignados' not in maquina:
+                            maquina['terminales_asignados'] = []
+                        maquina['terminales_asignados'].append(terminal)
+                        maquina_encontrada = True
+                        break
+                if maquina_encontrada:
                     break
-            if maquina_encontrada:
-                break
-        
-        if not maquina_encontrada:
-            return jsonify({'success': False, 'message': 'Máquina no encontrada'})
-        
-        # Guardar cambios
-        with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            
+            if not maquina_encontrada:
+                return jsonify({'success': False, 'message': 'Máquina no encontrada'})
         
         return jsonify({'success': True, 'message': f'Terminal {terminal} asignado correctamente'})
         
@@ -1810,27 +1714,21 @@ def desasignar_terminal():
         if not terminal:
             return jsonify({'success': False, 'message': 'Terminal requerido'})
         
-        # Cargar datos
-        with open('data/puestos_maquinas.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontrar y remover el terminal
-        terminal_removido = False
-        for puesto in data.get('puestos', []):
-            for maquina in puesto.get('maquinas', []):
-                if terminal in maquina.get('terminales_asignados', []):
-                    maquina['terminales_asignados'].remove(terminal)
-                    terminal_removido = True
+        # Cargar, modificar y guardar en una sola transacción
+        with get_store('PUESTOS_FILE').transaccion() as data:
+            # Encontrar y remover el terminal
+            terminal_removido = False
+            for puesto in data.get('puestos', []):
+                for maquina in puesto.get('maquinas', []):
+                    if terminal in maquina.get('terminales_asignados', []):
+                        maquina['terminales_asignados'].remove(terminal)
+                        terminal_removido = True
+                        break
+                if terminal_removido:
                     break
-            if terminal_removido:
-                break
-        
-        if not terminal_removido:
-            return jsonify({'success': False, 'message': 'Terminal no encontrado'})
-        
-        # Guardar cambios
-        with open('data/puestos_maquinas.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            
+            if not terminal_removido:
+                return jsonify({'success': False, 'message': 'Terminal no encontrado'})
         
         return jsonify({'success': True, 'message': f'Terminal {terminal} desasignado correctamente'})
         
@@ -1996,8 +1894,10 @@ def generar_bono():
 def listar_bonos():
     """Obtener lista de todos los bonos"""
     try:
-        bonos = proyecto_manager.obtener_todos_bonos()
-        return jsonify({'success': True, 'bonos': bonos})
+        return responder_con_etag(
+            proyecto_manager.version(),
+            lambda: jsonify({'success': True, 'bonos': proyecto_manager.obtener_todos_bonos()})
+        )
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -2082,12 +1982,15 @@ def actualizar_progreso_bono(nombre_bono):
 def obtener_progreso_bono(nombre_bono):
     """Obtener progreso de un bono"""
     try:
-        progreso = proyecto_manager.obtener_progreso_bono(nombre_bono)
+        def construir():
+            progreso = proyecto_manager.obtener_progreso_bono(nombre_bono)
+            
+            if progreso is not None:
+                return jsonify({'success': True, 'progreso': progreso})
+            else:
+                return jsonify({'success': False, 'message': 'Bono no encontrado'})
         
-        if progreso is not None:
-            return jsonify({'success': True, 'progreso': progreso})
-        else:
-            return jsonify({'success': False, 'message': 'Bono no encontrado'})
+        return responder_con_etag(proyecto_manager.version(), construir)
             
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -2100,36 +2003,9 @@ def obtener_terminales_disponibles_bono(nombre_bono):
         if not bono:
             return jsonify({'success': False, 'message': 'Bono no encontrado'})
         
-        # Obtener todos los archivos del bono
-        carros = bono.get('carros', [])
-        terminales_con_datos = set()
-        
-        # Para cada archivo, obtener los terminales únicos
-        for carro in carros:
-            archivo = carro.get('archivo_excel')
-            if not archivo:
-                continue
-            
-            # Cargar el archivo y obtener terminales
-            manager = ExcelManager(
-                current_app.config['UPLOAD_FOLDER'],
-                current_app.config['CODIGOS_FILE']
-            )
-            
-            if manager.cargar_excel(archivo):
-                # Convertir a registros
-                registros = manager.current_df.to_dict('records')
-                
-                # Extraer terminales únicos
-                for row in registros:
-                    de_terminal = str(row.get('De Terminal', '')).strip().upper()
-                    para_terminal = str(row.get('Para Terminal', '')).strip().upper()
-                    
-                    # Solo agregar si no es vacío y no es S/T
-                    if de_terminal and de_terminal != 'S/T' and not pd.isna(row.get('De Terminal')):
-                        terminales_con_datos.add(de_terminal)
-                    if para_terminal and para_terminal != 'S/T' and not pd.isna(row.get('Para Terminal')):
-                        terminales_con_datos.add(para_terminal)
+        # Terminales únicos de todos los archivos del bono (desde el catálogo)
+        archivos = [carro.get('archivo_excel') for carro in bono.get('carros', []) if carro.get('archivo_excel')]
+        terminales_con_datos, _, _ = get_terminales_catalogo(archivos)
         
         return jsonify({
             'success': True,
@@ -2158,6 +2034,75 @@ def obtener_progreso_por_carro(nombre_bono):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def _evento_sse(tipo, datos_json):
+    """Formatear un evento Server-Sent Events (datos ya serializados en JSON)"""
+    return f"event: {tipo}\ndata: {datos_json}\n\n"
+
+@bp.route('/api/bonos/<nombre_bono>/stream', methods=['GET'])
+def stream_progreso_bono(nombre_bono):
+    """
+    Stream SSE del progreso de un bono.
+    Al conectar se envía 'estado' (bono completo, terminales y totales por carro);
+    después, 'progreso' con el delta de cada escaneo, 'resincronizar' (se reenvía el
+    estado completo) y 'eliminado'. Sin cambios solo se envía un keep-alive.
+
+    Cada stream ocupa un hilo del servidor: se cierra tras SSE_DURACION_MAX_SEGUNDOS
+    (el campo 'retry' hace que el navegador reconecte y reciba de nuevo el estado) y
+    por encima de SSE_MAX_CONEXIONES se responde 503 y la página usa polling.
+    """
+    if proyecto_manager.obtener_bono(nombre_bono) is None:
+        return jsonify({'success': False, 'message': 'Bono no encontrado'}), 404
+    
+    keepalive = current_app.config.get('SSE_KEEPALIVE_SEGUNDOS', 15)
+    duracion_max = current_app.config.get('SSE_DURACION_MAX_SEGUNDOS', 300)
+    
+    # Suscribirse antes de leer el estado para no perder eventos intermedios
+    cola = bus_eventos.suscribir(nombre_bono)
+    if cola is None:
+        return jsonify({'success': False, 'message': 'Demasiados streams abiertos, usar polling'}), 503
+    
+    def generar():
+        fin = time.monotonic() + duracion_max
+        try:
+            yield 'retry: 3000\n\n'
+            reenviar_estado = True
+            while True:
+                if reenviar_estado:
+                    reenviar_estado = False
+                    estado = proyecto_manager.obtener_estado_bono(nombre_bono)
+                    if estado is None:
+                        yield _evento_sse('eliminado', json.dumps({'bono': nombre_bono}))
+                        return
+                    yield _evento_sse('estado', json.dumps(estado, ensure_ascii=False))
+                
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    tipo, datos_json = cola.get(timeout=min(keepalive, restante))
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                if tipo == 'resincronizar':
+                    reenviar_estado = True
+                    continue
+                
+                yield _evento_sse(tipo, datos_json)
+                if tipo == 'eliminado':
+                    return
+        finally:
+            bus_eventos.cancelar(nombre_bono, cola)
+    
+    respuesta = Response(
+        stream_with_context(generar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # También si el cliente se desconecta antes de que empiece el stream
+    respuesta.call_on_close(lambda: bus_eventos.cancelar(nombre_bono, cola))
+    return respuesta
+
 @bp.route('/api/bonos/<nombre_bono>', methods=['DELETE'])
 def eliminar_bono(nombre_bono):
     """Eliminar un bono"""
@@ -2258,15 +2203,13 @@ def resetear_progreso_bono(nombre_bono):
 def obtener_terminales_excel(archivo):
     """Obtener lista de terminales únicos de un archivo Excel"""
     try:
-        manager = get_excel_manager()
-        
-        # Cargar el archivo Excel
-        exito = manager.cargar_excel_directo(archivo)
-        if not exito:
+        # Cargar el archivo Excel (sin tocar el gestor global)
+        dataset = get_dataset(archivo)
+        if dataset is None:
             return jsonify({'success': False, 'message': f'No se pudo cargar el archivo {archivo}'})
         
         # Obtener terminales únicos
-        terminales = manager.listar_terminales_unicos()
+        terminales = dataset.listar_terminales_unicos()
         
         return jsonify({
             'success': True,
@@ -2294,18 +2237,18 @@ def datos_trabajo_v3():
                 'message': 'Parámetros incompletos'
             })
         
-        # Cargar el archivo Excel
-        manager = get_excel_manager()
-        if not manager.cargar_excel_directo(archivo):
+        # Cargar el archivo Excel (sin tocar el gestor global)
+        dataset = get_dataset(archivo)
+        if dataset is None:
             return jsonify({
                 'success': False,
                 'message': f'No se pudo cargar el archivo {archivo}'
             })
         
-        # Buscar datos del terminal
-        resultados = manager.buscar_terminal(terminal)
+        # Grupos por cable y elemento del terminal (compilados al cargar el archivo)
+        total_resultados, grupos = dataset.grupos_terminal(terminal)
         
-        if not resultados:
+        if not total_resultados:
             return jsonify({
                 'success': True,
                 'paquetes': [],
@@ -2313,9 +2256,6 @@ def datos_trabajo_v3():
                 'grupos': []
             })
         
-        # Agrupar por cable y elemento
-        grupos = manager.agrupar_por_cable_elemento(resultados, terminal)
-        
         # Convertir a lista de paquetes
         paquetes = []
         total_terminales = 0
@@ -2499,30 +2439,18 @@ def crear_orden():
         from datetime import datetime
         
         data = request.get_json()
-        ordenes_file = os.path.join(current_app.config['DATA_FOLDER'], 'ordenes_produccion.json')
-        codigos_file = current_app.config['CODIGOS_FILE']
-        
-        # Leer órdenes existentes
-        if os.path.exists(ordenes_file):
-            with open(ordenes_file, 'r', encoding='utf-8') as f:
-                ordenes_data = json.load(f)
-        else:
-            ordenes_data = {'ordenes': []}
         
         # Buscar archivo Excel asociado al código de corte
         archivo_excel = None
         descripcion_corte = None
         codigo_corte = data.get('codigo_corte', '')
         
-        if os.path.exists(codigos_file):
-            with open(codigos_file, 'r', encoding='utf-8') as f:
-                codigos_data = json.load(f)
-            
-            for corte in codigos_data.get('cortes', []):
-                if corte.get('codigo_barras', '').upper() == codigo_corte.upper():
-                    archivo_excel = corte.get('archivo')
-                    descripcion_corte = corte.get('descripcion')
-                    break
+        codigos_data = get_store('CODIGOS_FILE').leer()
+        for corte in codigos_data.get('cortes', []):
+            if corte.get('codigo_barras', '').upper() == codigo_corte.upper():
+                archivo_excel = corte.get('archivo')
+                descripcion_corte = corte.get('descripcion')
+                break
         
         # Crear nueva orden
         nueva_orden = {
@@ -2539,11 +2467,9 @@ def crear_orden():
             'fecha_creacion': datetime.now().isoformat()
         }
         
-        ordenes_data['ordenes'].append(nueva_orden)
-        
-        # Guardar
-        with open(ordenes_file, 'w', encoding='utf-8') as f:
-            json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
+        # Añadir la orden y guardar en una sola transacción
+        with get_store('ORDENES_FILE', lambda: {'ordenes': []}).transaccion() as ordenes_data:
+            ordenes_data.setdefault('ordenes', []).append(nueva_orden)
         
         return jsonify({
             'success': True,
@@ -2563,51 +2489,49 @@ def crear_orden():
 def listar_ordenes():
     """Listar todas las órdenes ordenadas por fecha de liberación (más antigua primero)"""
     try:
-        ordenes_file = os.path.join(current_app.config['DATA_FOLDER'], 'ordenes_produccion.json')
-        codigos_file = current_app.config['CODIGOS_FILE']
-        
-        if os.path.exists(ordenes_file):
-            with open(ordenes_file, 'r', encoding='utf-8') as f:
-                ordenes_data = json.load(f)
-            ordenes = ordenes_data.get('ordenes', [])
-            
-            # Cargar códigos de corte
-            codigos_map = {}
-            if os.path.exists(codigos_file):
-                with open(codigos_file, 'r', encoding='utf-8') as f:
-                    codigos_data = json.load(f)
+        ordenes_store = get_store('ORDENES_FILE', lambda: {'ordenes': []})
+        codigos_store = get_store('CODIGOS_FILE')
+        
+        def construir():
+            if ordenes_store.existe():
+                # Cargar códigos de corte
+                codigos_map = {}
+                codigos_data = codigos_store.leer()
                 for corte in codigos_data.get('cortes', []):
                     codigos_map[corte.get('codigo_barras', '').upper()] = {
                         'archivo': corte.get('archivo'),
                         'descripcion': corte.get('descripcion', '')
                     }
+                
+                ordenes = ordenes_store.leer().get('ordenes', [])
+                
+                # Actualizar órdenes sin archivo_excel asociado
+                # (solo si hace falta; la transacción guarda únicamente si hubo cambios)
+                if any(not orden.get('archivo_excel') and orden.get('codigo_corte', '').upper() in codigos_map
+                       for orden in ordenes):
+                    with ordenes_store.transaccion() as ordenes_data:
+                        ordenes = ordenes_data.get('ordenes', [])
+                        for orden in ordenes:
+                            codigo_corte = orden.get('codigo_corte', '').upper()
+                            # Si no tiene archivo_excel o es null, buscar asociación
+                            if not orden.get('archivo_excel') and codigo_corte in codigos_map:
+                                orden['archivo_excel'] = codigos_map[codigo_corte]['archivo']
+                
+                # Ordenar por fecha de entrega (más antigua primero)
+                ordenes_ordenadas = sorted(
+                    ordenes, 
+                    key=lambda x: x.get('fecha_entrega', '9999-12-31')
+                )
+            else:
+                ordenes_ordenadas = []
             
-            # Actualizar órdenes sin archivo_excel asociado
-            actualizado = False
-            for orden in ordenes:
-                codigo_corte = orden.get('codigo_corte', '').upper()
-                # Si no tiene archivo_excel o es null, buscar asociación
-                if not orden.get('archivo_excel') and codigo_corte in codigos_map:
-                    orden['archivo_excel'] = codigos_map[codigo_corte]['archivo']
-                    actualizado = True
-            
-            # Guardar cambios si hubo actualizaciones
-            if actualizado:
-                with open(ordenes_file, 'w', encoding='utf-8') as f:
-                    json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
-            
-            # Ordenar por fecha de entrega (más antigua primero)
-            ordenes_ordenadas = sorted(
-                ordenes, 
-                key=lambda x: x.get('fecha_entrega', '9999-12-31')
-            )
-        else:
-            ordenes_ordenadas = []
+            return jsonify({
+                'success': True,
+                'ordenes': ordenes_ordenadas
+            })
         
-        return jsonify({
-            'success': True,
-            'ordenes': ordenes_ordenadas
-        })
+        # El listado depende de las órdenes y de los códigos de corte
+        return responder_con_etag((ordenes_store.firma(), codigos_store.firma()), construir)
         
     except Exception as e:
         return jsonify({
@@ -2620,20 +2544,14 @@ def listar_ordenes():
 def eliminar_orden(orden_id):
     """Eliminar una orden"""
     try:
-        ordenes_file = os.path.join(current_app.config['DATA_FOLDER'], 'ordenes_produccion.json')
+        ordenes_store = get_store('ORDENES_FILE', lambda: {'ordenes': []})
         
-        if os.path.exists(ordenes_file):
-            with open(ordenes_file, 'r', encoding='utf-8') as f:
-                ordenes_data = json.load(f)
-        else:
+        if not ordenes_store.existe():
             return jsonify({'success': False, 'message': 'No hay órdenes registradas'})
         
-        # Filtrar la orden a eliminar
-        ordenes_data['ordenes'] = [o for o in ordenes_data['ordenes'] if o['id'] != orden_id]
-        
-        # Guardar
-        with open(ordenes_file, 'w', encoding='utf-8') as f:
-            json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
+        # Filtrar la orden a eliminar y guardar en una sola transacción
+        with ordenes_store.transaccion() as ordenes_data:
+            ordenes_data['ordenes'] = [o for o in ordenes_data['ordenes'] if o['id'] != orden_id]
         
         return jsonify({
             'success': True,
@@ -2652,38 +2570,33 @@ def actualizar_orden(orden_id):
     """Actualizar una orden existente"""
     try:
         data = request.get_json()
-        ordenes_file = os.path.join(current_app.config['DATA_FOLDER'], 'ordenes_produccion.json')
+        ordenes_store = get_store('ORDENES_FILE', lambda: {'ordenes': []})
         
-        if os.path.exists(ordenes_file):
-            with open(ordenes_file, 'r', encoding='utf-8') as f:
-                ordenes_data = json.load(f)
-        else:
+        if not ordenes_store.existe():
             return jsonify({'success': False, 'message': 'No hay órdenes registradas'})
         
-        # Buscar la orden
-        orden_encontrada = False
-        for orden in ordenes_data['ordenes']:
-            if orden['id'] == orden_id:
-                # Actualizar campos
-                orden['codigo_corte'] = data.get('codigo_corte', orden.get('codigo_corte', ''))
-                orden['numero'] = data.get('numero', orden.get('numero'))
-                orden['proyecto'] = data.get('proyecto', orden.get('proyecto', ''))
-                orden['descripcion'] = data.get('descripcion', orden.get('descripcion', ''))
-                orden['cantidad'] = data.get('cantidad', orden.get('cantidad'))
-                orden['fecha_entrega'] = data.get('fecha_entrega', orden.get('fecha_entrega'))
-                orden['prioridad'] = data.get('prioridad', orden.get('prioridad'))
-                # El estado se puede actualizar opcionalmente
-                if 'estado' in data:
-                    orden['estado'] = data.get('estado')
-                orden_encontrada = True
-                break
-        
-        if not orden_encontrada:
-            return jsonify({'success': False, 'message': 'Orden no encontrada'})
-        
-        # Guardar
-        with open(ordenes_file, 'w', encoding='utf-8') as f:
-            json.dump(ordenes_data, f, ensure_ascii=False, indent=2)
+        # Buscar, actualizar y guardar en una sola transacción
+        with ordenes_store.transaccion() as ordenes_data:
+            # Buscar la orden
+            orden_encontrada = False
+            for orden in ordenes_data['ordenes']:
+                if orden['id'] == orden_id:
+                    # Actualizar campos
+                    orden['codigo_corte'] = data.get('codigo_corte', orden.get('codigo_corte', ''))
+                    orden['numero'] = data.get('numero', orden.get('numero'))
+                    orden['proyecto'] = data.get('proyecto', orden.get('proyecto', ''))
+                    orden['descripcion'] = data.get('descripcion', orden.get('descripcion', ''))
+                    orden['cantidad'] = data.get('cantidad', orden.get('cantidad'))
+                    orden['fecha_entrega'] = data.get('fecha_entrega', orden.get('fecha_entrega'))
+                    orden['prioridad'] = data.get('prioridad', orden.get('prioridad'))
+                    # El estado se puede actualizar opcionalmente
+                    if 'estado' in data:
+                        orden['estado'] = data.get('estado')
+                    orden_encontrada = True
+                    break
+            
+            if not orden_encontrada:
+                return jsonify({'success': False, 'message': 'Orden no encontrada'})
         
         return jsonify({
             'success': True,
@@ -2714,13 +2627,17 @@ def printer_status():
         - message: str
         - has_paper: bool (solo en producción)
         - simulated_labels: int (solo en simulación)
+        - last_check: str (fecha de la última comprobación)
     """
     try:
-        from app.printer_manager import PrinterManager
+        from app.printer_manager import get_printer_manager
         from config import Config
         
-        printer = PrinterManager(Config)
-        status = printer.get_printer_status()
+        # Estado cacheado por la sonda en segundo plano (?refresh=true fuerza la consulta)
+        printer = get_printer_manager()
+        if request.args.get('refresh', '').lower() == 'true':
+            printer.refresh_status()
+        status = printer.get_cached_status()
         
         return jsonify({
             'success': True,
@@ -2743,10 +2660,10 @@ def printer_pending_labels():
         JSON con lista de etiquetas que fallaron al imprimir
     """
     try:
-        from app.printer_manager import PrinterManager
+        from app.printer_manager import get_printer_manager
         from config import Config
         
-        printer = PrinterManager(Config)
+        printer = get_printer_manager()
         pendientes = printer.get_pending_labels()
         
         return jsonify({
@@ -2784,7 +2701,7 @@ def printer_reprint():
         JSON con resultado de la impresión
     """
     try:
-        from app.printer_manager import PrinterManager
+        from app.cola_impresion import cola_impresion
         from app.zpl_templates import ZPLTemplates
         from config import Config
         
@@ -2797,7 +2714,6 @@ def printer_reprint():
                 'message': 'Falta especificar el tipo de etiqueta'
             })
         
-        printer = PrinterManager(Config)
         zpl = None
         metadata = {'tipo': tipo}
         
@@ -2867,8 +2783,20 @@ def printer_reprint():
                 'message': f'Tipo de etiqueta no válido: {tipo}'
             })
         
-        # Imprimir
-        resultado = printer.print_zpl(zpl, metadata)
+        # Imprimir a través de la cola (mismo hilo que el resto de etiquetas),
+        # esperando el resultado como mucho el timeout de la impresora
+        trabajo, error = cola_impresion.encolar(
+            [(zpl, metadata)], descripcion=f"Reimpresión {tipo}", bono=metadata.get('bono')
+        )
+        if error:
+            return jsonify({'success': False, 'message': error})
+        
+        trabajo = cola_impresion.esperar(trabajo['id'], timeout=Config.PRINTER_TIMEOUT + 5)
+        if trabajo and trabajo['resultados']:
+            resultado = dict(trabajo['resultados'][0])
+        else:
+            resultado = {'success': True, 'message': 'Etiqueta en cola de impresión', 'queued': True}
+        resultado['trabajo_id'] = trabajo['id'] if trabajo else None
         
         return jsonify(resultado)
         
@@ -2879,6 +2807,52 @@ def printer_reprint():
         })
 
 
+@bp.route('/api/printer/jobs', methods=['GET'])
+def printer_jobs():
+    """
+    Trabajos de la cola de impresión en segundo plano (más recientes primero)
+    
+    Query params:
+        bono: filtrar por nombre de bono (opcional)
+    """
+    try:
+        from app.cola_impresion import cola_impresion
+        
+        trabajos = cola_impresion.listar(bono=request.args.get('bono'))
+        
+        return jsonify({
+            'success': True,
+            'trabajos': trabajos,
+            'total': len(trabajos),
+            'cola': cola_impresion.estadisticas()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener trabajos de impresión: {str(e)}'
+        })
+
+
+@bp.route('/api/printer/jobs/<trabajo_id>', methods=['GET'])
+def printer_job(trabajo_id):
+    """Estado de un trabajo de impresión (pendiente/imprimiendo/completado/error)"""
+    try:
+        from app.cola_impresion import cola_impresion
+        
+        trabajo = cola_impresion.obtener(trabajo_id)
+        if trabajo is None:
+            return jsonify({'success': False, 'message': 'Trabajo de impresión no encontrado'}), 404
+        
+        return jsonify({'success': True, 'trabajo': trabajo})
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener trabajo de impresión: {str(e)}'
+        })
+
+
 @bp.route('/api/printer/retry-pending', methods=['POST'])
 def printer_retry_pending():
     """
@@ -2888,10 +2862,10 @@ def printer_retry_pending():
         JSON con resumen de resultados
     """
     try:
-        from app.printer_manager import PrinterManager
+        from app.printer_manager import get_printer_manager
         from config import Config
         
-        printer = PrinterManager(Config)
+        printer = get_printer_manager()
         resultado = printer.retry_pending_labels()
         
         return jsonify(resultado)
@@ -2906,46 +2880,45 @@ def printer_retry_pending():
 @bp.route('/api/printer/simulated-labels', methods=['GET'])
 def printer_simulated_labels():
     """
-    Obtener lista de etiquetas simuladas (archivos ZPL guardados)
+    Obtener lista de etiquetas simuladas (archivos ZPL guardados), más recientes primero
+    
+    Query params:
+        limite: Etiquetas por página (por defecto 100, máximo 1000)
+        cursor: siguiente_cursor de la respuesta anterior para pedir la página siguiente
+        bono, carro, tipo: Filtros opcionales
     
     Returns:
-        JSON con lista de archivos de simulación
+        JSON con la página de archivos de simulación, total y siguiente_cursor
     """
     try:
+        from app.printer_manager import get_printer_manager
         from config import Config
-        import os
-        from datetime import datetime
         
-        sim_dir = Config.PRINTER_SIMULATION_DIR
-        
-        if not os.path.exists(sim_dir):
+        try:
+            limite = min(max(int(request.args.get('limite', 100)), 1), 1000)
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+        except ValueError:
             return jsonify({
-                'success': True,
-                'archivos': [],
-                'total': 0
-            })
-        
-        archivos = []
-        for filename in os.listdir(sim_dir):
-            if filename.endswith('.zpl'):
-                filepath = os.path.join(sim_dir, filename)
-                stat = os.stat(filepath)
-                
-                archivos.append({
-                    'nombre': filename,
-                    'ruta': filepath,
-                    'tamano': stat.st_size,
-                    'fecha': datetime.fromtimestamp(stat.st_mtime).isoformat()
-                })
+                'success': False,
+                'message': 'Parámetros limite/cursor no válidos'
+            }), 400
         
-        # Ordenar por fecha descendente
-        archivos.sort(key=lambda x: x['fecha'], reverse=True)
+        printer = get_printer_manager()
+        pagina = printer.list_simulated_labels(
+            limit=limite,
+            cursor=cursor,
+            bono=request.args.get('bono'),
+            carro=request.args.get('carro'),
+            tipo=request.args.get('tipo')
+        )
         
         return jsonify({
             'success': True,
-            'archivos': archivos,
-            'total': len(archivos),
-            'directorio': sim_dir
+            'archivos': pagina['etiquetas'],
+            'total': pagina['total'],
+            'siguiente_cursor': pagina['next_cursor'],
+            'directorio': Config.PRINTER_SIMULATION_DIR
         })
         
     except Exception as e:
@@ -2964,10 +2937,10 @@ def printer_clear_simulated():
         JSON con resultado de la operación
     """
     try:
-        from app.printer_manager import PrinterManager
+        from app.printer_manager import get_printer_manager
         from config import Config
         
-        printer = PrinterManager(Config)
+        printer = get_printer_manager()
         resultado = printer.clear_simulated_labels()
         
         return jsonify(resultado)
@@ -0,0 +1,216 @@
+"""
+Spool de etiquetas pendientes de impresión (un archivo por trabajo)
+Sustituye a etiquetas_pendientes.json: guardar un fallo o marcar una etiqueta como
+enviada es crear o renombrar un archivo, no leer y reescribir la lista entera.
+
+    <carpeta>/pending/<clave>.json   en espera de reintento
+    <carpeta>/sent/<fecha>_<clave>.json   enviadas (se conservan las últimas)
+    <carpeta>/failed/<clave>.json   agotaron los reintentos
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+PENDIENTES = 'pending'
+ENVIADAS = 'sent'
+FALLIDAS = 'failed'
+
+
+class SpoolImpresion:
+    """
+    Cola de reintentos en disco con backoff exponencial por trabajo.
+
+    - La clave de cada trabajo es el hash del ZPL: la misma etiqueta no se encola
+      dos veces mientras siga pendiente.
+    - Los cambios de estado son renombrados atómicos entre subcarpetas; un corte
+      de luz deja cada trabajo entero en una de ellas.
+    - Tras cada fallo el siguiente intento se retrasa backoff_base * 2^(intentos-1)
+      segundos (hasta backoff_max); con max_intentos fallos pasa a failed/.
+    """
+
+    def __init__(self, carpeta: str, backoff_base: float = 5, backoff_max: float = 600,
+                 max_intentos: int = 20, max_enviadas: int = 500):
+        self.carpeta = carpeta
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_intentos = max_intentos
+        self.max_enviadas = max_enviadas
+        for subcarpeta in (PENDIENTES, ENVIADAS, FALLIDAS, 'tmp'):
+            os.makedirs(os.path.join(carpeta, subcarpeta), exist_ok=True)
+
+    def _ruta(self, estado: str, nombre: str) -> str:
+        return os.path.join(self.carpeta, estado, nombre)
+
+    def _escribir_tmp(self, trabajo: Dict) -> str:
+        """Escribir el trabajo completo en tmp/ (después se enlaza o renombra a su sitio)"""
+        ruta_tmp = self._ruta('tmp', f'{uuid.uuid4().hex}.json')
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(trabajo, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        return ruta_tmp
+
+    def _leer(self, ruta: str) -> Optional[Dict]:
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def agregar(self, zpl_code: str, metadata: Dict = None, error: str = '',
+                fecha: str = None, intentos: int = 0) -> bool:
+        """
+        Encolar una etiqueta para reintentarla
+        Retorna False si ya había un trabajo pendiente con el mismo ZPL
+        """
+        clave = hashlib.sha1(zpl_code.encode('utf-8')).hexdigest()[:20]
+        trabajo = {
+            'id': clave,
+            'zpl': zpl_code,
+            'metadata': metadata or {},
+            'error': error,
+            'fecha': fecha or datetime.now().isoformat(),
+            'orden': time.time_ns(),
+            'intentos': intentos,
+            'proximo_intento': time.time() + self.backoff_base
+        }
+
+        ruta_tmp = self._escribir_tmp(trabajo)
+        try:
+            # link() falla si el destino existe: alta y deduplicación en un solo paso
+            os.link(ruta_tmp, self._ruta(PENDIENTES, f'{clave}.json'))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(ruta_tmp)
+
+    def _listar(self, estado: str) -> List[Tuple[str, Dict]]:
+        carpeta = os.path.join(self.carpeta, estado)
+        trabajos = []
+        with os.scandir(carpeta) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith('.json'):
+                    continue
+                trabajo = self._leer(entrada.path)
+                if trabajo is not None:
+                    trabajos.append((entrada.name, trabajo))
+        trabajos.sort(key=lambda t: t[1].get('orden', 0))
+        return trabajos
+
+    def hay_pendientes(self) -> bool:
+        """Comprobación barata para el drenador (no lee los archivos)"""
+        with os.scandir(os.path.join(self.carpeta, PENDIENTES)) as entradas:
+            return any(entrada.name.endswith('.json') for entrada in entradas)
+
+    def pendientes(self, solo_vencidos: bool = False) -> List[Tuple[str, Dict]]:
+        """Trabajos pendientes en orden de llegada; solo_vencidos respeta el backoff"""
+        trabajos = self._listar(PENDIENTES)
+        if solo_vencidos:
+            ahora = time.time()
+            trabajos = [t for t in trabajos if t[1].get('proximo_intento', 0) <= ahora]
+        return trabajos
+
+    def fallidas(self) -> List[Tuple[str, Dict]]:
+        return self._listar(FALLIDAS)
+
+    def marcar_enviada(self, nombre: str) -> None:
+        marca = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        try:
+            os.replace(self._ruta(PENDIENTES, nombre), self._ruta(ENVIADAS, f'{marca}_{nombre}'))
+        except FileNotFoundError:
+            pass
+
+    def marcar_fallo(self, nombre: str, trabajo: Dict, error: str) -> str:
+        """
+        Registrar un intento fallido: programa el siguiente con backoff o, si se
+        agotaron los intentos, mueve el trabajo a failed/. Retorna el nuevo estado.
+        """
+        trabajo = dict(trabajo)
+        trabajo['intentos'] = trabajo.get('intentos', 0) + 1
+        trabajo['error'] = error
+        trabajo['ultimo_intento'] = datetime.now().isoformat()
+        espera = min(self.backoff_base * 2 ** (trabajo['intentos'] - 1), self.backoff_max)
+        trabajo['proximo_intento'] = time.time() + espera
+
+        estado = FALLIDAS if trabajo['intentos'] >= self.max_intentos else PENDIENTES
+        ruta_tmp = self._escribir_tmp(trabajo)
+        os.replace(ruta_tmp, self._ruta(estado, nombre))
+        if estado == FALLIDAS:
+            try:
+                os.remove(self._ruta(PENDIENTES, nombre))
+            except FileNotFoundError:
+                pass
+        return estado
+
+    def reactivar_fallidas(self) -> int:
+        """Devolver a pending/ los trabajos de failed/ para un reintento inmediato"""
+        reactivadas = 0
+        for nombre, trabajo in self.fallidas():
+            trabajo['proximo_intento'] = time.time()
+            ruta_tmp = self._escribir_tmp(trabajo)
+            os.replace(ruta_tmp, self._ruta(PENDIENTES, nombre))
+            os.remove(self._ruta(FALLIDAS, nombre))
+            reactivadas += 1
+        return reactivadas
+
+    def podar_enviadas(self) -> None:
+        """Conservar solo las últimas max_enviadas (el nombre empieza por la fecha)"""
+        carpeta = os.path.join(self.carpeta, ENVIADAS)
+        nombres = sorted(os.listdir(carpeta))
+        for nombre in nombres[:max(0, len(nombres) - self.max_enviadas)]:
+            try:
+                os.remove(os.path.join(carpeta, nombre))
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def bloqueo(self, esperar: bool = True):
+        """
+        Exclusión para drenar el spool (entre hilos y entre procesos/workers).
+        Con esperar=False produce False si otro ya lo está drenando.
+        """
+        with open(os.path.join(self.carpeta, '.drenando'), 'a') as f:
+            adquirido = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    adquirido = False
+            try:
+                yield adquirido
+            finally:
+                if adquirido and fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def importar_json(self, ruta: str) -> int:
+        """
+        Migrar el antiguo etiquetas_pendientes.json (lista de etiquetas) al spool
+        El archivo se renombra a .migrado para no importarlo dos veces
+        """
+        if not os.path.exists(ruta):
+            return 0
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                anteriores = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        importadas = 0
+        for etiqueta in anteriores if isinstance(anteriores, list) else []:
+            if etiqueta.get('zpl') and self.agregar(etiqueta['zpl'], etiqueta.get('metadata'),
+                                                    etiqueta.get('error', ''), etiqueta.get('fecha'),
+                                                    etiqueta.get('intentos', 0)):
+                importadas += 1
+        os.replace(ruta, ruta + '.migrado')
+        return importadas
@@ -0,0 +1,182 @@
+"""
+Transportes directos a la impresora Zebra (sin CUPS)
+- TCP: socket raw persistente al puerto 9100, con keep-alive y reconexión
+- USB: escritura directa en el dispositivo /dev/usb/lp*
+Evitan el fork/exec de lpr/lpstat y el archivo temporal por etiqueta.
+"""
+import os
+import select
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TransporteTCP:
+    """
+    Conexión raw persistente con la impresora (puerto 9100 en Zebra).
+    La conexión se reutiliza entre envíos; si la impresora la cerró o falla el
+    envío, se reconecta una vez antes de dar el error.
+    """
+
+    tipo = 'tcp'
+
+    def __init__(self, host: str, port: int = 9100, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def descripcion(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def _conectar(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _cerrar(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _conexion_viva(self) -> bool:
+        """
+        Comprobar sin bloquear que la impresora no cerró la conexión (un send sobre
+        un socket cerrado por el otro extremo "funciona" y la etiqueta se pierde)
+        """
+        try:
+            legible, _, _ = select.select([self._sock], [], [], 0)
+            if not legible:
+                return True
+            return self._sock.recv(1, socket.MSG_PEEK) != b''
+        except OSError:
+            return False
+
+    def _socket(self) -> socket.socket:
+        if self._sock is not None and not self._conexion_viva():
+            self._cerrar()
+        if self._sock is None:
+            self._sock = self._conectar()
+        return self._sock
+
+    def enviar(self, zpl: str) -> None:
+        """Enviar ZPL (una o varias etiquetas); lanza OSError si no se pudo"""
+        datos = zpl.encode('utf-8')
+        with self._lock:
+            for intento in (1, 2):
+                try:
+                    self._socket().sendall(datos)
+                    return
+                except OSError:
+                    self._cerrar()
+                    if intento == 2:
+                        raise
+
+    def disponible(self) -> bool:
+        with self._lock:
+            try:
+                self._socket()
+                return True
+            except OSError:
+                self._cerrar()
+                return False
+
+    def _descartar_pendiente(self, sock: socket.socket) -> None:
+        """Vaciar bytes no solicitados que la impresora haya enviado antes de una consulta"""
+        while select.select([sock], [], [], 0)[0]:
+            if not sock.recv(4096):
+                raise ConnectionError('Conexión cerrada por la impresora')
+
+    def consultar_estado(self) -> Optional[Dict]:
+        """
+        Estado de la impresora con el comando ~HS (Host Status).
+        La respuesta son tres líneas <STX>...<ETX>; de la primera se leen los flags
+        de papel agotado y pausa. Retorna None si la impresora no responde.
+        """
+        with self._lock:
+            try:
+                sock = self._socket()
+                self._descartar_pendiente(sock)
+                sock.sendall(b'~HS')
+
+                respuesta = b''
+                limite = time.monotonic() + self.timeout
+                while respuesta.count(b'\x03') < 3:
+                    restante = limite - time.monotonic()
+                    if restante <= 0 or not select.select([sock], [], [], restante)[0]:
+                        return None
+                    bloque = sock.recv(1024)
+                    if not bloque:
+                        raise ConnectionError('Conexión cerrada por la impresora')
+                    respuesta += bloque
+            except OSError:
+                self._cerrar()
+                return None
+
+        lineas = [parte.strip(b'\x02\r\n ').decode('ascii', 'replace')
+                  for parte in respuesta.split(b'\x03') if parte.strip()]
+        campos = lineas[0].split(',') if lineas else []
+        return {
+            'papel_agotado': len(campos) > 1 and campos[1] == '1',
+            'en_pausa': len(campos) > 2 and campos[2] == '1',
+            'respuesta': lineas
+        }
+
+
+class TransporteUSB:
+    """Escritura directa en el dispositivo de impresora USB (p.ej. /dev/usb/lp0)"""
+
+    tipo = 'usb'
+
+    def __init__(self, dispositivo: str):
+        self.dispositivo = dispositivo
+        self._lock = threading.Lock()
+
+    def descripcion(self) -> str:
+        return self.dispositivo
+
+    def enviar(self, zpl: str) -> None:
+        with self._lock:
+            with open(self.dispositivo, 'wb', buffering=0) as f:
+                f.write(zpl.encode('utf-8'))
+
+    def disponible(self) -> bool:
+        return os.path.exists(self.dispositivo) and os.access(self.dispositivo, os.W_OK)
+
+    def consultar_estado(self) -> Optional[Dict]:
+        # El estado por USB depende del driver; solo se comprueba el dispositivo
+        return None
+
+
+_transportes: Dict[tuple, object] = {}
+_transportes_lock = threading.Lock()
+
+
+def obtener_transporte(tipo: str, host: str = '', port: int = 9100,
+                       dispositivo: str = '/dev/usb/lp0', timeout: float = 10):
+    """
+    Transporte compartido por destino (una sola conexión TCP por impresora en todo
+    el proceso). Retorna None para 'cups' (se usa lpr).
+    """
+    if tipo == 'tcp':
+        clave = ('tcp', host, int(port))
+    elif tipo == 'usb':
+        clave = ('usb', dispositivo)
+    else:
+        return None
+
+    with _transportes_lock:
+        transporte = _transportes.get(clave)
+        if transporte is None:
+            if tipo == 'tcp':
+                transporte = TransporteTCP(host, int(port), timeout=timeout)
+            else:
+                transporte = TransporteUSB(dispositivo)
+            _transportes[clave] = transporte
+        return transporte
@@ -1,8 +1,148 @@
 """
 Plantillas ZPL para impresión de etiquetas en Zebra GK420T
 Dimensiones de etiqueta: 55mm x 15mm (432 dots x 118 dots @ 203 DPI)
+
+Las plantillas se compilan una vez (PlantillaZPL): el layout se divide en trozos
+fijos y campos variables, y cada etiqueta se genera uniendo buffers. Los datos de
+los campos se escapan con ^FH, así que un '^' o '~' en un código no rompe la etiqueta.
 """
+import re
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Tuple, Union
+
+from config import Config
+
+# Campo de datos de un layout: ^FD ... ^FS
+_CAMPO_FD = re.compile(r'\^FD(.*?)\^FS', re.DOTALL)
+# Hueco dentro de un campo: {nombre} o {nombre:longitud_maxima}
+_HUECO = re.compile(r'\{(\w+)(?::(\d+))?\}')
+# Llamada a un formato almacenado en la impresora: ^XFR:NOMBRE.ZPL
+_LLAMADA_FORMATO = re.compile(r'\^XF(\w:[\w.]+)\^FS')
+
+# Formatos almacenados registrados (nombre -> definición ^DF)
+_FORMATOS: Dict[str, str] = {}
+
+
+@lru_cache(maxsize=4096)
+def _escapar(valor: str, longitud: int = 0) -> str:
+    """Truncar y escapar un dato para ^FH (indicador '_': _5F, ^ -> _5E, ~ -> _7E)"""
+    if longitud:
+        valor = valor[:longitud]
+    return valor.replace('_', '_5F').replace('^', '_5E').replace('~', '_7E')
+
+
+class PlantillaZPL:
+    """
+    Layout ZPL compilado.
+
+    - Los campos ^FD...^FS con huecos {nombre} / {nombre:N} (N = truncar a N
+      caracteres) son variables: se emiten como ^FH^FD con los datos escapados.
+    - renderizar(**valores): etiqueta completa ^XA...^XZ.
+    - Con nombre_formato, la plantilla se puede guardar en la impresora (^DF) y
+      recuperar(**valores) genera solo ^XF + los campos variables (^FN).
+    """
+
+    def __init__(self, layout: str, nombre_formato: str = None):
+        self.nombre_formato = nombre_formato
+        # Trozos alternos: texto fijo, campo variable, texto fijo, ...
+        # Un campo variable es una lista de piezas: str literal (ya escapado) o (nombre, longitud)
+        self._trozos: List[Union[str, List]] = []
+        self._campos: List[List] = []
+
+        fijo = []
+        ultimo = 0
+        for campo in _CAMPO_FD.finditer(layout):
+            contenido = campo.group(1)
+            if not _HUECO.search(contenido):
+                continue
+            fijo.append(layout[ultimo:campo.start()])
+            self._trozos.append(''.join(fijo))
+            fijo = []
+            piezas = self._compilar_campo(contenido)
+            self._trozos.append(piezas)
+            self._campos.append(piezas)
+            ultimo = campo.end()
+        fijo.append(layout[ultimo:])
+        self._trozos.append(''.join(fijo))
+
+        if nombre_formato:
+            _FORMATOS[nombre_formato] = self._definicion()
+
+    @staticmethod
+    def _compilar_campo(contenido: str) -> List:
+        piezas = []
+        ultimo = 0
+        for hueco in _HUECO.finditer(contenido):
+            if hueco.start() > ultimo:
+                piezas.append(_escapar(contenido[ultimo:hueco.start()]))
+            piezas.append((hueco.group(1), int(hueco.group(2) or 0)))
+            ultimo = hueco.end()
+        if ultimo < len(contenido):
+            piezas.append(_escapar(contenido[ultimo:]))
+        return piezas
+
+    @staticmethod
+    def _datos(piezas: List, valores: Dict) -> str:
+        return ''.join(
+            pieza if isinstance(pieza, str) else _escapar(str(valores[pieza[0]]), pieza[1])
+            for pieza in piezas
+        )
+
+    def renderizar(self, **valores) -> str:
+        """Etiqueta completa, lista para imprimir"""
+        partes = []
+        for trozo in self._trozos:
+            if isinstance(trozo, str):
+                partes.append(trozo)
+            else:
+                partes.append('^FH^FD')
+                partes.append(self._datos(trozo, valores))
+                partes.append('^FS')
+        return ''.join(partes)
+
+    def _definicion(self) -> str:
+        """Formato para guardar en la impresora: los campos variables pasan a ser ^FN1, ^FN2..."""
+        partes = []
+        numero = 0
+        for trozo in self._trozos:
+            if isinstance(trozo, str):
+                partes.append(trozo)
+            else:
+                numero += 1
+                partes.append(f'^FN{numero}^FS')
+        cuerpo = ''.join(partes).strip()
+        cuerpo = cuerpo[len('^XA'):] if cuerpo.startswith('^XA') else cuerpo
+        return f'^XA\n^DF{self.nombre_formato}^FS{cuerpo}'
+
+    def recuperar(self, **valores) -> str:
+        """Etiqueta que usa el formato guardado en la impresora: solo viajan los datos variables"""
+        partes = [f'^XA^XF{self.nombre_formato}^FS']
+        for numero, piezas in enumerate(self._campos, start=1):
+            partes.append(f'^FN{numero}^FH^FD{self._datos(piezas, valores)}^FS')
+        partes.append('^XZ')
+        return ''.join(partes)
+
+    def generar(self, **valores) -> str:
+        """Recuperar el formato guardado si está activado (PRINTER_STORED_FORMATS), si no la etiqueta completa"""
+        if self.nombre_formato and getattr(Config, 'PRINTER_STORED_FORMATS', False):
+            return self.recuperar(**valores)
+        return self.renderizar(**valores)
+
+
+def anteponer_formatos(zpl: str) -> str:
+    """
+    Añadir delante de un envío las definiciones ^DF de los formatos que usa (una
+    vez por envío, aunque haya muchas etiquetas que los llamen). Así cada trabajo
+    es autosuficiente aunque la impresora se haya reiniciado y perdido su memoria R:.
+    """
+    if '^XF' not in zpl:
+        return zpl
+    nombres = list(dict.fromkeys(_LLAMADA_FORMATO.findall(zpl)))
+    definiciones = [_FORMATOS[nombre] for nombre in nombres if nombre in _FORMATOS]
+    if not definiciones:
+        return zpl
+    return '\n'.join(definiciones) + '\n' + zpl
 
 
 class ZPLTemplates:
@@ -13,6 +153,42 @@ class ZPLTemplates:
     LABEL_WIDTH = 432
     LABEL_HEIGHT = 118
     
+    # Layouts compilados (los de carro se pueden guardar en la impresora con ^DF)
+    ASIGNACION_CARRO = PlantillaZPL("""^XA
+^FO10,5^A0N,25,25^FDCarro: {carro}^FS
+^FO10,35^GB410,1,1^FS
+^FO10,40^A0N,20,20^FDOrden: {orden}^FS
+^FO10,62^A0N,18,18^FD{codigo_corte:15}^FS
+^FO280,40^A0N,18,18^FDTerm: {cantidad_terminales}^FS
+^FO280,62^A0N,15,15^FD{proyecto:20}^FS
+^XZ""", nombre_formato='R:ASIGCARR.ZPL')
+    
+    DUPLICADA = PlantillaZPL("""^XA
+^FO10,5^A0N,22,22^FDCarro {carro} - DUPLICADO^FS
+^FO10,30^GB410,1,1^FS
+^FO10,35^A0N,20,20^FDOrden: {orden}^FS
+^FO10,58^A0N,18,18^FD{codigo_corte:18}^FS
+^FO280,35^BY2^BCN,40,N,N,N^FD{orden}^FS
+^XZ""", nombre_formato='R:DUPCARRO.ZPL')
+    
+    _FINALIZACION = """^XA
+^FO10,5^A0N,22,22^FDCARRO {carro} FINALIZADO^FS
+^FO10,30^GB410,2,2^FS
+^FO10,35^A0N,18,18^FD{nombre_bono:18}^FS
+^FO10,55^A0N,16,16^FD{fecha} {hora}^FS
+^FO220,55^A0N,16,16^FDOp: {operario:12}^FS
+^FO10,73^A0N,16,16^FDTerm: {terminales_completados}/{terminales_totales} ({progreso}%)^FS"""
+    FINALIZACION = PlantillaZPL(_FINALIZACION + "\n^XZ")
+    FINALIZACION_PROYECTO = PlantillaZPL(_FINALIZACION + "\n^FO10,91^A0N,14,14^FD{proyecto:15}^FS\n^XZ")
+    
+    TEST = PlantillaZPL("""^XA
+^FO10,10^A0N,30,30^FDPRUEBA ZEBRA^FS
+^FO10,45^GB410,1,1^FS
+^FO10,50^A0N,20,20^FDSistema Engastado^FS
+^FO10,75^A0N,16,16^FD{fecha}^FS
+^FO10,95^A0N,14,14^FD55mm x 15mm @ 203 DPI^FS
+^XZ""")
+    
     @staticmethod
     def etiqueta_asignacion_carro(carro: int, orden: str, codigo_corte: str, 
                                    proyecto: str, cantidad_terminales: int) -> str:
@@ -30,18 +206,13 @@ class ZPLTemplates:
         Returns:
             Código ZPL listo para imprimir
         """
-        # Truncar textos largos
-        proyecto_truncado = proyecto[:20] if len(proyecto) > 20 else proyecto
-        codigo_truncado = codigo_corte[:15] if len(codigo_corte) > 15 else codigo_corte
-        
-        return f"""^XA
-^FO10,5^A0N,25,25^FDCarro: {carro}^FS
-^FO10,35^GB410,1,1^FS
-^FO10,40^A0N,20,20^FDOrden: {orden}^FS
-^FO10,62^A0N,18,18^FD{codigo_truncado}^FS
-^FO280,40^A0N,18,18^FDTerm: {cantidad_terminales}^FS
-^FO280,62^A0N,15,15^FD{proyecto_truncado}^FS
-^XZ"""
+        return ZPLTemplates.ASIGNACION_CARRO.generar(
+            carro=carro,
+            orden=orden,
+            codigo_corte=codigo_corte,
+            proyecto=proyecto,
+            cantidad_terminales=cantidad_terminales
+        )
     
     @staticmethod
     def etiqueta_duplicada(carro: int, orden: str, codigo_corte: str) -> str:
@@ -57,15 +228,7 @@ class ZPLTemplates:
         Returns:
             Código ZPL listo para imprimir
         """
-        codigo_truncado = codigo_corte[:18] if len(codigo_corte) > 18 else codigo_corte
-        
-        return f"""^XA
-^FO10,5^A0N,22,22^FDCarro {carro} - DUPLICADO^FS
-^FO10,30^GB410,1,1^FS
-^FO10,35^A0N,20,20^FDOrden: {orden}^FS
-^FO10,58^A0N,18,18^FD{codigo_truncado}^FS
-^FO280,35^BY2^BCN,40,N,N,N^FD{orden}^FS
-^XZ"""
+        return ZPLTemplates.DUPLICADA.generar(carro=carro, orden=orden, codigo_corte=codigo_corte)
     
     @staticmethod
     def etiqueta_finalizacion_carro(carro: int, nombre_bono: str, 
@@ -85,30 +248,23 @@ class ZPLTemplates:
         Returns:
             Código ZPL listo para imprimir
         """
-        fecha = datetime.now().strftime("%d/%m/%Y")
-        hora = datetime.now().strftime("%H:%M")
+        ahora = datetime.now()
         progreso = int((terminales_completados / terminales_totales) * 100) if terminales_totales > 0 else 100
         
-        # Truncar textos
-        bono_truncado = nombre_bono[:18] if len(nombre_bono) > 18 else nombre_bono
-        operario_truncado = operario[:12] if len(operario) > 12 else operario
-        proyecto_truncado = (proyecto[:15] if proyecto and len(proyecto) > 15 else proyecto) if proyecto else ""
-        
-        zpl = f"""^XA
-^FO10,5^A0N,22,22^FDCARRO {carro} FINALIZADO^FS
-^FO10,30^GB410,2,2^FS
-^FO10,35^A0N,18,18^FD{bono_truncado}^FS
-^FO10,55^A0N,16,16^FD{fecha} {hora}^FS
-^FO220,55^A0N,16,16^FDOp: {operario_truncado}^FS
-^FO10,73^A0N,16,16^FDTerm: {terminales_completados}/{terminales_totales} ({progreso}%)^FS"""
-        
-        # Agregar proyecto si está disponible
-        if proyecto_truncado:
-            zpl += f"\n^FO10,91^A0N,14,14^FD{proyecto_truncado}^FS"
-        
-        zpl += "\n^XZ"
+        # Línea de proyecto solo si está disponible
+        plantilla = ZPLTemplates.FINALIZACION_PROYECTO if proyecto else ZPLTemplates.FINALIZACION
         
-        return zpl
+        return plantilla.renderizar(
+            carro=carro,
+            nombre_bono=nombre_bono,
+            fecha=ahora.strftime("%d/%m/%Y"),
+            hora=ahora.strftime("%H:%M"),
+            operario=operario,
+            terminales_completados=terminales_completados,
+            terminales_totales=terminales_totales,
+            progreso=progreso,
+            proyecto=proyecto or ""
+        )
     
     @staticmethod
     def etiqueta_test() -> str:
@@ -118,15 +274,7 @@ class ZPLTemplates:
         Returns:
             Código ZPL de prueba
         """
-        fecha = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-        
-        return f"""^XA
-^FO10,10^A0N,30,30^FDPRUEBA ZEBRA^FS
-^FO10,45^GB410,1,1^FS
-^FO10,50^A0N,20,20^FDSistema Engastado^FS
-^FO10,75^A0N,16,16^FD{fecha}^FS
-^FO10,95^A0N,14,14^FD55mm x 15mm @ 203 DPI^FS
-^XZ"""
+        return ZPLTemplates.TEST.renderizar(fecha=datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
     
     @staticmethod
     def validar_dimensiones() -> str:
@@ -0,0 +1,189 @@
+"""
+Benchmark de ExcelManager.agrupar_por_cable_elemento sobre los cortes de data/cortes/
+
+Compara la implementación por columnas (actual) con la versión anterior fila a fila,
+comprobando que ambas producen exactamente el mismo resultado para todos los terminales.
+
+Uso: python benchmark_agrupar_cable_elemento.py [repeticiones]
+"""
+import math
+import os
+import sys
+import time
+import unicodedata
+
+import pandas as pd
+
+from app.excel_manager import ExcelManager
+
+
+def agrupar_fila_a_fila(resultados, terminal_buscado):
+    """Implementación anterior (bucle Python sobre registros), usada como referencia"""
+    if not resultados:
+        return {}
+
+    grupos = {}
+
+    def _safe_str(v):
+        try:
+            if pd.isna(v):
+                return ''
+        except Exception:
+            pass
+        return '' if v is None else v
+
+    def _safe_num(v):
+        try:
+            if pd.isna(v):
+                return ''
+        except Exception:
+            pass
+        return v
+
+    def _get_by_normalized_key(d, target, default=''):
+        def _norm(s):
+            s = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+            return s.lower().strip()
+        target_norm = _norm(target)
+        for k in d.keys():
+            if _norm(str(k)) == target_norm:
+                return d.get(k, default)
+        return default
+
+    for row in resultados:
+        cod_cable = row.get('Cod. cable', 'Sin código')
+        cable_marca = str(row.get('Cable / Marca', '')).strip()
+        de_elemento = row.get('De Elemento', 'Sin elemento')
+        de_terminal = row.get('De Terminal', '')
+        para_terminal = row.get('Para Terminal', '')
+        clave = f"{cod_cable}|{de_elemento}"
+
+        if clave not in grupos:
+            grupos[clave] = {
+                'cod_cable': _safe_str(cod_cable),
+                'elemento': _safe_str(de_elemento),
+                'descripcion': _safe_str(_get_by_normalized_key(row, 'Descripción Cable', '')),
+                'seccion': _safe_str(_get_by_normalized_key(row, 'Sección', '')),
+                'longitud': _safe_num(row.get('Longitud', '')),
+                'de_terminal': _safe_str(de_terminal),
+                'cables_lista': [],
+                'cables_doble_terminal': [],
+                'cables_de_terminal': [],
+                'cables_para_terminal': [],
+                'num_terminales': 0
+            }
+
+        if cable_marca:
+            terminal_upper = str(terminal_buscado).upper().strip()
+            tiene_origen = str(de_terminal).upper().strip() == terminal_upper
+            tiene_destino = str(para_terminal).upper().strip() == terminal_upper
+
+            grupos[clave]['cables_lista'].append(cable_marca)
+            if tiene_origen and tiene_destino:
+                grupos[clave]['cables_doble_terminal'].append(cable_marca)
+                grupos[clave]['num_terminales'] += 2
+            elif tiene_origen:
+                grupos[clave]['cables_de_terminal'].append(cable_marca)
+                grupos[clave]['num_terminales'] += 1
+            elif tiene_destino:
+                grupos[clave]['cables_para_terminal'].append(cable_marca)
+                grupos[clave]['num_terminales'] += 1
+
+    def sort_cable(cable):
+        cable_str = str(cable).strip()
+        try:
+            return (0, int(cable_str))
+        except ValueError:
+            return (1, cable_str)
+
+    for grupo in grupos.values():
+        grupo['todos_cables'] = sorted(grupo['cables_lista'], key=sort_cable)
+        grupo['num_cables'] = len(grupo['cables_lista'])
+        del grupo['cables_lista']
+
+    return grupos
+
+
+def _iguales(a, b):
+    """Comparación estricta (valores y tipos), tratando NaN == NaN"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a.keys()) == list(b.keys()) and all(_iguales(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_iguales(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def _cronometrar(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    upload_folder = os.path.join('data', 'cortes')
+    manager = ExcelManager(upload_folder, os.path.join('data', 'codigos_cortes.json'))
+
+    archivos = sorted(f for f in os.listdir(upload_folder) if f.lower().endswith(('.xlsx', '.xls')))
+
+    print("=" * 80)
+    print(f"BENCHMARK agrupar_por_cable_elemento ({repeticiones} repeticiones por terminal)")
+    print("=" * 80)
+
+    for archivo in archivos:
+        if not manager.cargar_excel_directo(archivo):
+            print(f"✗ No se pudo cargar {archivo}")
+            continue
+
+        terminales = manager.listar_terminales_unicos()
+        busquedas = [(t, manager.buscar_terminal(t)) for t in terminales]
+        busquedas = [(t, r) for t, r in busquedas if r]
+
+        diferencias = [t for t, r in busquedas
+                       if not _iguales(agrupar_fila_a_fila(r, t), manager.agrupar_por_cable_elemento(r, t))]
+
+        t_anterior = sum(_cronometrar(lambda: agrupar_fila_a_fila(r, t), repeticiones) for t, r in busquedas)
+        t_actual = sum(_cronometrar(lambda: manager.agrupar_por_cable_elemento(r, t), repeticiones)
+                       for t, r in busquedas)
+
+        # Ruta completa de los endpoints: búsqueda + agrupación
+        t_ruta_anterior = sum(_cronometrar(lambda: agrupar_fila_a_fila(manager.buscar_terminal(t), t), repeticiones)
+                              for t, _ in busquedas)
+        t_ruta_actual = sum(_cronometrar(lambda: manager.agrupar_por_cable_elemento(manager.buscar_terminal_df(t), t),
+                                         repeticiones)
+                            for t, _ in busquedas)
+        diferencias += [t for t, r in busquedas
+                        if not _iguales(agrupar_fila_a_fila(r, t),
+                                        manager.agrupar_por_cable_elemento(manager.buscar_terminal_df(t), t))]
+
+        # Caso extremo: el libro completo como un único resultado
+        todos = manager.current_df.to_dict('records')
+        terminal = terminales[0] if terminales else ''
+        t_anterior_libro = _cronometrar(lambda: agrupar_fila_a_fila(todos, terminal), repeticiones)
+        t_actual_libro = _cronometrar(lambda: manager.agrupar_por_cable_elemento(todos, terminal), repeticiones)
+        libro_igual = _iguales(agrupar_fila_a_fila(todos, terminal),
+                               manager.agrupar_por_cable_elemento(todos, terminal))
+
+        # Escalado: libro replicado 20 veces como DataFrame
+        grande = pd.concat([manager.current_df] * 20, ignore_index=True)
+        grande_registros = grande.to_dict('records')
+        t_anterior_grande = _cronometrar(lambda: agrupar_fila_a_fila(grande_registros, terminal), 3)
+        t_actual_grande = _cronometrar(lambda: manager.agrupar_por_cable_elemento(grande, terminal), 3)
+
+        print(f"\n📄 {archivo} ({len(manager.current_df)} filas, {len(busquedas)} terminales)")
+        print(f"   Resultados idénticos: {'sí' if not diferencias and libro_igual else 'NO ' + str(diferencias)}")
+        print(f"   Todos los terminales  - anterior: {t_anterior * 1000:8.2f} ms | "
+              f"actual: {t_actual * 1000:8.2f} ms | x{t_anterior / t_actual:.2f}")
+        print(f"   Búsqueda + agrupación - anterior: {t_ruta_anterior * 1000:8.2f} ms | "
+              f"actual: {t_ruta_actual * 1000:8.2f} ms | x{t_ruta_anterior / t_ruta_actual:.2f}")
+        print(f"   Libro completo        - anterior: {t_anterior_libro * 1000:8.2f} ms | "
+              f"actual: {t_actual_libro * 1000:8.2f} ms | x{t_anterior_libro / t_actual_libro:.2f}")
+        print(f"   Libro x20 ({len(grande)} filas) - anterior: {t_anterior_grande * 1000:8.2f} ms | "
+              f"actual: {t_actual_grande * 1000:8.2f} ms | x{t_anterior_grande / t_actual_grande:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark del escaneo de terminales de varios Excel (CatalogoTerminales)
+
+Replica los cortes de data/cortes/ en una carpeta temporal hasta N archivos y mide,
+para un número creciente de cortes registrados:
+  - escaneo en frío en serie (un proceso, como antes)
+  - escaneo en frío en paralelo (pool de procesos)
+  - escaneo repetido sin cambios (todo sale de la caché por archivo)
+  - escaneo tras registrar un corte nuevo (solo se parsea ese archivo)
+
+Uso: python benchmark_escaneo_terminales.py [max_cortes] [procesos]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from config import Config
+from app.catalogo_terminales import CatalogoTerminales, _escanear_archivo
+
+
+def _preparar_carpeta(origenes, num_archivos):
+    """Carpeta temporal con num_archivos copias de los cortes de origen"""
+    carpeta = tempfile.mkdtemp(prefix='bench_terminales_')
+    archivos = []
+    for i in range(num_archivos):
+        origen = origenes[i % len(origenes)]
+        nombre = f"corte_{i:03d}.xlsx"
+        shutil.copy(origen, os.path.join(carpeta, nombre))
+        archivos.append(nombre)
+    return carpeta, archivos
+
+
+def _cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    max_cortes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    procesos = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, Config.TERMINALES_SCAN_WORKERS)
+
+    carpeta_cortes = os.path.join('data', 'cortes')
+    origenes = sorted(
+        os.path.join(carpeta_cortes, f) for f in os.listdir(carpeta_cortes)
+        if f.lower().endswith(('.xlsx', '.xls'))
+    )
+    if not origenes:
+        print("No hay archivos Excel en data/cortes/")
+        return
+
+    hoja = Config.DEFAULT_SHEET
+    paralelo = CatalogoTerminales(max_workers=procesos)
+
+    # Arrancar el pool antes de medir (coste único por proceso de la aplicación)
+    list(paralelo._obtener_executor().map(_escanear_archivo, [''] * procesos, [hoja] * procesos))
+
+    print("=" * 96)
+    print(f"BENCHMARK escaneo de terminales ({procesos} procesos, {os.cpu_count()} CPUs)")
+    print("=" * 96)
+    print(f"{'cortes':>7} | {'serie frío':>11} | {'paralelo frío':>13} | {'aceleración':>11} | "
+          f"{'repetido':>9} | {'+1 corte':>9}")
+
+    num = 1
+    tamanos = []
+    while num <= max_cortes:
+        tamanos.append(num)
+        num *= 2
+    if tamanos[-1] != max_cortes:
+        tamanos.append(max_cortes)
+
+    carpetas = []
+    try:
+        for num_cortes in tamanos:
+            # Carpetas separadas: sin sidecars ni caché previa en ninguno de los dos modos
+            carpeta_serie, archivos = _preparar_carpeta(origenes, num_cortes)
+            carpeta_paralelo, _ = _preparar_carpeta(origenes, num_cortes)
+            carpetas += [carpeta_serie, carpeta_paralelo]
+
+            serie = CatalogoTerminales(max_workers=1)
+            t_serie, (terminales_serie, _, _) = _cronometrar(
+                lambda: serie.terminales(carpeta_serie, archivos, hoja))
+
+            paralelo.invalidar()
+            t_paralelo, (terminales_paralelo, _, errores) = _cronometrar(
+                lambda: paralelo.terminales(carpeta_paralelo, archivos, hoja))
+
+            t_repetido, _ = _cronometrar(lambda: paralelo.terminales(carpeta_paralelo, archivos, hoja))
+
+            # Registrar un corte más: solo ese archivo se parsea
+            nuevo = f"corte_{num_cortes:03d}.xlsx"
+            shutil.copy(origenes[num_cortes % len(origenes)], os.path.join(carpeta_paralelo, nuevo))
+            t_nuevo, _ = _cronometrar(lambda: paralelo.terminales(carpeta_paralelo, archivos + [nuevo], hoja))
+
+            if terminales_serie != terminales_paralelo or errores:
+                print(f"   ✗ Resultados distintos o errores con {num_cortes} cortes: {errores}")
+
+            print(f"{num_cortes:>7} | {t_serie * 1000:>8.0f} ms | {t_paralelo * 1000:>10.0f} ms | "
+                  f"{t_serie / t_paralelo:>10.2f}x | {t_repetido * 1000:>6.1f} ms | {t_nuevo * 1000:>6.0f} ms")
+    finally:
+        paralelo._descartar_executor()
+        for carpeta in carpetas:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark de agrupar_por_cod_cable_elemento (grupos de etiquetas de un libro completo)
+
+Compara la implementación por columnas (actual) con la versión anterior fila a fila
+sobre listados de corte sintéticos de 1.000 a 100.000 filas (con nulos, vacíos,
+espacios, 'S/T' y mayúsculas/minúsculas mezcladas) y sobre los cortes de data/cortes/,
+comprobando que ambas producen exactamente el mismo resultado.
+
+Uso: python benchmark_grupos_etiquetas.py [repeticiones]
+"""
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.modelo_corte import agrupar_por_cod_cable_elemento
+from app.excel_manager import ExcelManager
+
+TAMANOS = (1_000, 10_000, 50_000, 100_000)
+
+
+def agrupar_fila_a_fila(registros):
+    """Implementación anterior (bucle Python sobre registros), usada como referencia"""
+    grupos = {}
+
+    for row in registros:
+        cod_cable = row.get('Cod. cable', 'Sin código')
+        de_elemento = row.get('De Elemento', 'Sin elemento')
+
+        if pd.isna(cod_cable) or pd.isna(de_elemento):
+            continue
+
+        cod_cable = str(cod_cable).strip()
+        de_elemento = str(de_elemento).strip()
+
+        if not cod_cable or not de_elemento:
+            continue
+
+        clave = f"{cod_cable}|{de_elemento}"
+
+        if clave not in grupos:
+            grupos[clave] = {
+                'cod_cable': cod_cable,
+                'elemento': de_elemento,
+                'descripcion': str(row.get('Descripción Cable', '')).strip() if not pd.isna(row.get('Descripción Cable')) else '',
+                'seccion': str(row.get('Sección', '')).strip() if not pd.isna(row.get('Sección')) else '',
+                'longitud': row.get('Longitud', '') if not pd.isna(row.get('Longitud')) else '',
+                'de_terminal': str(row.get('De Terminal', '')).strip() if not pd.isna(row.get('De Terminal')) else '',
+                'cables_lista': [],
+                'num_terminales': 0
+            }
+
+        cable_marca = str(row.get('Cable / Marca', '')).strip()
+        grupos[clave]['cables_lista'].append(cable_marca)
+
+        de_terminal = str(row.get('De Terminal', '')).strip().upper() if not pd.isna(row.get('De Terminal')) else ''
+        para_terminal = str(row.get('Para Terminal', '')).strip().upper() if not pd.isna(row.get('Para Terminal')) else ''
+
+        if de_terminal and de_terminal != 'S/T':
+            grupos[clave]['num_terminales'] += 1
+        if para_terminal and para_terminal != 'S/T':
+            grupos[clave]['num_terminales'] += 1
+
+    for grupo in grupos.values():
+        grupo['num_cables'] = len(grupo['cables_lista'])
+        del grupo['cables_lista']
+
+    return grupos
+
+
+def listado_sintetico(filas: int, semilla: int = 0) -> pd.DataFrame:
+    """Listado de corte con la forma de la hoja 'Format' (~1 grupo cada 8 filas)"""
+    rng = np.random.default_rng(semilla)
+    num_codigos = max(1, filas // 40)
+    num_elementos = 5
+
+    codigos = np.array([f"640C{10000 + i:05d}A" for i in range(num_codigos)], dtype=object)
+    elementos = np.array([f"X{i}" for i in range(num_elementos)], dtype=object)
+    terminales = np.array(['T-1001', 't-1002 ', 'T-2040', 'S/T', 's/t', '', None], dtype=object)
+    secciones = np.array(['0.5', '0,75', ' 1.5 ', '', None], dtype=object)
+
+    cod_cable = codigos[rng.integers(0, num_codigos, filas)]
+    de_elemento = elementos[rng.integers(0, num_elementos, filas)]
+    # Filas que la agrupación descarta: nulos, vacíos y solo espacios
+    cod_cable[rng.random(filas) < 0.01] = None
+    de_elemento[rng.random(filas) < 0.01] = '   '
+    de_elemento[rng.random(filas) < 0.005] = np.nan
+
+    longitud = rng.integers(100, 5000, filas).astype(object)
+    longitud[rng.random(filas) < 0.02] = np.nan
+
+    return pd.DataFrame({
+        'Cable / Marca': np.arange(1, filas + 1).astype(str),
+        'Cod. cable': cod_cable,
+        'De Elemento': de_elemento,
+        'De Terminal': terminales[rng.integers(0, len(terminales), filas)],
+        'Para Terminal': terminales[rng.integers(0, len(terminales), filas)],
+        'Descripción Cable': np.array(['CABLE 1X0,5 ', 'CABLE 2X1', None], dtype=object)[rng.integers(0, 3, filas)],
+        'Sección': secciones[rng.integers(0, len(secciones), filas)],
+        'Longitud': longitud
+    })
+
+
+def _iguales(a, b):
+    """Comparación estricta (valores y tipos), tratando NaN == NaN"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a.keys()) == list(b.keys()) and all(_iguales(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_iguales(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+def _cronometrar(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def _comparar(nombre, df, repeticiones):
+    registros = df.to_dict('records')
+    igual = (_iguales(agrupar_fila_a_fila(registros), agrupar_por_cod_cable_elemento(registros))
+             and _iguales(agrupar_fila_a_fila(registros), agrupar_por_cod_cable_elemento(df)))
+
+    t_anterior = _cronometrar(lambda: agrupar_fila_a_fila(registros), repeticiones)
+    t_registros = _cronometrar(lambda: agrupar_por_cod_cable_elemento(registros), repeticiones)
+    t_df = _cronometrar(lambda: agrupar_por_cod_cable_elemento(df), repeticiones)
+    # Lo que hacía calcular_grupos_etiquetas: to_dict('records') + bucle
+    t_ruta_anterior = _cronometrar(lambda: agrupar_fila_a_fila(df.to_dict('records')), repeticiones)
+
+    print(f"\n📄 {nombre} ({len(df)} filas, {len(agrupar_por_cod_cable_elemento(df))} grupos)")
+    print(f"   Resultados idénticos: {'sí' if igual else 'NO'}")
+    print(f"   Registros            - anterior: {t_anterior * 1000:8.2f} ms | "
+          f"actual: {t_registros * 1000:8.2f} ms | x{t_anterior / t_registros:.2f}")
+    print(f"   DataFrame de la hoja - anterior: {t_ruta_anterior * 1000:8.2f} ms | "
+          f"actual: {t_df * 1000:8.2f} ms | x{t_ruta_anterior / t_df:.2f}")
+    return igual
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 80)
+    print(f"BENCHMARK agrupar_por_cod_cable_elemento ({repeticiones} repeticiones)")
+    print("=" * 80)
+
+    todos_iguales = True
+    for filas in TAMANOS:
+        todos_iguales &= _comparar(f"Sintético {filas}", listado_sintetico(filas), repeticiones)
+
+    upload_folder = os.path.join('data', 'cortes')
+    if os.path.isdir(upload_folder):
+        manager = ExcelManager(upload_folder, os.path.join('data', 'codigos_cortes.json'))
+        archivos = sorted(f for f in os.listdir(upload_folder) if f.lower().endswith(('.xlsx', '.xls')))
+        for archivo in archivos:
+            dataset = manager.obtener_dataset(archivo)
+            if dataset is None:
+                print(f"✗ No se pudo cargar {archivo}")
+                continue
+            todos_iguales &= _comparar(archivo, dataset.df, repeticiones)
+
+    print(f"\n{'✓ Todas las implementaciones coinciden' if todos_iguales else '✗ HAY DIFERENCIAS'}")
+
+
+if __name__ == '__main__':
+    main()
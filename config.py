@@ -16,6 +16,17 @@ class Config:
     # Archivo de mapeo de códigos de barras
     CODIGOS_FILE = os.path.join(DATA_DIR, 'codigos_cortes.json')
     
+    # Otros archivos de datos JSON
+    ORDENES_FILE = os.path.join(DATA_DIR, 'ordenes_produccion.json')
+    PUESTOS_FILE = os.path.join(DATA_DIR, 'puestos_maquinas.json')
+    TERMINALES_DESACTIVADOS_FILE = os.path.join(DATA_DIR, 'terminales_desactivados.json')
+    GRUPOS_ETIQUETAS_FILE = os.path.join(DATA_DIR, 'grupos_etiquetas.json')
+    
+    # Motor de almacenamiento de proyectos, bonos, órdenes y puestos: 'json' o 'sqlite'
+    # (con 'sqlite' los JSON existentes se migran automáticamente la primera vez)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+    SQLITE_FILE = os.path.join(DATA_DIR, 'produccion.sqlite3')
+    
     # Configuración de uploads
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB máximo
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
@@ -26,19 +37,64 @@ class Config:
     # Hoja de Excel a usar por defecto
     DEFAULT_SHEET = 'Format'
     
+    # Caché de Excel parseados (memoria máxima en MB, LRU; cuenta el DataFrame y sus índices)
+    EXCEL_CACHE_MAX_MB = int(os.environ.get('EXCEL_CACHE_MAX_MB', '128'))
+    
+    # Procesos para escanear terminales de varios Excel en paralelo (1 = en serie)
+    TERMINALES_SCAN_WORKERS = int(os.environ.get('TERMINALES_SCAN_WORKERS', str(min(4, os.cpu_count() or 1))))
+    
+    # Catálogo persistente de terminales por archivo Excel
+    CATALOGO_TERMINALES_FILE = os.path.join(DATA_DIR, 'catalogo_terminales.json')
+    
+    # Caché de grupos de etiquetas (cod.cable + elemento), un JSON por archivo Excel
+    GRUPOS_ETIQUETAS_DIR = os.path.join(DATA_DIR, 'grupos_etiquetas')
+    
     # Sistema de carros y proyectos
     PROYECTOS_FILE = os.path.join(DATA_DIR, 'proyectos_carros.json')
+    # Diario de progreso de bonos (un evento por escaneo) y compactación en el snapshot
+    PROYECTOS_JOURNAL_FILE = os.path.join(DATA_DIR, 'proyectos_carros.journal.jsonl')
+    PROYECTOS_JOURNAL_COMPACTAR = int(os.environ.get('PROYECTOS_JOURNAL_COMPACTAR', '500'))
+    # Bloqueo entre procesos del gestor de proyectos (recarga + cambio + snapshot + diario)
+    PROYECTOS_LOCK_FILE = os.path.join(DATA_DIR, 'proyectos_carros.gestor.lock')
     BONOS_DIR = os.path.join(DATA_DIR, 'bonos')
     NUM_CARROS = 6  # Número de carros disponibles
     
+    # Stream SSE de progreso de bonos: comentario keep-alive cada N segundos sin eventos
+    SSE_KEEPALIVE_SEGUNDOS = int(os.environ.get('SSE_KEEPALIVE_SEGUNDOS', '15'))
+    # Cada stream abierto ocupa un hilo del servidor: se cierra tras N segundos (el
+    # navegador reconecta solo) y como máximo hay SSE_MAX_CONEXIONES por proceso; el
+    # resto de pantallas usan polling. Con waitress, --threads debe ser mayor que
+    # SSE_MAX_CONEXIONES para que queden hilos libres para los escaneos.
+    SSE_DURACION_MAX_SEGUNDOS = int(os.environ.get('SSE_DURACION_MAX_SEGUNDOS', '300'))
+    SSE_MAX_CONEXIONES = int(os.environ.get('SSE_MAX_CONEXIONES', '2'))
+    
     # Configuración de impresora Zebra GK420T
     PRINTER_ENABLED = os.environ.get('PRINTER_ENABLED', 'True').lower() == 'true'
     PRINTER_NAME = os.environ.get('PRINTER_NAME', 'ZebraGK420T')
     PRINTER_SIMULATION_MODE = os.environ.get('PRINTER_SIMULATION_MODE', 'True').lower() == 'true'
     PRINTER_SIMULATION_DIR = os.path.join(DATA_DIR, 'etiquetas_simuladas')
-    PRINTER_PENDING_FILE = os.path.join(DATA_DIR, 'etiquetas_pendientes.json')
+    PRINTER_PENDING_FILE = os.path.join(DATA_DIR, 'etiquetas_pendientes.json')  # formato antiguo, se migra al spool
+    # Spool de etiquetas pendientes: un archivo por trabajo, reintento con backoff exponencial
+    PRINTER_SPOOL_DIR = os.path.join(DATA_DIR, 'spool_impresion')
+    PRINTER_SPOOL_BACKOFF_BASE = int(os.environ.get('PRINTER_SPOOL_BACKOFF_BASE', '5'))
+    PRINTER_SPOOL_BACKOFF_MAX = int(os.environ.get('PRINTER_SPOOL_BACKOFF_MAX', '600'))
+    PRINTER_SPOOL_MAX_INTENTOS = int(os.environ.get('PRINTER_SPOOL_MAX_INTENTOS', '20'))
+    PRINTER_SPOOL_INTERVAL = int(os.environ.get('PRINTER_SPOOL_INTERVAL', '5'))  # drenador (0 = solo manual)
+    PRINTER_SPOOL_LOTE = int(os.environ.get('PRINTER_SPOOL_LOTE', '50'))  # etiquetas por envío al reintentar
     PRINTER_RETRY_ATTEMPTS = int(os.environ.get('PRINTER_RETRY_ATTEMPTS', '3'))
     PRINTER_TIMEOUT = int(os.environ.get('PRINTER_TIMEOUT', '10'))
+    # Transporte en producción: 'cups' (lpr), 'tcp' (raw al puerto 9100) o 'usb' (dispositivo directo)
+    PRINTER_TRANSPORT = os.environ.get('PRINTER_TRANSPORT', 'cups').lower()
+    PRINTER_HOST = os.environ.get('PRINTER_HOST', '')
+    PRINTER_PORT = int(os.environ.get('PRINTER_PORT', '9100'))
+    PRINTER_USB_DEVICE = os.environ.get('PRINTER_USB_DEVICE', '/dev/usb/lp0')
+    # Etiquetas de carro como formatos guardados en la impresora (^DF/^XF): solo viajan los datos variables
+    PRINTER_STORED_FORMATS = os.environ.get('PRINTER_STORED_FORMATS', 'False').lower() == 'true'
+    # Cada cuántos segundos la sonda en segundo plano refresca el estado de la impresora (0 = sin sonda)
+    PRINTER_STATUS_INTERVAL = int(os.environ.get('PRINTER_STATUS_INTERVAL', '15'))
+    # Cola de impresión en segundo plano (trabajos en espera y trabajos recordados para consultar estado)
+    PRINT_QUEUE_MAX = int(os.environ.get('PRINT_QUEUE_MAX', '100'))
+    PRINT_QUEUE_HISTORIAL = int(os.environ.get('PRINT_QUEUE_HISTORIAL', '200'))
     
     # Configuración de etiquetas
     LABELS_PER_CARRO = int(os.environ.get('LABELS_PER_CARRO', '2'))  # 1 o 2 etiquetas por carro
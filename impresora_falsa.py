@@ -0,0 +1,126 @@
+"""
+Impresora Zebra falsa por TCP (puerto raw 9100) para probar PRINTER_TRANSPORT=tcp
+sin hardware
+
+- Acumula las etiquetas recibidas (cada formato ^XA...^XZ) y, si se indica una
+  carpeta, guarda cada una en un archivo .zpl
+- Responde al comando ~HS con un estado Zebra (papel / pausa configurables)
+
+Uso: python impresora_falsa.py [puerto] [carpeta_salida]
+     PRINTER_SIMULATION_MODE=false PRINTER_TRANSPORT=tcp PRINTER_HOST=127.0.0.1 python run.py
+"""
+import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+from datetime import datetime
+
+_FORMATO_ZPL = re.compile(r'\^XA.*?\^XZ', re.DOTALL)
+
+
+class ImpresoraFalsa:
+    """Servidor TCP que se comporta como una Zebra en el puerto raw"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, carpeta_salida: str = None):
+        self.carpeta_salida = carpeta_salida
+        self.etiquetas = []
+        self.conexiones = 0
+        self.papel_agotado = False
+        self.en_pausa = False
+        self._lock = threading.Lock()
+        self._abiertas = set()
+
+        impresora = self
+
+        class Manejador(socketserver.BaseRequestHandler):
+            def handle(self):
+                with impresora._lock:
+                    impresora.conexiones += 1
+                    impresora._abiertas.add(self.request)
+                pendiente = ''
+                while True:
+                    try:
+                        datos = self.request.recv(65536)
+                    except OSError:
+                        break
+                    if not datos:
+                        break
+                    pendiente += datos.decode('utf-8', 'replace')
+                    if '~HS' in pendiente:
+                        pendiente = pendiente.replace('~HS', '')
+                        self.request.sendall(impresora.estado_hs())
+                    pendiente = impresora._consumir(pendiente)
+                with impresora._lock:
+                    impresora._abiertas.discard(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._servidor = socketserver.ThreadingTCPServer((host, port), Manejador)
+        self._servidor.daemon_threads = True
+        self.host, self.port = self._servidor.server_address
+        self._hilo = None
+
+    def _consumir(self, pendiente: str) -> str:
+        """Registrar los formatos completos recibidos y devolver el resto"""
+        ultimo = 0
+        for coincidencia in _FORMATO_ZPL.finditer(pendiente):
+            self._registrar(coincidencia.group(0))
+            ultimo = coincidencia.end()
+        return pendiente[ultimo:]
+
+    def _registrar(self, zpl: str) -> None:
+        with self._lock:
+            self.etiquetas.append(zpl)
+            numero = len(self.etiquetas)
+        if self.carpeta_salida:
+            os.makedirs(self.carpeta_salida, exist_ok=True)
+            nombre = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{numero:05d}.zpl"
+            with open(os.path.join(self.carpeta_salida, nombre), 'w', encoding='utf-8') as f:
+                f.write(zpl)
+
+    def estado_hs(self) -> bytes:
+        """Respuesta a ~HS: tres líneas <STX>...<ETX> (flags de papel y pausa en la primera)"""
+        papel = '1' if self.papel_agotado else '0'
+        pausa = '1' if self.en_pausa else '0'
+        return (f"\x02030,{papel},{pausa},1245,000,0,0,0,000,0,0,0\x03\r\n"
+                f"\x02000,0,0,0,0,2,4,0,00000000,1,000\x03\r\n"
+                f"\x021234,0\x03\r\n").encode('ascii')
+
+    def iniciar(self) -> 'ImpresoraFalsa':
+        """Atender conexiones en un hilo en segundo plano"""
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Parar el servidor y cortar las conexiones abiertas (como al apagar la impresora)"""
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        with self._lock:
+            abiertas = list(self._abiertas)
+        for conexion in abiertas:
+            try:
+                conexion.shutdown(socket.SHUT_RDWR)
+                conexion.close()
+            except OSError:
+                pass
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9100
+    carpeta = sys.argv[2] if len(sys.argv) > 2 else None
+
+    impresora = ImpresoraFalsa('0.0.0.0', port, carpeta)
+    print(f"Impresora falsa escuchando en {impresora.host}:{impresora.port}"
+          + (f" (etiquetas en {carpeta})" if carpeta else ""))
+    try:
+        impresora._servidor.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{len(impresora.etiquetas)} etiquetas recibidas en {impresora.conexiones} conexiones")
+    finally:
+        impresora._servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
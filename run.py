@@ -1,10 +1,15 @@
 """
 Archivo principal para ejecutar la aplicación
+
+`app` queda a nivel de módulo para los servidores WSGI (waitress-serve run:app).
+Los procesos del pool de escaneo de terminales ('spawn') vuelven a importar el
+módulo principal como '__mp_main__' y no deben levantar otra aplicación completa.
 """
 import socket
 from app import create_app
 
-app = create_app()
+if __name__ != '__mp_main__':
+    app = create_app()
 
 def get_local_ip():
     """Obtiene la IP local de la máquina"""
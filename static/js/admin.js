@@ -883,12 +883,14 @@ async function imprimirPrueba() {
 /**
  * Listar etiquetas simuladas
  */
-async function listarEtiquetasSimuladas() {
+async function listarEtiquetasSimuladas(cursor = null) {
     const container = document.getElementById('printer-simulated');
     const listDiv = document.getElementById('simulated-list');
     
     try {
-        const response = await fetch('/api/printer/simulated-labels');
+        // Paginado: cada página continúa desde el cursor de la anterior
+        const url = '/api/printer/simulated-labels' + (cursor ? `?cursor=${cursor}` : '');
+        const response = await fetch(url);
         const data = await response.json();
         
         if (data.success) {
@@ -897,7 +899,7 @@ async function listarEtiquetasSimuladas() {
                 container.style.display = 'none';
             } else {
                 let html = '<table class="tabla"><thead><tr>';
-                html += '<th>Archivo</th><th>Fecha</th><th>Tamaño</th>';
+                html += '<th>Archivo</th><th>Bono</th><th>Carro</th><th>Fecha</th><th>Tamaño</th>';
                 html += '</tr></thead><tbody>';
                 
                 data.archivos.forEach(archivo => {
@@ -906,12 +908,17 @@ async function listarEtiquetasSimuladas() {
                     
                     html += '<tr>';
                     html += `<td><code>${archivo.nombre}</code></td>`;
+                    html += `<td>${archivo.bono || '-'}</td>`;
+                    html += `<td>${archivo.carro || '-'}</td>`;
                     html += `<td>${fecha}</td>`;
                     html += `<td>${tamano}</td>`;
                     html += '</tr>';
                 });
                 
                 html += '</tbody></table>';
+                if (data.siguiente_cursor) {
+                    html += `<button onclick="listarEtiquetasSimuladas(${data.siguiente_cursor})" class="btn-secondary">Siguiente página ▶</button>`;
+                }
                 html += `<p><strong>Total:</strong> ${data.total} archivo(s)</p>`;
                 html += `<p class="text-muted">Ubicación: ${data.directorio}</p>`;
                 html += `<p class="text-muted">Puedes visualizar los archivos ZPL en: <a href="https://labelary.com/viewer.html" target="_blank">labelary.com/viewer.html</a></p>`;
@@ -983,7 +990,7 @@ async function cargarEtiquetasPendientes() {
                     html += `<td>${meta.tipo || 'N/A'}</td>`;
                     html += `<td>${detalles}</td>`;
                     html += `<td class="text-error">${pendiente.error}</td>`;
-                    html += `<td>${pendiente.intentos}</td>`;
+                    html += `<td>${pendiente.intentos}${pendiente.estado === 'fallida' ? ' (reintentos agotados)' : ''}</td>`;
                     html += '</tr>';
                 });
                 
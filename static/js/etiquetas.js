@@ -194,36 +194,21 @@ async function imprimirEtiquetas() {
         return;
     }
     
-    try {
-        const response = await fetch('/api/etiquetas/generar_html', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                archivo: archivoSeleccionado,
-                grupos: gruposCargados,
-                codigo_corte: codigoCorteActual
-            })
-        });
-        
-        const data = await response.json();
-        
-        if (data.success && data.html) {
-            // Abrir en nueva ventana para imprimir
-            const ventanaImpresion = window.open('', '_blank');
-            ventanaImpresion.document.write(data.html);
-            ventanaImpresion.document.close();
-            
-            // Esperar a que cargue y abrir diálogo de impresión
-            ventanaImpresion.onload = function() {
-                ventanaImpresion.print();
-            };
-        } else {
-            alert('Error al generar etiquetas: ' + (data.message || 'Error desconocido'));
-        }
-    } catch (error) {
-        console.error('Error al imprimir etiquetas:', error);
-        alert('Error al imprimir etiquetas: ' + error.message);
+    // El servidor envía el documento en streaming (text/html): la ventana empieza a
+    // pintar con la primera página sin esperar a que se generen todas
+    let url = '/api/etiquetas/html/' + encodeURIComponent(archivoSeleccionado);
+    if (codigoCorteActual) {
+        url += '?codigo_corte=' + encodeURIComponent(codigoCorteActual);
     }
+    
+    const ventanaImpresion = window.open(url, '_blank');
+    if (!ventanaImpresion) {
+        alert('No se pudo abrir la ventana de impresión (¿bloqueador de ventanas emergentes?)');
+        return;
+    }
+    
+    // Esperar a que cargue y abrir diálogo de impresión
+    ventanaImpresion.addEventListener('load', function() {
+        ventanaImpresion.print();
+    });
 }
@@ -867,7 +867,11 @@ async function buscarPorNumeroEtiqueta() {
         const response = await fetch('/api/etiquetas/buscar_por_numero', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ numero_etiqueta: parseInt(numeroEtiqueta) })
+            // Con un bono cargado se busca en todos sus archivos (numeración propia de cada uno)
+            body: JSON.stringify({
+                numero_etiqueta: parseInt(numeroEtiqueta),
+                bono: window.bonoActual ? window.bonoActual.nombre : undefined
+            })
         });
         
         const data = await response.json();
@@ -876,11 +880,16 @@ async function buscarPorNumeroEtiqueta() {
             const grupo = data.grupo;
             
             // Mostrar mensaje de éxito
-            const mensaje = `✅ Etiqueta #${numeroEtiqueta} encontrada:\n\n` +
+            let mensaje = `✅ Etiqueta #${numeroEtiqueta} encontrada:\n\n` +
                           `🔌 Elemento: ${grupo.elemento}\n` +
                           `📟 Cable: ${grupo.cod_cable}\n` +
                           `📏 Sección: ${grupo.seccion || 'N/A'}`;
             
+            if (data.coincidencias && data.coincidencias.length > 1) {
+                mensaje += `\n\n⚠️ El número existe en ${data.coincidencias.length} archivos del bono:\n` +
+                           data.coincidencias.map(c => `• ${c.archivo}: ${c.elemento}`).join('\n');
+            }
+            
             alert(mensaje);
             
             // Resaltar el elemento en la lista si existe